@@ -1,9 +1,10 @@
 from django.contrib.auth.models import Group
 from .models import *
 from rest_framework import serializers
+from config.core.fieldsets import SparseFieldsetsMixin
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = '__all__'
@@ -10,12 +10,14 @@ from .emails import send_email
 from .serializers import UserSerializer
 from .authentication import TemporaryTokenAuthentication
 from .models import VerificationCode  # ← Importar el modelo
+from config.core.fieldsets import SparseFieldsetsViewMixin
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
-class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all().order_by('-date_joined')
+class UserViewSet(SparseFieldsetsViewMixin, viewsets.ModelViewSet):
+    # groups/user_permissions se precargan; ?fields=/?omit= los quita si no se piden
+    queryset = User.objects.all().order_by('-date_joined').prefetch_related('groups', 'user_permissions')
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AnimalType, Breed, Pet, PetTransfer 
+from .models import AnimalType, Breed, OutboxEvent, Pet, PetTransfer
 
 @admin.register(AnimalType)
 class AnimalTypeAdmin(admin.ModelAdmin):
@@ -19,8 +19,19 @@ class PetAdmin(admin.ModelAdmin):
     list_filter  = ("breed", "is_active")
     search_fields = ("name", "owner__email", "owner__username")
 
+    # Incluir las mascotas eliminadas (borrado lógico)
+    def get_queryset(self, request):
+        return Pet.all_objects.select_related("breed", "owner")
+
 @admin.register(PetTransfer)
 class PetTransferAdmin(admin.ModelAdmin):
     list_display = ("id", "pet", "from_user", "to_user", "status", "created_at", "expires_at")
     list_filter  = ("status",)
-    search_fields = ("code",)
\ No newline at end of file
+    search_fields = ("code",)
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "recipient", "status", "attempts", "created_at", "available_at", "sent_at")
+    list_filter  = ("status", "kind")
+    search_fields = ("recipient__email",)
+    raw_id_fields = ("recipient",)
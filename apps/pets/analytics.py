@@ -0,0 +1,105 @@
+import calendar
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.utils import timezone
+from .models import Pet, PetPopulationSnapshot
+
+
+# Rangos de edad en años cumplidos: (etiqueta, edad mínima)
+AGE_BANDS = (
+    ('11+', 11),
+    ('7-10', 7),
+    ('3-6', 3),
+    ('1-2', 1),
+    ('<1', 0),
+)
+# Rangos de peso en kg: (etiqueta, peso mínimo)
+WEIGHT_BANDS = (
+    ('45+', 45),
+    ('25-45', 25),
+    ('10-25', 10),
+    ('5-10', 5),
+    ('0-5', 0),
+)
+# Dimensiones por las que se puede agrupar la API
+POPULATION_DIMENSIONS = (
+    'animal_type', 'breed', 'sex', 'neutered', 'microchip', 'age_band', 'weight_band',
+)
+
+
+def _years_before(day, years):
+    """Misma fecha `years` años antes (el 29 de febrero pasa al 28 si hace falta)"""
+    year = day.year - years
+    return day.replace(year=year, day=min(day.day, calendar.monthrange(year, day.month)[1]))
+
+
+def population_rows(day):
+    """
+    Queryset agregado (un solo GROUP BY en la base de datos) con el padrón de
+    mascotas activas por dimensión; la edad se calcula respecto a `day`
+    """
+    age_band = Case(
+        *[When(birth_date__lte=_years_before(day, years), then=Value(label)) for label, years in AGE_BANDS],
+        default=Value(None),
+    )
+    weight_band = Case(
+        *[When(weight_kg__gte=minimum, then=Value(label)) for label, minimum in WEIGHT_BANDS],
+        default=Value(None),
+    )
+    return (
+        Pet.objects
+        .annotate(animal_type_id=F('breed__animal_type_id'), age_band=age_band, weight_band=weight_band)
+        .values('animal_type_id', 'breed_id', 'sex', 'neutered', 'microchip', 'age_band', 'weight_band')
+        .annotate(
+            count=Count('id'),
+            weight_kg_sum=Sum('weight_kg', default=0),
+            weighed_count=Count('weight_kg'),
+        )
+        .order_by()
+    )
+
+
+def build_population_snapshot(day=None):
+    """
+    Calcula la foto del padrón del día `day` (hoy por defecto) y reemplaza la
+    que hubiera para esa fecha. Regresa el número de filas escritas.
+    """
+    day = day or timezone.localdate()
+    rows = population_rows(day)
+    with transaction.atomic():
+        PetPopulationSnapshot.objects.filter(date=day).delete()
+        snapshots = PetPopulationSnapshot.objects.bulk_create(
+            [PetPopulationSnapshot(date=day, **row) for row in rows.iterator()],
+            batch_size=1000
+        )
+    return len(snapshots)
+
+
+def population_report(date_from, date_to, group_by, filters=None):
+    """
+    Reagrupa las fotos entre `date_from` y `date_to` por fecha y las
+    dimensiones `group_by` (subconjunto de POPULATION_DIMENSIONS).
+    `filters` son igualdades sobre esas mismas dimensiones.
+    """
+    fields = [f'{name}_id' if name in ('animal_type', 'breed') else name for name in group_by]
+    queryset = PetPopulationSnapshot.objects.filter(date__gte=date_from, date__lte=date_to)
+    if filters:
+        queryset = queryset.filter(Q(**filters))
+    rows = (
+        queryset
+        .values('date', *fields)
+        .annotate(total=Sum('count'), weight_kg_sum=Sum('weight_kg_sum'), weighed=Sum('weighed_count'))
+        .order_by('date', *[F(field).asc(nulls_first=True) for field in fields])
+    )
+    report = []
+    for row in rows:
+        weighed = row.pop('weighed')
+        weight_kg_sum = row.pop('weight_kg_sum')
+        item = {name: row[field] for name, field in zip(group_by, fields)}
+        item.update(
+            date=row['date'],
+            count=row['total'],
+            avg_weight_kg=round(weight_kg_sum / weighed, 2) if weighed else None,
+        )
+        report.append(item)
+    return report
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.pets'
+
+    def ready(self):
+        import apps.pets.signals
@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from .models import AnimalType, Breed
+
+
+# Versión del catálogo (AnimalType -> Breed) en el cache compartido
+CATALOG_VERSION_KEY = "pets:catalog:version"
+
+
+def get_catalog_version() -> int:
+    """Regresa la versión actual del catálogo, inicializándola si no existe"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version() -> int:
+    """
+    Invalida el catálogo cacheado incrementando su versión.
+    Se llama desde las señales de AnimalType/Breed y desde los importadores
+    (bulk_create no dispara señales).
+    """
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # La llave no existe (cache reiniciado); los árboles viejos tampoco
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        return cache.incr(CATALOG_VERSION_KEY)
+
+
+class CatalogCache:
+    """
+    Cache en memoria del proceso con los AnimalType y Breed activos.
+    Cada consulta compara la versión local contra la del cache compartido
+    (CACHE_URL, Redis) y se vacía si cambió, así que un cambio en otro worker
+    se ve en la siguiente búsqueda. El tamaño está acotado (LRU) y los contadores
+    hits/misses se exponen con `stats()`.
+    Solo se guardan registros activos; las búsquedas sin resultado no se cachean.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or int(getattr(settings, "PET_CATALOG_CACHE_SIZE", 5000))
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._breeds = OrderedDict()
+        self._animal_types = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._breeds.clear()
+            self._animal_types.clear()
+            self._version = None
+
+    def _check_version(self):
+        version = get_catalog_version()
+        if version != self._version:
+            self._breeds.clear()
+            self._animal_types.clear()
+            self._version = version
+
+    def _store(self, store, key, value):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > self.max_size:
+            store.popitem(last=False)
+
+    def _get_many(self, store, keys, load):
+        """Regresa {key: obj} buscando en una sola consulta las llaves que faltan"""
+        found = {}
+        with self._lock:
+            self._check_version()
+            version = self._version
+            for key in keys:
+                if key in store:
+                    store.move_to_end(key)
+                    found[key] = store[key]
+            self.hits += len(found)
+            missing = [key for key in keys if key not in found]
+            self.misses += len(missing)
+
+        if missing:
+            loaded = load(missing)
+            with self._lock:
+                # Si el catálogo cambió durante la consulta, lo leído puede
+                # ser anterior al cambio: se regresa pero no se guarda
+                if self._version == version:
+                    for key, obj in loaded.items():
+                        self._store(store, key, obj)
+            found.update(loaded)
+        return found
+
+    def get_breeds(self, ids) -> dict:
+        """Regresa {id: Breed} con los Breed activos encontrados"""
+        return self._get_many(
+            self._breeds, list(dict.fromkeys(ids)),
+            lambda missing: Breed.objects.filter(is_active=True).select_related('animal_type').in_bulk(missing)
+        )
+
+    def get_breed(self, breed_id):
+        """Regresa el Breed activo con ese id o None"""
+        return self.get_breeds([breed_id]).get(breed_id)
+
+    def get_animal_types(self, slugs) -> dict:
+        """Regresa {slug: AnimalType} con los AnimalType activos encontrados"""
+        return self._get_many(
+            self._animal_types, list(dict.fromkeys(slugs)),
+            lambda missing: AnimalType.objects.filter(is_active=True).in_bulk(missing, field_name='slug')
+        )
+
+    def get_animal_type(self, slug):
+        """Regresa el AnimalType activo con ese slug o None"""
+        return self.get_animal_types([slug]).get(slug)
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "breeds": len(self._breeds),
+            "animal_types": len(self._animal_types),
+            "max_size": self.max_size,
+        }
+
+
+# Instancia compartida por proceso
+catalog_cache = CatalogCache()
@@ -0,0 +1,113 @@
+import hashlib
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from .models import AnimalType, Breed
+from .serializers import CatalogAnimalTypeSerializer
+from .cache import get_catalog_version
+from .filters import normalize_search_text
+
+
+# Árbol del catálogo pre-serializado, una llave por versión
+CATALOG_TREE_KEY = "pets:catalog:tree:{version}"
+# Las versiones viejas del árbol expiran solas
+CATALOG_TREE_TIMEOUT = 60 * 60 * 24
+
+
+def build_catalog_tree() -> list:
+    """Construye el árbol de AnimalType activos con sus Breed activos"""
+    queryset = AnimalType.objects.filter(is_active=True).order_by('name').prefetch_related(
+        Prefetch(
+            'breeds',
+            queryset=Breed.objects.filter(is_active=True).order_by('name'),
+            to_attr='active_breeds'
+        )
+    )
+    return CatalogAnimalTypeSerializer(queryset, many=True).data
+
+
+def get_catalog_tree():
+    """
+    Regresa (etag, body) del catálogo pre-serializado para la versión actual.
+    El ETag es el hash del contenido, así que es fuerte y no depende de que
+    la versión sobreviva a un reinicio del cache.
+    """
+    key = CATALOG_TREE_KEY.format(version=get_catalog_version())
+    cached = cache.get(key)
+    if cached is None:
+        body = JSONRenderer().render(build_catalog_tree())
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        cached = (etag, body)
+        cache.set(key, cached, timeout=CATALOG_TREE_TIMEOUT)
+    return cached
+
+
+class BreedAutocompleteIndex:
+    """
+    Índice en memoria del proceso para autocompletar razas por prefijo.
+    Solo incluye razas activas de animal_type activos, igual que el catálogo.
+    Guarda, por animal_type (y uno global), una lista ordenada de los nombres
+    normalizados (minúsculas, sin acentos) y de cada sufijo que empieza en
+    una palabra, así 'alem' encuentra 'Pastor Alemán'. Se construye la
+    primera vez que se usa y se reconstruye cuando cambia la versión del
+    catálogo en el cache compartido (CACHE_URL), también si el cambio se hizo
+    en otro worker; mientras no cambie, las búsquedas no tocan la base de datos.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def _build(self) -> dict:
+        entries = defaultdict(list)
+        rows = Breed.objects.filter(is_active=True, animal_type__is_active=True).values_list('id', 'name', 'animal_type_id')
+        for breed_id, name, animal_type_id in rows:
+            words = normalize_search_text(name).split()
+            for position in range(len(words)):
+                entry = (' '.join(words[position:]), breed_id, name, animal_type_id)
+                entries[animal_type_id].append(entry)
+                entries[None].append(entry)
+
+        index = {}
+        for animal_type_id, items in entries.items():
+            items.sort()
+            index[animal_type_id] = ([item[0] for item in items], items)
+        return index
+
+    def _current(self) -> dict:
+        version = get_catalog_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._index = self._build()
+                    self._version = version
+        return self._index
+
+    def search(self, prefix: str, animal_type_id=None, limit=None) -> list:
+        """Regresa hasta `limit` razas cuyo nombre (o alguna palabra) empieza con `prefix`"""
+        max_results = int(getattr(settings, "PET_BREED_AUTOCOMPLETE_LIMIT", 10))
+        limit = min(limit or max_results, max_results)
+        prefix = ' '.join(normalize_search_text(prefix).split())
+        if not prefix:
+            return []
+
+        keys, items = self._current().get(animal_type_id, ([], []))
+        results = []
+        seen = set()
+        position = bisect_left(keys, prefix)
+        while position < len(keys) and keys[position].startswith(prefix) and len(results) < limit:
+            _, breed_id, name, breed_animal_type_id = items[position]
+            if breed_id not in seen:
+                seen.add(breed_id)
+                results.append({"id": breed_id, "name": name, "animal_type": breed_animal_type_id})
+            position += 1
+        return results
+
+
+# Instancia compartida por proceso
+breed_autocomplete = BreedAutocompleteIndex()
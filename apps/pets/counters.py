@@ -0,0 +1,60 @@
+from django.db import connection, transaction
+from django.db.models import Count
+from .models import OwnerPetCount, Pet
+
+
+def reconcile_owner_pet_counts(dry_run=False):
+    """
+    Recalcula OwnerPetCount desde Pet con un solo GROUP BY y corrige las
+    diferencias (filas faltantes, sobrantes o con otro conteo).
+    En PostgreSQL bloquea la tabla de contadores contra escrituras mientras
+    tanto, para que ningún alta o baja concurrente quede fuera del cálculo.
+    Regresa la lista de diferencias encontradas como dicts
+    {owner, animal_type, expected, actual}.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {OwnerPetCount._meta.db_table} IN EXCLUSIVE MODE')
+
+        expected = {
+            (row['owner_id'], row['breed__animal_type_id']): row['total']
+            for row in Pet.objects.values('owner_id', 'breed__animal_type_id').annotate(total=Count('id')).order_by()
+        }
+        actual = {
+            (counter.owner_id, counter.animal_type_id): counter
+            for counter in OwnerPetCount.objects.all()
+        }
+
+        drift = []
+        for key in expected.keys() | actual.keys():
+            counter = actual.get(key)
+            count = expected.get(key, 0)
+            if (counter.count if counter else 0) != count:
+                drift.append({
+                    "owner": key[0],
+                    "animal_type": key[1],
+                    "expected": count,
+                    "actual": counter.count if counter else None,
+                })
+        if dry_run or not drift:
+            return drift
+
+        stale = [actual[key].id for key in actual.keys() - expected.keys()]
+        OwnerPetCount.objects.filter(id__in=stale).delete()
+        changed = []
+        for key, count in expected.items():
+            counter = actual.get(key)
+            if counter is not None and counter.count != count:
+                counter.count = count
+                changed.append(counter)
+        OwnerPetCount.objects.bulk_update(changed, ['count'], batch_size=1000)
+        OwnerPetCount.objects.bulk_create(
+            [
+                OwnerPetCount(owner_id=owner_id, animal_type_id=animal_type_id, count=count)
+                for (owner_id, animal_type_id), count in expected.items()
+                if (owner_id, animal_type_id) not in actual
+            ],
+            batch_size=1000
+        )
+    return drift
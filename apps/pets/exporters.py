@@ -0,0 +1,93 @@
+import csv
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from .importers import PET_IMPORT_FIELDS
+
+
+# Columnas de la exportación; owner_email, breed y los campos de Pet son
+# los mismos que acepta import_pets
+PET_EXPORT_FIELDS = ('id', 'owner_email', 'breed', *PET_IMPORT_FIELDS, 'photo', 'created_at', 'updated_at')
+PET_EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+# Filas por viaje al servidor del cursor (FETCH) y bytes por chunk de la respuesta
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+# Columnas que no son campos directos de Pet
+_EXPORT_PATHS = {
+    'owner_email': 'owner__email',
+    'breed': 'breed_id',
+}
+
+
+def pet_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Itera las mascotas del queryset como tuplas (en el orden de
+    PET_EXPORT_FIELDS) ordenadas por id.
+    iterator() usa un cursor del lado del servidor en PostgreSQL: las filas
+    se traen de `chunk_size` en `chunk_size` sin materializar el resultado.
+    """
+    paths = [_EXPORT_PATHS.get(name, name) for name in PET_EXPORT_FIELDS]
+    return queryset.order_by('id').values_list(*paths).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """Pseudo-archivo para csv.writer: regresa la línea en lugar de escribirla"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(PET_EXPORT_FIELDS)
+    for row in rows:
+        # csv escribe None como cadena vacía
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(PET_EXPORT_FIELDS, row))) + '\n'
+
+
+def _buffered(lines, size=EXPORT_BUFFER_SIZE):
+    """Agrupa las líneas en chunks de ~`size` bytes para no escribir fila por fila"""
+    buffer = []
+    length = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_pets(queryset, file_format, gzip=False):
+    """
+    Regresa un iterador de bytes con las mascotas en CSV o NDJSON (con gzip
+    opcional) que se genera conforme se leen las filas: la memoria no depende
+    del número de mascotas
+    """
+    if file_format not in PET_EXPORT_FORMATS:
+        raise ValueError(f"Formato '{file_format}' no soportado, usa: {', '.join(PET_EXPORT_FORMATS)}")
+    rows = pet_export_rows(queryset)
+    lines = _csv_lines(rows) if file_format == 'csv' else _ndjson_lines(rows)
+    chunks = _buffered(lines)
+    return _gzipped(chunks) if gzip else chunks
@@ -0,0 +1,178 @@
+import decimal
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.encoding import iri_to_uri
+from rest_framework import ISO_8601, serializers, relations
+from rest_framework.settings import api_settings
+
+
+# Campos cuyo valor de queryset.values() ya es su representación
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+# Campos cuyo to_representation se puede aplicar directo al valor crudo
+VALUE_FIELDS = (
+    serializers.DateField,
+    serializers.FloatField,
+    serializers.TimeField,
+    serializers.UUIDField,
+)
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+def _datetime_converter(field):
+    """
+    DateTimeField.to_representation con el formato y la zona horaria
+    resueltos una sola vez (ISO 8601 con datetimes aware)
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or value.utcoffset() is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _decimal_converter(field):
+    """DecimalField.to_representation con el exponente y el contexto precalculados"""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _file_converter(field, model_field):
+    """Equivalente a FileField.to_representation partiendo del nombre guardado"""
+    storage = model_field.storage
+    use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+    request = field.context.get('request')
+    base_url = request.build_absolute_uri('/')[:-1] if request is not None else None
+
+    def convert(name):
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        if request is None:
+            return url
+        if url.startswith('/') and not url.startswith('//') and '/./' not in url and '/../' not in url:
+            # Mismo atajo que HttpRequest.build_absolute_uri para rutas absolutas
+            return iri_to_uri(base_url + url)
+        return request.build_absolute_uri(url)
+    return convert
+
+
+def _compile(serializer, prefix=''):
+    """
+    Regresa una lista de pasos (key, path, converter, subplan) para construir
+    la representación de `serializer` a partir de filas de values()
+    """
+    model = serializer.Meta.model
+    steps = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        source = field.source
+        if source == '*' or '.' in source:
+            raise UnsupportedField(name)
+        path = prefix + source
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            # Propiedades o métodos del modelo no existen en values()
+            raise UnsupportedField(name)
+
+        if isinstance(field, serializers.ModelSerializer):
+            pk_path = f'{path}__{field.Meta.model._meta.pk.name}'
+            steps.append((name, pk_path, None, _compile(field, f'{path}__')))
+        elif isinstance(field, relations.PrimaryKeyRelatedField):
+            steps.append((name, path, None, None))
+        elif isinstance(field, serializers.FileField):
+            steps.append((name, path, _file_converter(field, model_field), None))
+        elif isinstance(field, serializers.DateTimeField):
+            steps.append((name, path, _datetime_converter(field), None))
+        elif isinstance(field, serializers.DecimalField):
+            steps.append((name, path, _decimal_converter(field), None))
+        elif isinstance(field, VALUE_FIELDS):
+            steps.append((name, path, field.to_representation, None))
+        elif isinstance(field, IDENTITY_FIELDS) and not isinstance(field, relations.RelatedField):
+            steps.append((name, path, None, None))
+        else:
+            raise UnsupportedField(name)
+    return steps
+
+
+def _paths(steps):
+    for _, path, _, subplan in steps:
+        yield path
+        if subplan is not None:
+            yield from _paths(subplan)
+
+
+def _build(steps, row):
+    ret = {}
+    for key, path, converter, subplan in steps:
+        value = row[path]
+        if value is None:
+            ret[key] = None
+        elif subplan is not None:
+            ret[key] = _build(subplan, row)
+        elif converter is not None:
+            ret[key] = converter(value)
+        else:
+            ret[key] = value
+    return ret
+
+
+class ValuesSerializer:
+    """
+    Versión compilada de un ModelSerializer de solo lectura que trabaja sobre
+    queryset.values() en lugar de instancias del modelo. Produce la misma
+    salida que `serializer.data`, sin crear objetos del modelo ni recorrer la
+    maquinaria de campos de DRF por cada fila.
+    Solo soporta campos simples, PrimaryKeyRelatedField, FileField y
+    serializers anidados (FK); con cualquier otro campo `compile` regresa None.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.paths = list(dict.fromkeys(_paths(steps)))
+
+    @classmethod
+    def compile(cls, serializer):
+        try:
+            return cls(_compile(serializer))
+        except UnsupportedField:
+            return None
+
+    def values(self, queryset, extra=()):
+        """queryset.values() con las columnas del plan (más `extra`, p. ej. para la paginación)"""
+        return queryset.values(*dict.fromkeys([*self.paths, *extra]))
+
+    def to_representation(self, rows):
+        steps = self.steps
+        return [_build(steps, row) for row in rows]
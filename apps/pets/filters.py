@@ -0,0 +1,67 @@
+import operator
+import unicodedata
+from functools import reduce
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Func, Q
+from django.db.models.functions import Greatest, Lower
+from rest_framework import filters
+
+
+def normalize_search_text(value: str) -> str:
+    """Minúsculas y sin acentos: 'Pastor Alemán' -> 'pastor aleman'"""
+    value = unicodedata.normalize('NFKD', value.lower())
+    return ''.join(char for char in value if not unicodedata.combining(char))
+
+
+class ImmutableUnaccent(Func):
+    """
+    unaccent() envuelta en una función IMMUTABLE (f_unaccent, creada en la
+    migración 0003_search_trigram_indexes) para poder usarla en índices
+    """
+    function = 'f_unaccent'
+    arity = 1
+
+
+class TrigramSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter respaldado por índices GIN de pg_trgm.
+    En PostgreSQL cada término se busca como subcadena de
+    f_unaccent(lower(campo)), expresión que coincide con los índices de la
+    migración, por lo que la búsqueda no recorre toda la tabla y no distingue
+    acentos ni mayúsculas. Los resultados se ordenan por similitud.
+    En otros motores (SQLite en pruebas) se comporta igual que SearchFilter.
+    Los `search_fields` deben ser campos de texto sin prefijos ('^', '=', ...).
+    Una paginación que imponga su propio orden (p. ej. ?pagination=cursor,
+    que ordena por created_at e id) descarta el orden por similitud: los
+    resultados siguen filtrados, pero no ordenados por search_rank.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        search_fields = self.get_search_fields(view, request)
+        search_terms = [normalize_search_text(term) for term in self.get_search_terms(request)]
+
+        if not search_fields or not search_terms:
+            return queryset
+
+        documents = {
+            f'search_document_{index}': ImmutableUnaccent(Lower(field))
+            for index, field in enumerate(search_fields)
+        }
+        queryset = queryset.alias(**documents)
+
+        conditions = (
+            reduce(
+                operator.or_,
+                (Q(**{f'{alias}__contains': term}) for alias in documents)
+            ) for term in search_terms
+        )
+        queryset = queryset.filter(reduce(operator.and_, conditions))
+
+        query = ' '.join(search_terms)
+        similarities = [TrigramSimilarity(document, query) for document in documents.values()]
+        search_rank = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+        return queryset.annotate(search_rank=search_rank).order_by('-search_rank', 'pk')
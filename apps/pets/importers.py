@@ -0,0 +1,348 @@
+import csv
+import io
+import json
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+from django.utils import timezone
+from apps.accounts.models import User
+from .models import AnimalType, Breed, OwnerPetCount, Pet
+from .cache import bump_catalog_version, catalog_cache
+
+
+# Tamaño de lote para los INSERT multi-fila de los importadores
+BULK_CREATE_BATCH_SIZE = 1000
+
+
+def _error(index, item_data, message):
+    return {"index": index, "data": item_data, "error": message}
+
+
+def import_animal_types(data, batch_size=BULK_CREATE_BATCH_SIZE):
+    """
+    Crea AnimalType en lote.
+    Consulta los slugs existentes una sola vez, descarta los duplicados dentro
+    del payload y crea el resto con bulk_create.
+    Regresa (created_objects, errors) con el índice original de cada item.
+    """
+    errors = []
+
+    slugs = {item['slug'] for item in data}
+    existing_slugs = set(
+        AnimalType.objects.filter(slug__in=slugs).values_list('slug', flat=True)
+    )
+
+    seen_slugs = set()
+    to_create = []
+    for index, item_data in enumerate(data):
+        slug = item_data['slug']
+        if slug in existing_slugs:
+            errors.append(_error(index, item_data, f"El slug '{slug}' ya existe"))
+            continue
+        if slug in seen_slugs:
+            errors.append(_error(index, item_data, f"El slug '{slug}' está duplicado en el payload"))
+            continue
+
+        try:
+            # Validar los campos sin consultar la base de datos
+            animal_type = AnimalType(**item_data)
+            animal_type.full_clean(validate_unique=False, validate_constraints=False)
+        except Exception as e:
+            errors.append(_error(index, item_data, str(e)))
+            continue
+
+        seen_slugs.add(slug)
+        to_create.append((index, animal_type))
+
+    with transaction.atomic():
+        AnimalType.objects.bulk_create(
+            [animal_type for _, animal_type in to_create], batch_size=batch_size
+        )
+        # bulk_create no dispara señales: invalidar el catálogo manualmente
+        if to_create:
+            transaction.on_commit(bump_catalog_version)
+
+    created_objects = [
+        {
+            "index": index,
+            "id": animal_type.id,
+            "slug": animal_type.slug,
+            "name": animal_type.name
+        }
+        for index, animal_type in to_create
+    ]
+    return created_objects, errors
+
+
+def import_breeds(data, batch_size=BULK_CREATE_BATCH_SIZE):
+    """
+    Crea Breed en lote resolviendo cada `animal_type_slug` en memoria.
+    Usa un número fijo de consultas sin importar el tamaño del payload:
+    el mapa slug -> AnimalType (desde el cache del catálogo), una para las
+    razas existentes de esos AnimalType y los INSERT en lotes de `batch_size`.
+    Regresa (created_objects, errors) con el índice original de cada item.
+    """
+    errors = []
+
+    animal_types = catalog_cache.get_animal_types([item['animal_type_slug'] for item in data])
+
+    existing_pairs = set(
+        Breed.objects.filter(
+            animal_type_id__in=[animal_type.id for animal_type in animal_types.values()]
+        ).values_list('animal_type_id', 'name')
+    )
+
+    to_create = []
+    for index, item in enumerate(data):
+        item_data = dict(item)
+        animal_type_slug = item_data.pop('animal_type_slug')
+
+        animal_type = animal_types.get(animal_type_slug)
+        if animal_type is None:
+            errors.append(_error(
+                index, item_data,
+                f"AnimalType con slug '{animal_type_slug}' no existe o está inactivo"
+            ))
+            continue
+
+        # Verificar si la raza ya existe para este animal_type (o se repite en el payload)
+        key = (animal_type.id, item_data['name'])
+        if key in existing_pairs:
+            errors.append(_error(
+                index, item_data,
+                f"La raza '{item_data['name']}' ya existe para {animal_type.name}"
+            ))
+            continue
+
+        try:
+            breed = Breed(animal_type=animal_type, **item_data)
+            # animal_type ya se resolvió arriba; validarlo de nuevo haría una consulta por fila
+            breed.full_clean(exclude=['animal_type'], validate_unique=False, validate_constraints=False)
+        except Exception as e:
+            errors.append(_error(index, item_data, str(e)))
+            continue
+
+        existing_pairs.add(key)
+        to_create.append((index, breed))
+
+    with transaction.atomic():
+        Breed.objects.bulk_create([breed for _, breed in to_create], batch_size=batch_size)
+        if to_create:
+            transaction.on_commit(bump_catalog_version)
+
+    created_objects = [
+        {
+            "index": index,
+            "id": breed.id,
+            "animal_type": breed.animal_type.name,
+            "animal_type_slug": breed.animal_type.slug,
+            "name": breed.name,
+            "is_active": breed.is_active
+        }
+        for index, breed in to_create
+    ]
+    return created_objects, errors
+
+
+# Columnas aceptadas por import_pets además de owner_email y breed
+PET_IMPORT_FIELDS = (
+    'name', 'sex', 'birth_date', 'emergency_phone', 'address', 'tattoos',
+    'microchip', 'neutered', 'notes', 'curp', 'weight_kg', 'height_cm',
+)
+PET_IMPORT_FORMATS = ('csv', 'ndjson')
+# Columnas que agrega la exportación de mascotas y que se ignoran al importar
+PET_IMPORT_IGNORED_FIELDS = ('id', 'photo', 'created_at', 'updated_at')
+
+_PET_IMPORT_MODEL_FIELDS = {name: Pet._meta.get_field(name) for name in PET_IMPORT_FIELDS}
+# Campos sin default válido: se validan aunque la fila no los traiga
+_PET_IMPORT_REQUIRED = {name for name, field in _PET_IMPORT_MODEL_FIELDS.items() if not field.blank}
+
+_BOOLEAN_VALUES = {
+    'true': True, '1': True, 'si': True, 'sí': True, 'yes': True,
+    'false': False, '0': False, 'no': False,
+}
+
+
+def _csv_rows(stream):
+    for row in csv.DictReader(stream):
+        # Las celdas vacías toman el valor por defecto del modelo
+        yield {key: value.strip() for key, value in row.items() if key and value and value.strip()}
+
+
+def _ndjson_rows(stream):
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            # La fila se reporta como error sin detener la importación
+            yield ValueError(f"JSON inválido: {e}")
+
+
+def read_pet_rows(file, file_format):
+    """
+    Itera las filas de un archivo CSV (con encabezados) o NDJSON (un objeto
+    JSON por línea) sin cargarlo completo en memoria.
+    `file` es un archivo binario (p. ej. un UploadedFile)
+    """
+    if file_format not in PET_IMPORT_FORMATS:
+        raise ValueError(f"Formato '{file_format}' no soportado, usa: {', '.join(PET_IMPORT_FORMATS)}")
+    return _read_rows(file, file_format)
+
+
+def _read_rows(file, file_format):
+    stream = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        if file_format == 'csv':
+            yield from _csv_rows(stream)
+        else:
+            yield from _ndjson_rows(stream)
+    finally:
+        # No cerrar el archivo del llamador junto con el wrapper
+        stream.detach()
+
+
+def _clean_pet_fields(item_data):
+    """
+    Equivalente a Pet.full_clean() para una fila importada: valida y convierte
+    solo los campos que trae la fila (más los obligatorios); el resto conserva
+    el default del modelo. owner y breed se resuelven aparte, en lote.
+    Regresa ({attname: valor}, {campo: [mensajes]}).
+    """
+    values = {}
+    field_errors = {}
+    for name, field in _PET_IMPORT_MODEL_FIELDS.items():
+        if name not in item_data and name not in _PET_IMPORT_REQUIRED:
+            continue
+        value = item_data.get(name, field.get_default())
+        if isinstance(field, models.BooleanField) and isinstance(value, str):
+            value = _BOOLEAN_VALUES.get(value.lower(), value)
+        if field.blank and value in field.empty_values:
+            values[field.attname] = None if field.null else field.get_default()
+            continue
+        try:
+            values[field.attname] = field.clean(value, None)
+        except ValidationError as e:
+            field_errors[name] = e.messages
+    return values, field_errors
+
+
+def _insert_pets(rows, batch_size):
+    """
+    Inserta las filas validadas ({attname: valor}). En PostgreSQL usa
+    COPY FROM STDIN, que evita construir instancias y compilar un INSERT
+    multi-fila por lote; en otros motores usa bulk_create.
+    """
+    if connection.vendor != 'postgresql':
+        Pet.objects.bulk_create([Pet(**row) for row in rows], batch_size=batch_size)
+        return
+
+    now = timezone.now()
+    fields = [field for field in Pet._meta.concrete_fields if not field.primary_key]
+    defaults = [
+        now if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+        else field.get_db_prep_save(field.get_default(), connection)
+        for field in fields
+    ]
+    columns = [(field.attname, default) for field, default in zip(fields, defaults)]
+    quoted = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+
+    with connection.cursor() as cursor:
+        with cursor.copy(f'COPY {Pet._meta.db_table} ({quoted}) FROM STDIN') as copy:
+            for row in rows:
+                copy.write_row([row.get(attname, default) for attname, default in columns])
+
+
+def _validate_pet_chunk(chunk, errors):
+    """
+    Valida un lote de (index, item) y regresa las filas ({attname: valor})
+    listas para insertar.
+    Resuelve todos los owner_email del lote en una consulta y las razas desde
+    el cache del catálogo.
+    """
+    items = [(index, item) for index, item in chunk if isinstance(item, dict)]
+    emails = {item.get('owner_email') for _, item in items if isinstance(item.get('owner_email'), str)}
+    owners = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+
+    breed_ids = set()
+    for _, item in items:
+        try:
+            breed_ids.add(int(item['breed']))
+        except (KeyError, TypeError, ValueError):
+            pass
+    breeds = catalog_cache.get_breeds(breed_ids)
+
+    rows = []
+    for index, item in chunk:
+        if not isinstance(item, dict):
+            errors.append(_error(index, None, str(item) if isinstance(item, Exception) else "Se esperaba un objeto"))
+            continue
+
+        item_data = dict(item)
+        owner_email = item_data.pop('owner_email', None)
+        breed = item_data.pop('breed', None)
+
+        for name in PET_IMPORT_IGNORED_FIELDS:
+            item_data.pop(name, None)
+
+        unknown = set(item_data) - set(PET_IMPORT_FIELDS)
+        if unknown:
+            errors.append(_error(index, item, f"Campos desconocidos: {', '.join(sorted(unknown))}"))
+            continue
+
+        owner_id = owners.get(owner_email) if isinstance(owner_email, str) else None
+        if owner_id is None:
+            errors.append(_error(index, item, f"Usuario con email '{owner_email}' no encontrado"))
+            continue
+
+        breed_id = None
+        if breed not in (None, ''):
+            try:
+                breed_instance = breeds.get(int(breed))
+            except (TypeError, ValueError):
+                breed_instance = None
+            if breed_instance is None:
+                errors.append(_error(index, item, f"Raza '{breed}' no encontrada"))
+                continue
+            breed_id = breed_instance.id
+
+        values, field_errors = _clean_pet_fields(item_data)
+        if field_errors:
+            errors.append(_error(index, item, field_errors))
+            continue
+
+        values.update(owner_id=owner_id, breed_id=breed_id)
+        rows.append(values)
+    return rows
+
+
+def import_pets(rows, batch_size=BULK_CREATE_BATCH_SIZE):
+    """
+    Crea Pet en lote a partir de un iterable de dicts (p. ej. read_pet_rows).
+    Procesa las filas en lotes de `batch_size` sin materializar el iterable:
+    por lote hace una consulta de dueños por email, resuelve las razas desde
+    el cache del catálogo, valida cada fila y la inserta con bulk_create
+    (con COPY en PostgreSQL) y suma las mascotas a OwnerPetCount.
+    Todo ocurre en una transacción. Las filas inválidas no se insertan y se
+    reportan con su índice.
+    Regresa (created, errors) con el número de mascotas creadas.
+    """
+    created = 0
+    errors = []
+    rows = enumerate(rows)
+
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            valid_rows = _validate_pet_chunk(chunk, errors)
+            _insert_pets(valid_rows, batch_size)
+            # Las razas ya se validaron, su tipo de animal sale del cache del catálogo
+            breeds = catalog_cache.get_breeds({row['breed_id'] for row in valid_rows if row['breed_id']})
+            animal_types = {breed_id: breed.animal_type_id for breed_id, breed in breeds.items()}
+            OwnerPetCount.adjust(added=[(row['owner_id'], animal_types.get(row['breed_id'])) for row in valid_rows])
+            created += len(valid_rows)
+
+    return created, errors
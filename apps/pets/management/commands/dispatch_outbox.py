@@ -0,0 +1,30 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.pets.outbox import dispatch_outbox
+
+
+class Command(BaseCommand):
+    help = "Envía las notificaciones pendientes del outbox (con --loop queda corriendo como despachador)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.PET_OUTBOX_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Sigue despachando hasta que se detenga el proceso")
+        parser.add_argument('--interval', type=float, default=2, help="Segundos de espera cuando no hay eventos")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            close_old_connections()
+            metrics = dispatch_outbox(batch_size)
+            if metrics['events'] or not options['loop']:
+                self.stdout.write(
+                    f"Eventos: {metrics['events']}  notificaciones: {metrics['notifications']}"
+                    f"  fallidas: {metrics['failed']}"
+                )
+            if not options['loop']:
+                return
+            # Lote incompleto: no hay más eventos listos por ahora
+            if metrics['events'] < batch_size:
+                time.sleep(options['interval'])
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.pets.tasks import expire_pending_transfers
+
+
+class Command(BaseCommand):
+    help = "Cancela las transferencias pendientes vencidas, por lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.PET_TRANSFER_EXPIRY_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        metrics = expire_pending_transfers(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Canceladas {metrics['expired']} transferencias vencidas "
+            f"en {metrics['batches']} lotes ({metrics['seconds']}s)"
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from apps.pets.models import Pet
+from apps.pets.tasks import generate_pet_photo_variants
+
+
+class Command(BaseCommand):
+    help = "Encola la generación de variantes WebP para las mascotas con foto sin variantes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Regenerar también las que ya tienen variantes")
+        parser.add_argument('--sync', action='store_true', help="Generarlas en este proceso en lugar de encolarlas")
+
+    def handle(self, *args, **options):
+        pets = Pet.objects.exclude(Q(photo__isnull=True) | Q(photo=''))
+        if not options['all']:
+            pets = pets.filter(Q(photo_thumbnail__isnull=True) | Q(photo_thumbnail=''))
+
+        total = 0
+        for pet_id, photo_name in pets.values_list('id', 'photo').iterator():
+            if options['sync']:
+                generate_pet_photo_variants(pet_id, photo_name)
+            else:
+                generate_pet_photo_variants.delay(pet_id, photo_name)
+            total += 1
+
+        action = "Generadas" if options['sync'] else "Encoladas"
+        self.stdout.write(self.style.SUCCESS(f"{action} las variantes de {total} mascotas"))
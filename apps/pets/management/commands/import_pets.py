@@ -0,0 +1,52 @@
+import csv
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from apps.pets.importers import BULK_CREATE_BATCH_SIZE, PET_IMPORT_FORMATS, import_pets, read_pet_rows
+
+
+class Command(BaseCommand):
+    help = "Importa mascotas desde un archivo CSV o NDJSON (misma lógica que POST /pets/bulk_import/)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Ruta del archivo")
+        parser.add_argument(
+            '--format', dest='file_format', choices=PET_IMPORT_FORMATS,
+            help="Formato del archivo (por defecto se toma de la extensión)"
+        )
+        parser.add_argument('--batch-size', type=int, default=BULK_CREATE_BATCH_SIZE)
+        parser.add_argument(
+            '--errors', help="Archivo NDJSON donde escribir el reporte de errores por fila"
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format == 'jsonl':
+            file_format = 'ndjson'
+
+        start = time.perf_counter()
+        try:
+            with open(path, 'rb') as file:
+                created, errors = import_pets(read_pet_rows(file, file_format), batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(f"No se pudo leer '{path}': {e}")
+        except (ValueError, csv.Error, IntegrityError) as e:
+            raise CommandError(f"Importación cancelada, no se creó ninguna mascota: {e}")
+        elapsed = time.perf_counter() - start
+
+        if options['errors']:
+            with open(options['errors'], 'w', encoding='utf-8') as report:
+                for error in errors:
+                    report.write(json.dumps(error, ensure_ascii=False, default=str) + '\n')
+        else:
+            for error in errors:
+                self.stderr.write(f"Fila {error['index']}: {error['error']}")
+
+        total = created + len(errors)
+        self.stdout.write(self.style.SUCCESS(
+            f"Procesados {total} registros en {elapsed:.2f}s "
+            f"({total / elapsed if elapsed else 0:,.0f} filas/s): {created} creados, {len(errors)} con error"
+        ))
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.pets.tasks import purge_deleted_pets
+
+
+class Command(BaseCommand):
+    help = "Borra definitivamente las mascotas eliminadas hace más de N días, por lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.PET_PURGE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=settings.PET_PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = purge_deleted_pets(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Purgadas {total} mascotas eliminadas"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from apps.pets.counters import reconcile_owner_pet_counts
+
+
+class Command(BaseCommand):
+    help = "Recalcula los contadores de mascotas por dueño (OwnerPetCount) y reporta las diferencias"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Solo reportar las diferencias, sin corregirlas")
+
+    def handle(self, *args, **options):
+        drift = reconcile_owner_pet_counts(dry_run=options['dry_run'])
+        for row in sorted(drift, key=lambda row: (row['owner'], row['animal_type'] or 0)):
+            self.stdout.write(
+                f"owner={row['owner']} animal_type={row['animal_type']} "
+                f"esperado={row['expected']} actual={row['actual']}"
+            )
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Los contadores están al día"))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} contadores con diferencias"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Corregidos {len(drift)} contadores"))
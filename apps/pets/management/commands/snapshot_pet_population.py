@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.pets.analytics import build_population_snapshot
+
+
+class Command(BaseCommand):
+    help = "Calcula (o recalcula) la foto de hoy del padrón de mascotas para las estadísticas"
+
+    def handle(self, *args, **options):
+        total = build_population_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Foto del padrón guardada ({total} filas)"))
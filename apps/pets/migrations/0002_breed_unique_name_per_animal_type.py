@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-18 07:54
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_breeds(apps, schema_editor):
+    """
+    Antes de crear la restricción, fusiona las razas repetidas por
+    (animal_type, name): las mascotas se reasignan a la raza más antigua
+    y las demás se eliminan.
+    En PostgreSQL las llaves foráneas son diferidas: sus revisiones se
+    ejecutan al final para que el ALTER TABLE de AddConstraint no falle con
+    "pending trigger events".
+    """
+    Breed = apps.get_model('pets', 'Breed')
+    Pet = apps.get_model('pets', 'Pet')
+
+    duplicates = (
+        Breed.objects.values('animal_type_id', 'name')
+        .annotate(total=Count('id'), keep_id=Min('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        extra_ids = list(
+            Breed.objects.filter(animal_type_id=duplicate['animal_type_id'], name=duplicate['name'])
+            .exclude(id=duplicate['keep_id'])
+            .values_list('id', flat=True)
+        )
+        Pet.objects.filter(breed_id__in=extra_ids).update(breed_id=duplicate['keep_id'])
+        Breed.objects.filter(id__in=extra_ids).delete()
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_breeds, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='breed',
+            constraint=models.UniqueConstraint(fields=('animal_type', 'name'), name='uniq_breed_name_per_animal_type'),
+        ),
+    ]
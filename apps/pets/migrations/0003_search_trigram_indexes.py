@@ -0,0 +1,54 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:20
+
+from django.db import migrations
+
+
+# Índices de búsqueda para TrigramSearchFilter (solo PostgreSQL).
+# Se crean con CONCURRENTLY para no bloquear escrituras en tablas grandes,
+# por eso la migración no es atómica.
+FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() es STABLE; la envoltura IMMUTABLE permite indexar la expresión
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+    $$ SELECT public.unaccent('public.unaccent', $1) $$
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS pets_pet_name_trgm_idx
+    ON pets_pet USING gin (f_unaccent(lower(name)) gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS pets_breed_name_trgm_idx
+    ON pets_breed USING gin (f_unaccent(lower(name)) gin_trgm_ops)
+    """,
+]
+
+REVERSE_SQL = [
+    "DROP INDEX CONCURRENTLY IF EXISTS pets_breed_name_trgm_idx",
+    "DROP INDEX CONCURRENTLY IF EXISTS pets_pet_name_trgm_idx",
+    "DROP FUNCTION IF EXISTS f_unaccent(text)",
+]
+
+
+def run_postgres_sql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('pets', '0002_breed_unique_name_per_animal_type'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_postgres_sql(FORWARD_SQL), run_postgres_sql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    AddIndex que en PostgreSQL crea y elimina el índice con CONCURRENTLY
+    para no bloquear escrituras en pets_pet (en otros motores es un AddIndex normal)
+    """
+
+    def _options(self, schema_editor):
+        return {'concurrently': True} if schema_editor.connection.vendor == 'postgresql' else {}
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, **self._options(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, **self._options(schema_editor))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('pets', '0004_pet_created_at_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['owner', 'created_at', 'id'], name='pets_pet_active_owner_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['breed'], name='pets_pet_active_breed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='pet',
+            index=models.Index(fields=['updated_at'], name='pets_pet_updated_at_idx'),
+        ),
+    ]
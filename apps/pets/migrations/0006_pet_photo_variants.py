@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0005_pet_active_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='photo_medium',
+            field=models.FileField(blank=True, editable=False, max_length=255, null=True, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='photo_thumbnail',
+            field=models.FileField(blank=True, editable=False, max_length=255, null=True, upload_to=''),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:21
+
+import apps.pets.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_pet_photo_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('digest', models.CharField(max_length=64)),
+                ('size', models.BigIntegerField(null=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='photo',
+            field=models.FileField(blank=True, null=True, storage=apps.pets.storage.get_pet_photo_storage, upload_to='pets/photos/'),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='photo_medium',
+            field=models.FileField(blank=True, editable=False, max_length=255, null=True, storage=apps.pets.storage.get_pet_photo_storage, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='photo_thumbnail',
+            field=models.FileField(blank=True, editable=False, max_length=255, null=True, storage=apps.pets.storage.get_pet_photo_storage, upload_to=''),
+        ),
+    ]
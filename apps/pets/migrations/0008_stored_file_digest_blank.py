@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0007_content_addressed_photo_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='storedfile',
+            name='digest',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:05
+
+import django.db.models.manager
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from apps.pets.operations import AddIndexConcurrently, RemoveIndexConcurrently
+
+
+# Las mascotas que ya estaban inactivas se toman como eliminadas en su
+# última actualización
+def backfill_deleted_at(apps, schema_editor):
+    Pet = apps.get_model('pets', 'Pet')
+    Pet._base_manager.filter(is_active=False, deleted_at__isnull=True).update(deleted_at=F('updated_at'))
+
+
+# El índice de búsqueda por nombre pasa a cubrir solo mascotas activas (solo PostgreSQL)
+FORWARD_SQL = [
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS pets_pet_active_name_trgm_idx
+    ON pets_pet USING gin (f_unaccent(lower(name)) gin_trgm_ops) WHERE is_active
+    """,
+    "DROP INDEX CONCURRENTLY IF EXISTS pets_pet_name_trgm_idx",
+]
+
+REVERSE_SQL = [
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS pets_pet_name_trgm_idx
+    ON pets_pet USING gin (f_unaccent(lower(name)) gin_trgm_ops)
+    """,
+    "DROP INDEX CONCURRENTLY IF EXISTS pets_pet_active_name_trgm_idx",
+]
+
+
+def run_postgres_sql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            # Sin f_unaccent (0003 no se aplicó) no hay índice de búsqueda que cambiar
+            cursor.execute("SELECT to_regprocedure('f_unaccent(text)') IS NOT NULL")
+            if not cursor.fetchone()[0]:
+                return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('pets', '0008_stored_file_digest_blank'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='pet',
+            options={'base_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='pet',
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_deleted_at, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['created_at', 'id'], name='pets_pet_active_created_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='pet',
+            name='pets_pet_created_id_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['deleted_at'], name='pets_pet_deleted_at_idx'),
+        ),
+        migrations.RunPython(run_postgres_sql(FORWARD_SQL), run_postgres_sql(REVERSE_SQL)),
+    ]
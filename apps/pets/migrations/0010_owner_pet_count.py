@@ -0,0 +1,55 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# Contadores iniciales a partir de las mascotas activas existentes
+def populate_owner_pet_counts(apps, schema_editor):
+    Pet = apps.get_model('pets', 'Pet')
+    OwnerPetCount = apps.get_model('pets', 'OwnerPetCount')
+    rows = (
+        Pet._base_manager.filter(is_active=True)
+        .values('owner_id', 'breed__animal_type_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    OwnerPetCount.objects.bulk_create(
+        [
+            OwnerPetCount(owner_id=row['owner_id'], animal_type_id=row['breed__animal_type_id'], count=row['total'])
+            for row in rows.iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0009_pet_soft_delete'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OwnerPetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('animal_type', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pets.animaltype')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pet_counts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ownerpetcount',
+            constraint=models.UniqueConstraint(condition=models.Q(('animal_type__isnull', False)), fields=('owner', 'animal_type'), name='uniq_owner_pet_count'),
+        ),
+        migrations.AddConstraint(
+            model_name='ownerpetcount',
+            constraint=models.UniqueConstraint(condition=models.Q(('animal_type__isnull', True)), fields=('owner',), name='uniq_owner_pet_count_without_type'),
+        ),
+        migrations.RunPython(populate_owner_pet_counts, migrations.RunPython.noop),
+    ]
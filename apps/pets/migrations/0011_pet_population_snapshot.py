@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0010_owner_pet_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PetPopulationSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sex', models.CharField(blank=True, max_length=1)),
+                ('neutered', models.BooleanField()),
+                ('microchip', models.BooleanField()),
+                ('age_band', models.CharField(max_length=8, null=True)),
+                ('weight_band', models.CharField(max_length=8, null=True)),
+                ('count', models.PositiveIntegerField()),
+                ('weight_kg_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('weighed_count', models.PositiveIntegerField(default=0)),
+                ('animal_type', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pets.animaltype')),
+                ('breed', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pets.breed')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='pets_population_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:37
+
+from django.conf import settings
+from django.db import migrations, models
+from apps.pets.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('pets', '0011_pet_population_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='pettransfer',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['expires_at'], name='pets_transfer_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:40
+
+from django.conf import settings
+from django.db import migrations, models
+from apps.pets.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('pets', '0012_pet_transfer_expiry_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # Primero el índice (code, status) y después se quita el índice de code,
+    # que queda cubierto por el nuevo
+    operations = [
+        AddIndexConcurrently(
+            model_name='pettransfer',
+            index=models.Index(fields=['code', 'status'], name='pets_transfer_code_status_idx'),
+        ),
+        migrations.AlterField(
+            model_name='pettransfer',
+            name='code',
+            field=models.CharField(max_length=16),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:15
+
+from django.conf import settings
+from django.db import migrations, models
+from apps.pets.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('pets', '0013_pet_transfer_code_status_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pettransfer',
+            name='batch_code',
+            field=models.CharField(blank=True, max_length=16, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='pettransfer',
+            index=models.Index(condition=models.Q(('batch_code__isnull', False)), fields=['batch_code', 'status'], name='pets_transfer_batch_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from apps.pets.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('pets', '0014_pet_transfer_batch_code'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # Primero los índices (usuario, created_at, id) y después se quitan los
+    # índices de las llaves foráneas, que quedan cubiertos por los nuevos
+    operations = [
+        AddIndexConcurrently(
+            model_name='pettransfer',
+            index=models.Index(fields=['from_user', 'created_at', 'id'], name='pets_transfer_from_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='pettransfer',
+            index=models.Index(fields=['to_user', 'created_at', 'id'], name='pets_transfer_to_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='pettransfer',
+            name='from_user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='pet_transfers_out', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='pettransfer',
+            name='to_user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='pet_transfers_in', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
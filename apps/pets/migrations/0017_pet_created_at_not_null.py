@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Now
+
+
+# Las mascotas sin created_at toman su última modificación (o la fecha actual)
+def fill_pet_created_at(apps, schema_editor):
+    Pet = apps.get_model('pets', 'Pet')
+    Pet._base_manager.filter(created_at__isnull=True).update(created_at=Coalesce('updated_at', Now()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0016_outbox_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_pet_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='pet',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from collections import Counter
+from django.db import connection, models, transaction, IntegrityError
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 from apps.accounts.models import User
+from .storage import get_pet_photo_storage
+import math
 import secrets
 import string
 
@@ -41,6 +45,43 @@ class Breed(models.Model):
     def __str__(self):
         return f"{self.id} - {self.name}"
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["animal_type", "name"],
+                name="uniq_breed_name_per_animal_type"
+            )
+        ]
+
+
+class PetQuerySet(models.QuerySet):
+
+    def soft_delete(self):
+        """
+        Borrado lógico de las mascotas activas del queryset en un solo UPDATE
+        y descuento de los contadores por dueño en la misma transacción
+        """
+        with transaction.atomic():
+            rows = list(
+                self.filter(is_active=True).select_for_update(of=("self",))
+                .values_list("id", "owner_id", "breed__animal_type_id")
+            )
+            if not rows:
+                return 0
+            now = timezone.now()
+            deleted = self.model.all_objects.filter(id__in=[row[0] for row in rows]).update(
+                is_active=False, deleted_at=now, updated_at=now
+            )
+            OwnerPetCount.adjust(removed=[(owner_id, animal_type_id) for _, owner_id, animal_type_id in rows])
+        return deleted
+
+
+class ActivePetManager(models.Manager.from_queryset(PetQuerySet)):
+    """Manager por defecto de Pet: solo las mascotas activas (no eliminadas)"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
+
 
 class Pet(models.Model):
     id = models.AutoField(primary_key=True, editable=False)
@@ -64,25 +105,248 @@ class Pet(models.Model):
     weight_kg = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     height_cm = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
 
-    photo = models.FileField(upload_to='pets/photos/', null=True, blank=True)
+    photo = models.FileField(upload_to='pets/photos/', storage=get_pet_photo_storage, null=True, blank=True)
+    # Variantes WebP de la foto, las genera apps.pets.tasks después de la subida
+    photo_thumbnail = models.FileField(
+        max_length=255, storage=get_pet_photo_storage, null=True, blank=True, editable=False
+    )
+    photo_medium = models.FileField(
+        max_length=255, storage=get_pet_photo_storage, null=True, blank=True, editable=False
+    )
 
-    is_active = models.BooleanField(default=True)
     last_transferred_at = models.DateTimeField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    # No nulo: es la llave de KeysetPagination junto con el id
+    created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True, null=True)
+    # Momento del borrado lógico (is_active=False); la purga usa esta fecha
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Pet.objects omite las mascotas eliminadas; Pet.all_objects las incluye
+    objects = ActivePetManager()
+    all_objects = PetQuerySet.as_manager()
 
 
     def __str__(self):
         return f"{self.id} - {self.name}"
 
+    @property
+    def counter_key(self):
+        """(owner_id, animal_type_id) de la mascota en OwnerPetCount"""
+        return self.owner_id, self.breed.animal_type_id if self.breed_id else None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        pet = super().from_db(db, field_names, values)
+        pet._counted = pet._counter_state()
+        return pet
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._counted = self._counter_state()
+
+    def _counter_state(self):
+        """(owner_id, breed_id, is_active) cargados, o None si alguno está diferido"""
+        state = tuple(self.__dict__.get(name) for name in ("owner_id", "breed_id", "is_active"))
+        return None if None in (state[0], state[2]) or "breed_id" not in self.__dict__ else state
+
+    def save(self, *args, **kwargs):
+        """
+        Guarda la mascota y ajusta OwnerPetCount en la misma transacción
+        cuando cambian su dueño, su raza (tipo de animal) o si está activa,
+        venga el cambio de la API, del admin o de cualquier otro código.
+        QuerySet.update() y bulk_create() no pasan por aquí: quien los use
+        debe llamar a OwnerPetCount.adjust (ver PetQuerySet.soft_delete,
+        PetTransfer.accept e import_pets).
+        """
+        if self._state.adding:
+            previous = None
+        else:
+            previous = getattr(self, "_counted", None) or (
+                Pet.all_objects.filter(pk=self.pk).values_list("owner_id", "breed_id", "is_active").first()
+            )
+        current = (self.owner_id, self.breed_id, self.is_active)
+        if previous == current:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            removed, added = [], []
+            if previous and previous[2]:
+                owner_id, breed_id, _ = previous
+                if breed_id is None:
+                    animal_type_id = None
+                elif breed_id == self.breed_id:
+                    animal_type_id = self.breed.animal_type_id
+                else:
+                    animal_type_id = Breed.objects.filter(pk=breed_id).values_list("animal_type_id", flat=True).first()
+                removed.append((owner_id, animal_type_id))
+            if self.is_active:
+                added.append(self.counter_key)
+            OwnerPetCount.adjust(added=added, removed=removed)
+        self._counted = current
+
+    class Meta:
+        # Las relaciones (p. ej. PetTransfer.pet) deben resolver también mascotas eliminadas
+        base_manager_name = "all_objects"
+        indexes = [
+            # Parciales: las consultas de la API siempre filtran is_active=True
+            # Respaldo de KeysetPagination (orden por created_at, id)
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(is_active=True),
+                name="pets_pet_active_created_idx"
+            ),
+            models.Index(
+                fields=["owner", "created_at", "id"],
+                condition=models.Q(is_active=True),
+                name="pets_pet_active_owner_idx"
+            ),
+            models.Index(
+                fields=["breed"],
+                condition=models.Q(is_active=True),
+                name="pets_pet_active_breed_idx"
+            ),
+            models.Index(fields=["updated_at"], name="pets_pet_updated_at_idx"),
+            # Mascotas eliminadas pendientes de purga
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(is_active=False),
+                name="pets_pet_deleted_at_idx"
+            ),
+        ]
+
+
+class OwnerPetCount(models.Model):
+    """
+    Número de mascotas activas por dueño y tipo de animal (desnormalizado).
+    Se actualiza en la misma transacción que el alta, baja, cambio de raza y
+    transferencia de mascotas: Pet.save y las señales de borrado de Pet y
+    Breed (apps.pets.signals) cubren los cambios por instancia; los UPDATE y
+    bulk_create llaman a adjust. reconcile_owner_pet_counts (tarea diaria)
+    corrige cualquier diferencia que quede.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pet_counts")
+    # Nulo para las mascotas sin raza
+    animal_type = models.ForeignKey(AnimalType, on_delete=models.CASCADE, null=True, related_name="+")
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.owner_id} - {self.animal_type_id}: {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "animal_type"],
+                condition=models.Q(animal_type__isnull=False),
+                name="uniq_owner_pet_count"
+            ),
+            models.UniqueConstraint(
+                fields=["owner"],
+                condition=models.Q(animal_type__isnull=True),
+                name="uniq_owner_pet_count_without_type"
+            ),
+        ]
+
+    @classmethod
+    def adjust(cls, added=(), removed=()):
+        """
+        Suma las mascotas `added` y resta las `removed` (iterables de
+        (owner_id, animal_type_id)) a los contadores, creando las filas que
+        falten. Bloquea las filas en orden para no generar deadlocks entre
+        transacciones concurrentes; debe llamarse dentro de la transacción
+        del cambio.
+        """
+        deltas = Counter(added)
+        deltas.subtract(removed)
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        owners = {owner_id for owner_id, _ in deltas}
+        existing = {
+            (counter.owner_id, counter.animal_type_id): counter
+            for counter in cls.objects.select_for_update().filter(owner_id__in=owners).order_by("owner_id", "id")
+        }
+        now = timezone.now()
+        changed = []
+        missing = []
+        for (owner_id, animal_type_id), delta in deltas.items():
+            counter = existing.get((owner_id, animal_type_id))
+            if counter is None:
+                missing.append(cls(owner_id=owner_id, animal_type_id=animal_type_id, count=delta))
+            else:
+                counter.count = F("count") + delta
+                counter.updated_at = now
+                changed.append(counter)
+        if changed:
+            cls.objects.bulk_update(changed, ["count", "updated_at"])
+        if not missing:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.bulk_create(missing)
+        except IntegrityError:
+            # Otra transacción creó alguna de las filas después de la lectura
+            for counter in missing:
+                counters = cls.objects.filter(owner_id=counter.owner_id, animal_type_id=counter.animal_type_id)
+                if not counters.update(count=F("count") + counter.count, updated_at=now):
+                    counter.save()
+
+
+class PetPopulationSnapshot(models.Model):
+    """
+    Foto diaria del padrón de mascotas activas agregada por tipo de animal,
+    raza, sexo, esterilización, microchip, rango de edad y de peso (ver
+    apps.pets.analytics). El peso se guarda como suma y número de mascotas
+    con peso para poder promediar al reagrupar.
+    """
+    date = models.DateField()
+    animal_type = models.ForeignKey(AnimalType, on_delete=models.SET_NULL, null=True, related_name="+")
+    breed = models.ForeignKey(Breed, on_delete=models.SET_NULL, null=True, related_name="+")
+    sex = models.CharField(max_length=1, blank=True)
+    neutered = models.BooleanField()
+    microchip = models.BooleanField()
+    # Nulos cuando la mascota no tiene fecha de nacimiento o peso
+    age_band = models.CharField(max_length=8, null=True)
+    weight_band = models.CharField(max_length=8, null=True)
+    count = models.PositiveIntegerField()
+    weight_kg_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    weighed_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date} - {self.animal_type_id}/{self.breed_id}: {self.count}"
+
+    class Meta:
+        indexes = [models.Index(fields=["date"], name="pets_population_date_idx")]
+
+
+class StoredFile(models.Model):
+    """
+    Objeto del storage direccionado por contenido (ver apps.pets.storage)
+    con el número de campos que lo referencian
+    """
+    name = models.CharField(max_length=255, unique=True)
+    # Vacío en las subidas directas al storage (no pasan por el servidor)
+    digest = models.CharField(max_length=64, blank=True)
+    size = models.BigIntegerField(null=True)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
 
 class PetTransfer(models.Model):
     id = models.AutoField(primary_key=True, editable=False)
     pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name="transfers")
-    from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pet_transfers_out")
-    to_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pet_transfers_in")
+    # Indexados junto con created_at en Meta.indexes (historial de transferencias)
+    from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pet_transfers_out", db_index=False)
+    to_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pet_transfers_in", db_index=False)
 
-    code = models.CharField(max_length=16, db_index=True)
+    code = models.CharField(max_length=16)
+    # Código compartido por las transferencias creadas juntas (start_batch)
+    batch_code = models.CharField(max_length=16, null=True, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -94,7 +358,26 @@ class PetTransfer(models.Model):
         return f"{self.id}"
 
     class Meta:
-        indexes = [models.Index(fields=["pet", "status"])]
+        indexes = [
+            models.Index(fields=["pet", "status"]),
+            # Aceptación por código (PetTransfer.accept)
+            models.Index(fields=["code", "status"], name="pets_transfer_code_status_idx"),
+            # Transferencias pendientes por vencer (expire_pending_transfers)
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(status="pending"),
+                name="pets_transfer_expiry_idx"
+            ),
+            # Historial por usuario en orden (created_at, id), ver PetTransferViewSet
+            models.Index(fields=["from_user", "created_at", "id"], name="pets_transfer_from_created_idx"),
+            models.Index(fields=["to_user", "created_at", "id"], name="pets_transfer_to_created_idx"),
+            # Aceptación por lote (PetTransfer.accept_batch)
+            models.Index(
+                fields=["batch_code", "status"],
+                condition=models.Q(batch_code__isnull=False),
+                name="pets_transfer_batch_idx"
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["pet"],
@@ -108,23 +391,156 @@ class PetTransfer(models.Model):
         alphabet = string.ascii_letters + string.digits
         return "".join(secrets.choice(alphabet) for _ in range(length))
 
+    @staticmethod
+    def cooldown_days(last_transferred_at) -> int:
+        """Días que faltan para poder transferir de nuevo (PET_TRANSFER_COOLDOWN_DAYS), 0 si ya se puede"""
+        if not last_transferred_at:
+            return 0
+        cooldown_days = int(getattr(settings, "PET_TRANSFER_COOLDOWN_DAYS", 7))
+        remaining = last_transferred_at + timedelta(days=cooldown_days) - timezone.now()
+        return max(0, math.ceil(remaining / timedelta(days=1)))
+
     @classmethod
     def start(cls, *, pet: Pet, from_user, to_user, ttl_hours: int = 48) -> "PetTransfer":
         if from_user.id == to_user.id:
             raise ValueError("El receptor no puede ser el mismo que el emisor.")
         code = cls.generate_code(12)
         expires = timezone.now() + timedelta(hours=ttl_hours)
-        return cls.objects.create(
-            pet=pet, from_user=from_user, to_user=to_user, code=code, expires_at=expires
-        )
+        with transaction.atomic():
+            transfer = cls.objects.create(
+                pet=pet, from_user=from_user, to_user=to_user, code=code, expires_at=expires
+            )
+            OutboxEvent.publish([transfer.started_event()])
+        return transfer
+
+    @classmethod
+    def start_batch(cls, *, pet_ids, from_user, to_user, ttl_hours: int = 48) -> list:
+        """
+        Crea con un solo INSERT una transferencia pendiente por mascota, todas
+        bajo el mismo `batch_code` (cada una conserva su propio código)
+        """
+        if from_user.id == to_user.id:
+            raise ValueError("El receptor no puede ser el mismo que el emisor.")
+        batch_code = cls.generate_code(12)
+        expires = timezone.now() + timedelta(hours=ttl_hours)
+        with transaction.atomic():
+            transfers = cls.objects.bulk_create([
+                cls(
+                    pet_id=pet_id, from_user=from_user, to_user=to_user,
+                    code=cls.generate_code(12), batch_code=batch_code, expires_at=expires
+                )
+                for pet_id in pet_ids
+            ])
+            OutboxEvent.publish([transfer.started_event() for transfer in transfers])
+        return transfers
+
+    @classmethod
+    def accept_batch(cls, *, batch_code, to_user):
+        """
+        Acepta en una transacción todas las transferencias pendientes y
+        vigentes del lote `batch_code` dirigidas a `to_user`, con un UPDATE
+        de las transferencias y otro de las mascotas (igual que `accept`).
+        Regresa los ids de las mascotas (vacío si no había nada que aceptar).
+        Lanza ValueError (y no acepta nada) si alguna mascota se eliminó o ya
+        no pertenece al emisor.
+        """
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {cls._meta.db_table} SET status = 'accepted', accepted_at = %s"
+                " WHERE batch_code = %s AND status = 'pending' AND to_user_id = %s"
+                " AND (expires_at IS NULL OR expires_at > %s)"
+                " RETURNING pet_id, from_user_id",
+                [now, batch_code, to_user.id, now]
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return []
+            pet_ids = [pet_id for pet_id, _ in rows]
+            # Un lote tiene un solo emisor
+            from_user_id = rows[0][1]
+
+            pets, breeds = Pet._meta.db_table, Breed._meta.db_table
+            cursor.execute(
+                f"UPDATE {pets} SET owner_id = %s, last_transferred_at = %s, updated_at = %s"
+                f" WHERE id IN ({', '.join(['%s'] * len(pet_ids))}) AND owner_id = %s AND is_active"
+                f" RETURNING (SELECT animal_type_id FROM {breeds} WHERE {breeds}.id = {pets}.breed_id)",
+                [to_user.id, now, now, *pet_ids, from_user_id]
+            )
+            animal_types = [animal_type_id for animal_type_id, in cursor.fetchall()]
+            if len(animal_types) != len(pet_ids):
+                # Revierte también el UPDATE de las transferencias
+                raise ValueError("Alguna mascota fue eliminada o ya no pertenece al emisor.")
+            OwnerPetCount.adjust(
+                added=[(to_user.id, animal_type_id) for animal_type_id in animal_types],
+                removed=[(from_user_id, animal_type_id) for animal_type_id in animal_types]
+            )
+            OutboxEvent.publish([
+                ("transfer_accepted", from_user_id, {"pet": pet_id, "to_user": to_user.id}) for pet_id in pet_ids
+            ])
+        return pet_ids
+
+    @classmethod
+    def accept(cls, *, code, to_user):
+        """
+        Acepta la transferencia pendiente y vigente `code` dirigida a
+        `to_user` sin bloqueos explícitos: un UPDATE condicionado sobre
+        (code, status) ... RETURNING pet_id y un UPDATE del dueño de la
+        mascota (más su contador). Si dos peticiones compiten por la misma
+        transferencia solo una encuentra status = 'pending'.
+        Regresa el id de la mascota o None si no había transferencia que
+        aceptar. Lanza ValueError (y no acepta nada) si la mascota se
+        eliminó o ya no pertenece al emisor.
+        """
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {cls._meta.db_table} SET status = 'accepted', accepted_at = %s"
+                " WHERE code = %s AND status = 'pending' AND to_user_id = %s"
+                " AND (expires_at IS NULL OR expires_at > %s)"
+                " RETURNING pet_id, from_user_id",
+                [now, code, to_user.id, now]
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            pet_id, from_user_id = row
+
+            pets, breeds = Pet._meta.db_table, Breed._meta.db_table
+            cursor.execute(
+                f"UPDATE {pets} SET owner_id = %s, last_transferred_at = %s, updated_at = %s"
+                f" WHERE id = %s AND owner_id = %s AND is_active"
+                f" RETURNING (SELECT animal_type_id FROM {breeds} WHERE {breeds}.id = {pets}.breed_id)",
+                [to_user.id, now, now, pet_id, from_user_id]
+            )
+            row = cursor.fetchone()
+            if row is None:
+                # Revierte también el UPDATE de la transferencia
+                raise ValueError("La mascota fue eliminada o ya no pertenece al emisor.")
+            OwnerPetCount.adjust(added=[(to_user.id, row[0])], removed=[(from_user_id, row[0])])
+            OutboxEvent.publish([("transfer_accepted", from_user_id, {"pet": pet_id, "to_user": to_user.id})])
+        return pet_id
+
+    def started_event(self):
+        """Evento de la transferencia iniciada para el receptor (con el código para aceptarla)"""
+        payload = {"pet": self.pet_id, "from_user": self.from_user_id, "code": self.code}
+        if self.batch_code:
+            payload["batch_code"] = self.batch_code
+        return ("transfer_started", self.to_user_id, payload)
 
     def mark_accepted(self):
+        """Acepta la transferencia: la mascota pasa a `to_user` (Pet.save mueve su contador)"""
         self.status = "accepted"
         self.accepted_at = timezone.now()
-        self.save(update_fields=["status", "accepted_at"])
-        pet = self.pet
-        pet.last_transferred_at = self.accepted_at
-        pet.save(update_fields=["last_transferred_at"])
+        with transaction.atomic():
+            self.save(update_fields=["status", "accepted_at"])
+            pet = self.pet
+            pet.owner_id = self.to_user_id
+            pet.last_transferred_at = self.accepted_at
+            pet.save(update_fields=["owner", "last_transferred_at"])
+            OutboxEvent.publish([
+                ("transfer_accepted", self.from_user_id, {"pet": pet.id, "to_user": self.to_user_id})
+            ])
 
     def mark_cancelled(self):
         self.status = "cancelled"
@@ -136,3 +552,61 @@ class PetTransfer(models.Model):
 
     def __str__(self):
         return f"Transfer {self.id} pet={self.pet_id} status={self.status}"
+
+
+OUTBOX_EVENT_KINDS = [
+        ("pet_created", "Pet created"),
+        ("transfer_started", "Transfer started"),
+        ("transfer_accepted", "Transfer accepted"),
+    ]
+
+OUTBOX_STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+
+class OutboxEvent(models.Model):
+    """
+    Evento de dominio por notificar a `recipient` (outbox transaccional).
+    Se escribe en la misma transacción que el cambio que lo origina, así que
+    solo existe si el cambio se confirmó; dispatch_outbox lo envía después,
+    fuera de la petición (ver apps.pets.outbox).
+    """
+    id = models.BigAutoField(primary_key=True, editable=False)
+    kind = models.CharField(max_length=30, choices=OUTBOX_EVENT_KINDS)
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Siguiente intento (se recorre con cada reintento fallido)
+    available_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} -> {self.recipient_id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Eventos por enviar en orden (dispatch_outbox)
+            models.Index(
+                fields=["available_at", "id"],
+                condition=models.Q(status="pending"),
+                name="pets_outbox_pending_idx"
+            ),
+        ]
+
+    @classmethod
+    def publish(cls, events):
+        """
+        Registra los eventos (kind, recipient_id, payload) con un solo
+        INSERT; debe llamarse dentro de la transacción del cambio
+        """
+        return cls.objects.bulk_create([
+            cls(kind=kind, recipient_id=recipient_id, payload=payload)
+            for kind, recipient_id, payload in events
+        ])
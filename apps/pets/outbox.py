@@ -0,0 +1,180 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from apps.accounts.models import User
+from .models import OutboxEvent, Pet
+
+
+logger = logging.getLogger(__name__)
+
+# Asunto de la notificación cuando solo tiene un evento
+EVENT_SUBJECTS = {
+    "pet_created": "Registraste una mascota",
+    "transfer_started": "Tienes una transferencia de mascota pendiente",
+    "transfer_accepted": "Se aceptó tu transferencia de mascota",
+}
+
+
+class Notification:
+    """Mensaje para un destinatario que agrupa uno o varios eventos del outbox"""
+
+    def __init__(self, recipient, subject, lines, events):
+        self.recipient = recipient
+        self.subject = subject
+        self.lines = lines
+        self.events = events
+
+    @property
+    def body(self):
+        return "\n".join(self.lines)
+
+
+class EmailTransport:
+    """Envía cada notificación como correo con el EMAIL_BACKEND configurado"""
+
+    def send(self, notification):
+        send_mail(notification.subject, notification.body, None, [notification.recipient.email])
+
+
+class InMemoryTransport:
+    """
+    Guarda las notificaciones en `sent` en lugar de enviarlas (pruebas);
+    las de los destinatarios en `failing` fallan como lo haría el correo
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.failing = set()
+
+    def send(self, notification):
+        if notification.recipient.id in self.failing:
+            raise ConnectionError(f"Destinatario {notification.recipient.id} no disponible")
+        self.sent.append(notification)
+
+
+def get_outbox_transport():
+    """Transporte de las notificaciones (setting PET_OUTBOX_TRANSPORT)"""
+    return import_string(getattr(settings, "PET_OUTBOX_TRANSPORT", "apps.pets.outbox.EmailTransport"))()
+
+
+def retry_delay(attempts):
+    """Espera exponencial antes del siguiente intento: base, 2*base, 4*base... hasta el máximo"""
+    base = int(getattr(settings, "PET_OUTBOX_RETRY_BASE_SECONDS", 30))
+    maximum = int(getattr(settings, "PET_OUTBOX_RETRY_MAX_SECONDS", 3600))
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), maximum))
+
+
+def build_notifications(events):
+    """
+    Agrupa los eventos por destinatario en una notificación cada uno. Las
+    transferencias iniciadas de un mismo lote se resumen en una sola línea.
+    Mascotas y usuarios se leen con una consulta para todo el lote.
+    """
+    pet_ids = {event.payload["pet"] for event in events if "pet" in event.payload}
+    user_ids = {event.recipient_id for event in events}
+    user_ids.update(
+        event.payload[key] for event in events for key in ("from_user", "to_user") if key in event.payload
+    )
+    pets = Pet.all_objects.only("id", "name").in_bulk(pet_ids)
+    users = User.objects.only("id", "email").in_bulk(user_ids)
+
+    def pet_name(pet_id):
+        pet = pets.get(pet_id)
+        return pet.name if pet else f"#{pet_id}"
+
+    def email(user_id):
+        user = users.get(user_id)
+        return user.email if user else "otro usuario"
+
+    by_recipient = defaultdict(list)
+    for event in events:
+        by_recipient[event.recipient_id].append(event)
+
+    notifications = []
+    for recipient_id, recipient_events in by_recipient.items():
+        lines = []
+        batches = defaultdict(list)
+        for event in recipient_events:
+            payload = event.payload
+            if event.kind == "transfer_started" and payload.get("batch_code"):
+                batches[payload["batch_code"]].append(event)
+            elif event.kind == "transfer_started":
+                lines.append(
+                    f"{email(payload['from_user'])} quiere transferirte a {pet_name(payload['pet'])}."
+                    f" Código para aceptarla: {payload['code']}"
+                )
+            elif event.kind == "transfer_accepted":
+                lines.append(f"{email(payload['to_user'])} aceptó la transferencia de {pet_name(payload['pet'])}.")
+            else:
+                lines.append(f"Registraste a {pet_name(payload['pet'])}.")
+        for batch_code, batch_events in batches.items():
+            names = ", ".join(pet_name(event.payload["pet"]) for event in batch_events)
+            lines.append(
+                f"{email(batch_events[0].payload['from_user'])} quiere transferirte {len(batch_events)}"
+                f" mascota(s): {names}. Código del lote para aceptarlas: {batch_code}"
+            )
+
+        if len(recipient_events) == 1:
+            subject = EVENT_SUBJECTS[recipient_events[0].kind]
+        else:
+            subject = f"Tienes {len(recipient_events)} novedades de tus mascotas"
+        notifications.append(Notification(users.get(recipient_id), subject, lines, recipient_events))
+    return notifications
+
+
+def dispatch_outbox(batch_size=None, transport=None):
+    """
+    Envía un lote de eventos pendientes del outbox, una notificación por
+    destinatario. Los eventos se reclaman con SELECT ... FOR UPDATE SKIP
+    LOCKED, así que varios despachadores pueden correr a la vez sin tomar
+    los mismos. Si el envío a un destinatario falla, sus eventos se
+    reintentan más tarde (retry_delay) y tras PET_OUTBOX_MAX_ATTEMPTS
+    quedan como fallidos. Regresa métricas del lote.
+    """
+    batch_size = batch_size or int(getattr(settings, "PET_OUTBOX_BATCH_SIZE", 100))
+    max_attempts = int(getattr(settings, "PET_OUTBOX_MAX_ATTEMPTS", 8))
+    transport = transport or get_outbox_transport()
+    now = timezone.now()
+
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(status="pending", available_at__lte=now)
+            .order_by("available_at", "id")[:batch_size]
+        )
+        metrics = {"events": len(events), "notifications": 0, "failed": 0}
+        if not events:
+            return metrics
+
+        sent, retried = [], []
+        for notification in build_notifications(events):
+            try:
+                transport.send(notification)
+            except Exception as e:
+                logger.warning("No se pudo notificar al usuario %s: %s", notification.recipient.id, e)
+                metrics["failed"] += 1
+                for event in notification.events:
+                    event.attempts += 1
+                    event.last_error = str(e)
+                    if event.attempts >= max_attempts:
+                        event.status = "failed"
+                    else:
+                        event.available_at = now + retry_delay(event.attempts)
+                    retried.append(event)
+            else:
+                metrics["notifications"] += 1
+                sent.extend(event.id for event in notification.events)
+
+        if sent:
+            OutboxEvent.objects.filter(id__in=sent).update(
+                status="sent", sent_at=timezone.now(), attempts=F("attempts") + 1
+            )
+        if retried:
+            OutboxEvent.objects.bulk_update(retried, ["attempts", "last_error", "status", "available_at"])
+    return metrics
@@ -0,0 +1,201 @@
+import base64
+import json
+import operator
+from django.core.exceptions import ValidationError
+from django.db.models import BooleanField, Expression, F, Value
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class RowComparison(Expression):
+    """
+    Comparación de valores de fila: (a, b, ...) < (va, vb, ...). PostgreSQL
+    la usa completa como condición de un índice (a, b, ...), a diferencia de
+    su expansión (a < va) OR (a = va AND b < vb)
+    """
+    conditional = True
+    output_field = BooleanField()
+
+    def __init__(self, lhs, operator, rhs):
+        super().__init__()
+        self.lhs, self.operator, self.rhs = list(lhs), operator, list(rhs)
+
+    def get_source_expressions(self):
+        return self.lhs + self.rhs
+
+    def set_source_expressions(self, exprs):
+        self.lhs, self.rhs = exprs[:len(self.lhs)], exprs[len(self.lhs):]
+
+    def as_sql(self, compiler, connection):
+        sides, params = [], []
+        for expressions in (self.lhs, self.rhs):
+            sql = []
+            for expression in expressions:
+                expression_sql, expression_params = compiler.compile(expression)
+                sql.append(expression_sql)
+                params.extend(expression_params)
+            sides.append('(%s)' % ', '.join(sql))
+        return f'{sides[0]} {self.operator} {sides[1]}', params
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) en orden descendente sobre `ordering`.
+    En lugar de OFFSET + COUNT(*), cada página filtra a partir de los valores
+    de la última fila vista (WHERE (created_at, id) < (...)), por lo que el
+    costo no crece con la profundidad. No regresa el total de registros.
+    Los campos de `ordering` no deben ser nulos y el último debe ser único
+    (normalmente el id). Un cursor alterado o inválido responde 400.
+    """
+    ordering = ('created_at', 'id')
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = [self.get_model(queryset)._meta.get_field(name) for name in self.ordering]
+        limit = self.get_page_size(request)
+
+        position, reverse = self.decode_cursor(request)
+        rows = self.get_rows(queryset, position, reverse, limit + 1)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if reverse:
+            rows.reverse()
+
+        # Al ir hacia atrás siempre hay página siguiente; al ir hacia adelante
+        # hay anterior si se llegó con un cursor
+        self.has_next = has_more if not reverse else True
+        self.has_previous = position is not None if not reverse else has_more
+        self.page = rows
+        return rows
+
+    def get_model(self, queryset):
+        return queryset.model
+
+    def get_rows(self, queryset, position, reverse, limit):
+        """Las primeras `limit` filas después de `position` en el orden de la página"""
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position, reverse))
+        prefix = '' if reverse else '-'
+        return list(queryset.order_by(*(prefix + name for name in self.ordering))[:limit])
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Página vacía después del final: regresar al inicio
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def position_filter(self, position, reverse):
+        """Condición "después de `position`" en el orden de la página: (created_at, id) < (...)"""
+        return RowComparison(
+            [F(field.name) for field in self.fields],
+            '>' if reverse else '<',
+            [Value(value, output_field=field) for field, value in zip(self.fields, position)],
+        )
+
+    def encode_cursor(self, obj, reverse):
+        values = []
+        for field in self.fields:
+            # Las filas pueden ser instancias o dicts de values()
+            value = obj[field.name] if isinstance(obj, dict) else getattr(obj, field.attname)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'p': values, 'r': reverse}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            values = payload['p']
+            if not isinstance(values, list) or len(values) != len(self.fields) or None in values:
+                raise ValueError
+            # clean() también valida los rangos (p. ej. un id fuera de bigint)
+            position = [field.clean(value, None) for field, value in zip(self.fields, values)]
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise ParseError(self.invalid_cursor_message)
+
+
+class MergedKeysetPagination(KeysetPagination):
+    """
+    KeysetPagination sobre la unión de varias consultas del mismo modelo
+    (recibe una lista de querysets), p. ej. transferencias enviadas y
+    recibidas. Un WHERE a = x OR b = x no puede recorrer un índice en orden,
+    así que cada consulta se pagina por separado sobre su propio índice
+    (a, ...ordering) y las páginas se mezclan. Las filas deben ser
+    instancias.
+    """
+
+    def get_model(self, queryset):
+        return queryset[0].model
+
+    def get_rows(self, queryset, position, reverse, limit):
+        rows = {}
+        for branch in queryset:
+            for row in super().get_rows(branch, position, reverse, limit):
+                rows[row.pk] = row
+        key = operator.attrgetter(*(field.attname for field in self.fields))
+        return sorted(rows.values(), key=key, reverse=not reverse)[:limit]
+
+
+class CursorPaginationMixin:
+    """
+    Para ViewSets con LimitOffsetPagination: con ?pagination=cursor la
+    petición se pagina con `cursor_pagination_class` en su lugar
+    """
+    cursor_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        request = getattr(self, 'request', None)
+        if (
+            not hasattr(self, '_paginator')
+            and request is not None
+            and request.query_params.get('pagination') == 'cursor'
+        ):
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
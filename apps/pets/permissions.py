@@ -0,0 +1,10 @@
+from rest_framework import permissions
+
+
+class IsBranchUser(permissions.BasePermission):
+    """Sucursales y veterinarios (o administradores)"""
+    roles = ('sucursal', 'veterinario')
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.is_staff or user.role in self.roles))
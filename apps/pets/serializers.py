@@ -1,5 +1,9 @@
+from django.conf import settings
 from rest_framework import serializers
+from config.core.fieldsets import SparseFieldsetsMixin
 from .models import *
+from .cache import catalog_cache
+from .uploads import PHOTO_UPLOAD_CONTENT_TYPES, verify_photo
 
 
 class AnimalTypeSerializer(serializers.ModelSerializer):
@@ -22,17 +26,18 @@ class AnimalTypeBulkCreateSerializer(serializers.Serializer):
 
     def validate_data(self, value):
         """Validar cada elemento del array"""
-        for item in value:
+        for index, item in enumerate(value):
             if 'slug' not in item or 'name' not in item:
                 raise serializers.ValidationError(
                     "Cada item debe tener 'slug' y 'name'"
                 )
-            
-            # Validar slug único
-            if AnimalType.objects.filter(slug=item['slug']).exists():
+            # El importador los usa como llaves de conjuntos y diccionarios
+            if not isinstance(item['slug'], str) or not isinstance(item['name'], str):
                 raise serializers.ValidationError(
-                    f"El slug '{item['slug']}' ya existe"
+                    f"Item {index}: 'slug' y 'name' deben ser texto"
                 )
+        # La unicidad del slug se valida en la vista con una sola consulta
+        # para todo el lote y se reporta por índice
         return value
 
 
@@ -65,13 +70,12 @@ class BreedBulkCreateSerializer(serializers.Serializer):
                     raise serializers.ValidationError(
                         f"Item {index}: Campo requerido '{field}' faltante"
                     )
+                if not isinstance(item[field], str):
+                    raise serializers.ValidationError(
+                        f"Item {index}: El campo '{field}' debe ser texto"
+                    )
             
-            # Validar que el animal_type_slug existe
-            animal_type_slug = item['animal_type_slug']
-            if not AnimalType.objects.filter(slug=animal_type_slug, is_active=True).exists():
-                raise serializers.ValidationError(
-                    f"Item {index}: AnimalType con slug '{animal_type_slug}' no existe o está inactivo"
-                )
+            # La existencia del animal_type_slug se resuelve en lote en el importador
             
             # Validar nombre no vacío
             if not item['name'].strip():
@@ -81,37 +85,147 @@ class BreedBulkCreateSerializer(serializers.Serializer):
         
         return value
 
-class PetSerializer(serializers.ModelSerializer):
+class CatalogBreedSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Breed
+        fields = ("id", "name")
+
+
+class CatalogAnimalTypeSerializer(serializers.ModelSerializer):
+    breeds = CatalogBreedSerializer(source="active_breeds", many=True, read_only=True)
+
+    class Meta:
+        model = AnimalType
+        fields = ("id", "slug", "name", "breeds")
+
+
+class CachedBreedField(serializers.PrimaryKeyRelatedField):
+    """Resuelve el Breed activo desde el cache del catálogo en lugar de consultarlo"""
+    default_error_messages = {
+        'does_not_exist': "Raza '{pk_value}' no encontrada",
+        'incorrect_type': "Raza inválida, se esperaba un id y se recibió {data_type}",
+    }
+
+    def to_internal_value(self, data):
+        try:
+            breed = catalog_cache.get_breed(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if breed is None:
+            self.fail('does_not_exist', pk_value=data)
+        return breed
+
+
+class PetSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     owner = serializers.PrimaryKeyRelatedField(read_only=True)
+    breed = CachedBreedField(queryset=Breed.objects.filter(is_active=True), allow_null=True, required=False)
 
     class Meta:
         model = Pet
         fields = "__all__"
+        # Las bajas son por DELETE (borrado lógico); en multipart un is_active
+        # ausente se interpretaría como False
+        read_only_fields = ("is_active",)
+
+    def validate_photo(self, value):
+        # Las variantes se generan después de confirmar la transacción: un
+        # archivo que no es imagen se rechaza aquí con 400
+        if value and not verify_photo(value):
+            raise serializers.ValidationError("El archivo no es una imagen válida")
+        return value
 
     def create(self, validated_data):
         validated_data["owner"] = self.context["request"].user
         return super().create(validated_data)
 
 
+class PetOwnerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ("id", "first_name", "last_name", "email")
+
+
+class PetReadSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """Lectura de mascotas con raza, tipo de animal y dueño embebidos"""
+    owner = PetOwnerSerializer(read_only=True)
+    breed = BreedReadSerializer(read_only=True)
+
+    class Meta:
+        model = Pet
+        fields = "__all__"
+
+
 class PetPhotoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Pet
         fields = ["photo"]
 
 
-class PetTransferStartSerializer(serializers.Serializer):
-    to_user_id = serializers.IntegerField()
+class PetPhotoUploadSerializer(serializers.Serializer):
+    content_type = serializers.ChoiceField(choices=list(PHOTO_UPLOAD_CONTENT_TYPES))
+    size = serializers.IntegerField(min_value=1, help_text="Tamaño del archivo en bytes")
 
-    def validate_to_user_id(self, value):
-        try:
-            user = User.objects.get(email=value)
-        except User.DoesNotExist:
-            raise serializers.ValidationError("Usuario destino no existe.")
-        request = self.context["request"]
-        if request.user.email == user.email:
-            raise serializers.ValidationError("El receptor no puede ser el mismo que el emisor.")
+    def validate_size(self, value):
+        max_size = int(getattr(settings, 'PET_PHOTO_UPLOAD_MAX_SIZE', 10 * 1024 * 1024))
+        if value > max_size:
+            raise serializers.ValidationError(f"El archivo excede el máximo de {max_size} bytes")
         return value
 
 
+class PetPhotoConfirmSerializer(serializers.Serializer):
+    token = serializers.CharField(help_text="Token regresado por photo_upload")
+
+
+class PetTransferStartSerializer(serializers.Serializer):
+    # Se resuelve junto con el resto de las validaciones en start_transfer
+    to_user_email = serializers.EmailField()
+
+
+class PetTransferLegacyStartSerializer(serializers.Serializer):
+    # Payload de la ruta obsoleta POST /pets/start_transfer/
+    pet = serializers.IntegerField(min_value=1)
+    to_user_id = serializers.IntegerField(min_value=1)
+
+
 class PetTransferAcceptSerializer(serializers.Serializer):
     code = serializers.CharField(max_length=16)
+
+
+class PetTransferBatchStartSerializer(serializers.Serializer):
+    pets = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    to_user_email = serializers.EmailField()
+
+    def validate_pets(self, value):
+        value = list(dict.fromkeys(value))
+        max_size = int(getattr(settings, "PET_TRANSFER_BATCH_MAX_SIZE", 200))
+        if len(value) > max_size:
+            raise serializers.ValidationError(f"Máximo {max_size} mascotas por transferencia.")
+        return value
+
+
+class PetTransferBatchAcceptSerializer(serializers.Serializer):
+    batch_code = serializers.CharField(max_length=16)
+
+
+class PetTransferPetSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Pet
+        fields = ("id", "name", "photo")
+
+
+class PetTransferHistorySerializer(serializers.ModelSerializer):
+    """Transferencia enviada o recibida por el usuario (sin sus códigos)"""
+    pet = PetTransferPetSerializer(read_only=True)
+    from_user = serializers.EmailField(source="from_user.email", read_only=True)
+    to_user = serializers.EmailField(source="to_user.email", read_only=True)
+    direction = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PetTransfer
+        fields = (
+            "id", "pet", "from_user", "to_user", "direction", "status",
+            "created_at", "accepted_at", "cancelled_at", "expires_at",
+        )
+
+    def get_direction(self, obj):
+        return "out" if obj.from_user_id == self.context["request"].user.id else "in"
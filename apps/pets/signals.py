@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.db.models import Count, QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from apps.accounts.models import User
+from .models import AnimalType, Breed, OwnerPetCount, Pet
+from .cache import bump_catalog_version
+from .storage import release_pet_files
+
+
+# Cualquier cambio en AnimalType o Breed invalida el catálogo cacheado.
+# La versión se incrementa hasta que la transacción se confirma para que
+# nadie reconstruya el catálogo con datos sin confirmar.
+# QuerySet.update(), bulk_create() y bulk_update() no disparan estas señales:
+# quien los use sobre AnimalType/Breed debe llamar a bump_catalog_version
+# (con transaction.on_commit), como hacen los importadores.
+@receiver(post_save, sender=AnimalType)
+@receiver(post_delete, sender=AnimalType)
+@receiver(post_save, sender=Breed)
+@receiver(post_delete, sender=Breed)
+def catalog_changed(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+# Al borrar una mascota se suelta la referencia a su foto y variantes en el
+# storage direccionado por contenido (se borran si nadie más las usa)
+@receiver(post_delete, sender=Pet)
+def pet_deleted(sender, instance, **kwargs):
+    names = [instance.photo.name, instance.photo_thumbnail.name, instance.photo_medium.name]
+    transaction.on_commit(lambda: release_pet_files(names))
+
+
+# Borrado definitivo de una mascota activa (admin, Pet.delete() o
+# QuerySet.delete()): se descuenta de su contador. Si se borra el dueño, sus
+# contadores se borran en cascada junto con las mascotas.
+@receiver(post_delete, sender=Pet)
+def pet_deleted_counter(sender, instance, origin=None, **kwargs):
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if not instance.is_active or (origin_model is not None and issubclass(origin_model, User)):
+        return
+    animal_type_id = None
+    if instance.breed_id:
+        animal_type_id = Breed.objects.filter(pk=instance.breed_id).values_list("animal_type_id", flat=True).first()
+    OwnerPetCount.adjust(removed=[(instance.owner_id, animal_type_id)])
+
+
+# Al borrar una raza (o su tipo de animal) sus mascotas quedan sin raza
+# (SET_NULL con un UPDATE, sin Pet.save): pasan al contador sin tipo de animal
+@receiver(pre_delete, sender=Breed)
+def breed_deleted(sender, instance, **kwargs):
+    rows = Pet.objects.filter(breed=instance).values("owner_id").annotate(total=Count("id")).order_by()
+    added, removed = [], []
+    for row in rows:
+        added += [(row["owner_id"], None)] * row["total"]
+        removed += [(row["owner_id"], instance.animal_type_id)] * row["total"]
+    OwnerPetCount.adjust(added=added, removed=removed)
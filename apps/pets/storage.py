@@ -0,0 +1,119 @@
+import hashlib
+import os
+from functools import lru_cache
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+from storages.backends.s3boto3 import S3Boto3Storage
+
+
+class ContentAddressedStorageMixin:
+    """
+    Mixin para un Storage de Django: guarda cada archivo bajo el sha256 de su
+    contenido (pets/photos/ab/ab12...ef.jpg) en lugar del nombre subido.
+    - El hash se calcula por chunks mientras se lee el archivo, sin cargarlo
+      completo en memoria.
+    - Si ya existe un objeto con ese hash no se vuelve a subir (sin PUT).
+    - Cada save() suma una referencia en StoredFile y cada delete() resta
+      una; el objeto solo se borra del storage cuando llega a cero.
+    """
+    hash_algorithm = 'sha256'
+
+    def hash_content(self, content):
+        digest = hashlib.new(self.hash_algorithm)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+
+    def content_name(self, name, digest):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], f'{digest}{extension}').replace('\\', '/')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = self.hash_content(content)
+        name = self.content_name(name, digest)
+
+        # Primero la referencia, luego la existencia: un delete() concurrente
+        # toma el mismo registro con select_for_update y no puede borrar el
+        # objeto que estamos por reutilizar
+        with transaction.atomic():
+            self.add_reference(name, digest=digest, size=content.size)
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length=max_length)
+
+    def save_as(self, name, content, max_length=None):
+        """
+        Guarda con el nombre dado, sin hashear el contenido (subidas directas
+        con una llave ya asignada). No suma referencia: la suma quien asigne
+        el archivo a un campo, con add_reference().
+        """
+        return super().save(name, content, max_length=max_length)
+
+    def add_reference(self, name, digest='', size=None):
+        """Suma una referencia al objeto `name` (lo registra si es nuevo)"""
+        from .models import StoredFile
+
+        with transaction.atomic():
+            if StoredFile.objects.filter(name=name).update(refcount=F('refcount') + 1):
+                return
+            try:
+                with transaction.atomic():
+                    StoredFile.objects.create(name=name, digest=digest, size=size, refcount=1)
+            except IntegrityError:
+                StoredFile.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre ya es único por contenido; solo se renombraría en una
+        # subida simultánea del mismo archivo
+        if not self.exists(name):
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def delete(self, name):
+        """Resta una referencia; borra el objeto cuando ya nadie lo usa"""
+        from .models import StoredFile
+
+        if not name:
+            return
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is not None and stored.refcount > 1:
+                StoredFile.objects.filter(pk=stored.pk).update(refcount=F('refcount') - 1)
+                return
+            if stored is not None:
+                stored.delete()
+            # Archivos sin registro (subidos antes de este storage) se borran directo
+            super().delete(name)
+
+
+class ContentAddressedFileSystemStorage(ContentAddressedStorageMixin, FileSystemStorage):
+    pass
+
+
+class ContentAddressedS3Storage(ContentAddressedStorageMixin, S3Boto3Storage):
+    pass
+
+
+@lru_cache
+def get_pet_photo_storage():
+    """Storage de las fotos de mascotas (setting PET_PHOTO_STORAGE)"""
+    return import_string(settings.PET_PHOTO_STORAGE)()
+
+
+def release_pet_files(names):
+    """Suelta una referencia de cada archivo (fotos o variantes que dejaron de usarse)"""
+    storage = get_pet_photo_storage()
+    for name in names:
+        if name:
+            storage.delete(name)
@@ -0,0 +1,173 @@
+import io
+import logging
+import os
+import time
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .models import Pet, PetTransfer
+from .storage import release_pet_files
+from .analytics import build_population_snapshot
+from . import counters
+
+
+# Variantes de Pet.photo: campo del modelo -> (sufijo del archivo, lado mayor en px)
+PHOTO_VARIANTS = {
+    'photo_thumbnail': ('thumb', 320),
+    'photo_medium': ('medium', 1280),
+}
+PHOTO_VARIANT_QUALITY = 80
+
+logger = logging.getLogger(__name__)
+
+
+def variant_name(photo_name, suffix):
+    """pets/photos/firulais.jpg -> pets/photos/firulais_thumb.webp (junto al original)"""
+    root, _ = os.path.splitext(photo_name)
+    return f'{root}_{suffix}.webp'
+
+
+def render_variants(file):
+    """
+    Regresa {campo: bytes WebP} para cada variante de PHOTO_VARIANTS.
+    Aplica la orientación EXIF antes de descartar los metadatos: las
+    variantes se guardan sin EXIF (ubicación GPS, cámara, etc.).
+    """
+    largest = max(size for _, size in PHOTO_VARIANTS.values())
+    with Image.open(file) as image:
+        # En JPEG decodifica directamente a una escala reducida (mucho menos memoria y CPU)
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    variants = {}
+    for field, (_, size) in sorted(PHOTO_VARIANTS.items(), key=lambda item: -item[1][1]):
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=PHOTO_VARIANT_QUALITY, method=4)
+        variants[field] = buffer.getvalue()
+    return variants
+
+
+# Errores de E/S del storage se reintentan; un archivo que no es imagen
+# (UnidentifiedImageError también es OSError) fallaría igual en cada intento.
+# La API ya rechaza esos archivos (uploads.verify_photo); esto es un resguardo
+@shared_task(
+    autoretry_for=(OSError,), dont_autoretry_for=(UnidentifiedImageError,), retry_backoff=True, max_retries=3
+)
+def generate_pet_photo_variants(pet_id, photo_name):
+    """
+    Genera las variantes WebP de la foto `photo_name` de la mascota y las
+    guarda con el storage configurado, junto al original.
+    Si la foto cambió mientras la tarea esperaba en la cola no hace nada:
+    la nueva foto tiene su propia tarea.
+    """
+    pet = Pet.objects.filter(pk=pet_id, photo=photo_name).only('id', 'photo', *PHOTO_VARIANTS).first()
+    if pet is None:
+        return
+
+    storage = pet.photo.storage
+    with storage.open(photo_name, 'rb') as file:
+        variants = render_variants(file)
+
+    names = {}
+    for field, content in variants.items():
+        name = variant_name(photo_name, PHOTO_VARIANTS[field][0])
+        names[field] = storage.save(name, ContentFile(content))
+
+    # update() condicionado: no pisar las variantes de una foto más reciente
+    updated = Pet.objects.filter(pk=pet_id, photo=photo_name).update(updated_at=timezone.now(), **names)
+    # Soltar las referencias que quedaron sin usar: las variantes anteriores
+    # (regeneración) o las nuevas si la foto cambió mientras tanto
+    if updated:
+        release_pet_files(getattr(pet, field).name for field in PHOTO_VARIANTS)
+    else:
+        release_pet_files(names.values())
+
+
+def schedule_photo_variants(pet):
+    """Encola la generación de variantes al confirmar la transacción actual"""
+    pet_id, photo_name = pet.pk, pet.photo.name
+    transaction.on_commit(lambda: generate_pet_photo_variants.delay(pet_id, photo_name))
+
+
+@shared_task
+def purge_deleted_pets(older_than_days=None, batch_size=None):
+    """
+    Borra definitivamente las mascotas eliminadas (borrado lógico) hace más
+    de `older_than_days` días, junto con sus transferencias y archivos.
+    Trabaja en lotes de `batch_size`, cada uno en su propia transacción, para
+    no mantener bloqueos largos. Regresa el número de mascotas borradas.
+    """
+    if older_than_days is None:
+        older_than_days = getattr(settings, 'PET_PURGE_AFTER_DAYS', 30)
+    if batch_size is None:
+        batch_size = getattr(settings, 'PET_PURGE_BATCH_SIZE', 500)
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    tombstones = Pet.all_objects.filter(is_active=False, deleted_at__lt=cutoff)
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(tombstones.order_by('deleted_at').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return total
+            # delete() dispara post_delete, que suelta la foto y sus variantes
+            Pet.all_objects.filter(id__in=ids).delete()
+        total += len(ids)
+
+
+@shared_task
+def snapshot_pet_population():
+    """Foto diaria del padrón de mascotas (ver apps.pets.analytics)"""
+    return build_population_snapshot()
+
+
+@shared_task
+def expire_pending_transfers(batch_size=None):
+    """
+    Cancela las transferencias pendientes cuyo expires_at ya pasó, para que
+    liberen uniq_pending_transfer_per_pet. Cada lote es un solo UPDATE
+    (... WHERE status = 'pending' AND expires_at < now() sobre a lo más
+    `batch_size` filas) con su propia transacción.
+    Regresa las métricas de la corrida y las registra en el log.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'PET_TRANSFER_EXPIRY_BATCH_SIZE', 1000)
+    start = time.monotonic()
+    now = timezone.now()
+    expired = PetTransfer.objects.filter(status='pending', expires_at__lt=now)
+
+    total = 0
+    batches = 0
+    while True:
+        # El status se vuelve a evaluar en el UPDATE: una aceptación concurrente no se pisa
+        updated = expired.filter(id__in=expired.order_by('expires_at').values('id')[:batch_size]).update(
+            status='cancelled', cancelled_at=now
+        )
+        if updated:
+            total += updated
+            batches += 1
+        if updated < batch_size:
+            break
+
+    metrics = {'expired': total, 'batches': batches, 'seconds': round(time.monotonic() - start, 3)}
+    logger.info("Transferencias vencidas canceladas: %(expired)d en %(batches)d lotes (%(seconds)ss)", metrics, extra=metrics)
+    return metrics
+
+
+@shared_task
+def reconcile_owner_pet_counts():
+    """
+    Corrige las diferencias de OwnerPetCount contra Pet (ver
+    apps.pets.counters) y registra cuántas encontró: si aparecen, algún
+    cambio de mascotas no está ajustando los contadores.
+    """
+    drift = counters.reconcile_owner_pet_counts()
+    if drift:
+        logger.warning("Contadores de mascotas corregidos: %d", len(drift), extra={'drift': drift})
+    return len(drift)
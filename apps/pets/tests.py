@@ -1,3 +1,1674 @@
-from django.test import TestCase
+import base64
+import csv
+import email
+import email.policy
+import gzip
+import hashlib
+import importlib
+import io
+import json
+import shutil
+import socketserver
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipIf, skipUnless
+from django.core.cache import caches
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+from celery.exceptions import Retry
+from config.celery import app as celery_app
+from .models import *
+from .analytics import build_population_snapshot
+from .catalog import breed_autocomplete
+from .cache import CATALOG_VERSION_KEY, bump_catalog_version, catalog_cache, get_catalog_version
+from .counters import reconcile_owner_pet_counts
+from .filters import TrigramSearchFilter, normalize_search_text
+from .storage import get_pet_photo_storage
+from .outbox import dispatch_outbox, EmailTransport, InMemoryTransport
+from .tasks import expire_pending_transfers, generate_pet_photo_variants, purge_deleted_pets, render_variants
+from .tasks import reconcile_owner_pet_counts as reconcile_owner_pet_counts_task
+from .views import PetViewSet
 
-# Create your tests here.
+
+# Dos alias sobre el mismo almacenamiento: 'other' hace las veces del cache
+# compartido (Redis) visto desde otro worker
+SHARED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pets-shared'},
+    'other': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pets-shared'},
+}
+
+
+class PetTestMixin:
+
+    # Catálogo y dueño que usaremos para las pruebas
+    def create_catalog(self):
+        self.owner = User.objects.create(
+            username='owner',
+            first_name='Test',
+            last_name='Owner',
+            email='owner@mail.com'
+        )
+        self.animal_type = AnimalType.objects.create(slug='perro', name='Perro')
+        self.breeds = [
+            Breed.objects.create(animal_type=self.animal_type, name=name)
+            for name in ('Labrador Retriever', 'Pastor Alemán', 'Chihuahua')
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    # MEDIA_ROOT temporal y tareas de Celery en el mismo proceso
+    def use_temporary_media(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # La app lee su configuración con el prefijo CELERY_ de settings
+        self.addCleanup(setattr, celery_app.conf, 'CELERY_TASK_ALWAYS_EAGER', celery_app.conf.CELERY_TASK_ALWAYS_EAGER)
+        celery_app.conf.CELERY_TASK_ALWAYS_EAGER = True
+
+    def create_pets(self, total):
+        return [
+            Pet.objects.create(owner=self.owner, name=f'Mascota {i}', breed=self.breeds[i % len(self.breeds)])
+            for i in range(total)
+        ]
+
+
+class PetQueryCountTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.pets = self.create_pets(30)
+
+    def test_list_embeds_breed_and_owner(self):
+        "El listado embebe raza, tipo de animal y dueño"
+
+        response = self.client.get('/api/v1/pets/', {'limit': 5})
+        self.assertEqual(response.status_code, 200)
+
+        pet = response.data['results'][0]
+        self.assertEqual(pet['owner']['email'], 'owner@mail.com')
+        self.assertIn(pet['breed']['name'], [breed.name for breed in self.breeds])
+        self.assertEqual(pet['breed']['animal_type']['slug'], 'perro')
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        "Una consulta para las filas (más el COUNT de LimitOffsetPagination)"
+
+        for limit in (1, 10, 30):
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/v1/pets/', {'limit': limit})
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_cursor_list_is_a_single_query(self):
+        "Con paginación por cursor no hay COUNT"
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/pets/', {'pagination': 'cursor', 'limit': 30})
+        self.assertEqual(len(response.data['results']), 30)
+
+    def test_retrieve_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/v1/pets/{self.pets[0].id}/')
+        self.assertEqual(response.data['breed']['animal_type']['name'], 'Perro')
+
+
+class PetCursorPaginationTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.pets = self.create_pets(7)
+        # Empates en created_at: el id desempata
+        now = timezone.now()
+        for pet, minutes in zip(self.pets, (5, 5, 5, 3, 3, 1, 0)):
+            Pet.objects.filter(id=pet.id).update(created_at=now - timedelta(minutes=minutes))
+        rows = Pet.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.expected = list(rows)
+
+    def page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def encode(self, payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def test_next_and_previous_round_trip(self):
+        pages, data = [], self.page('/api/v1/pets/', {'pagination': 'cursor', 'limit': 2})
+        self.assertIsNone(data['previous'])
+        while True:
+            pages.append([pet['id'] for pet in data['results']])
+            if not data['next']:
+                break
+            data = self.page(data['next'])
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual([len(ids) for ids in pages], [2, 2, 2, 1])
+
+        # De regreso con `previous` se obtienen las mismas páginas
+        for ids in reversed(pages[:-1]):
+            data = self.page(data['previous'])
+            self.assertEqual([pet['id'] for pet in data['results']], ids)
+        self.assertIsNone(data['previous'])
+
+    def test_cursor_uses_a_row_comparison(self):
+        data = self.page('/api/v1/pets/', {'pagination': 'cursor', 'limit': 2})
+        with CaptureQueriesContext(connection) as queries:
+            self.page(data['next'])
+        sql = queries[0]['sql']
+        self.assertIn('("pets_pet"."created_at", "pets_pet"."id") < (', sql)
+        self.assertNotIn(' OR ', sql)
+
+    def test_created_at_is_required(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Pet.objects.filter(id=self.pets[0].id).update(created_at=None)
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        created_at = timezone.now().isoformat()
+        for cursor in (
+            'no-es-base64!',
+            base64.urlsafe_b64encode(b'no es json').decode(),
+            self.encode([1, 2]),
+            self.encode({'r': False}),
+            self.encode({'p': [created_at]}),
+            self.encode({'p': [created_at, None]}),
+            self.encode({'p': [None, 1]}),
+            self.encode({'p': ['ayer', 1]}),
+            self.encode({'p': [created_at, 'uno']}),
+            self.encode({'p': [created_at, 2 ** 70]}),
+            self.encode({'p': [created_at, [1]]}),
+        ):
+            response = self.client.get('/api/v1/pets/', {'pagination': 'cursor', 'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.data['detail'], 'Cursor inválido')
+
+
+class PetSparseFieldsetsTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.create_pets(3)
+
+    def test_fields_and_omit(self):
+        response = self.client.get('/api/v1/pets/', {'fields': 'id,name'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+
+        response = self.client.get('/api/v1/pets/', {'omit': 'notes,owner'})
+        self.assertNotIn('notes', response.data['results'][0])
+        self.assertNotIn('owner', response.data['results'][0])
+        self.assertIn('breed', response.data['results'][0])
+
+    def test_unrequested_relations_are_not_joined(self):
+        "Sin breed ni owner en ?fields= no hay JOIN y las columnas se reducen"
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/pets/', {'fields': 'id,name', 'pagination': 'cursor'})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0]['sql'])
+        self.assertNotIn('"notes"', queries[0]['sql'])
+
+
+class PetFastListTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        pets = self.create_pets(4)
+        pets[0].weight_kg = Decimal('12.5')
+        pets[0].height_cm = Decimal('40')
+        pets[0].birth_date = date(2020, 5, 17)
+        pets[0].photo = 'pets/photos/firulais.jpg'
+        pets[0].sex = 'M'
+        pets[0].save()
+        pets[1].breed = None
+        pets[1].save()
+
+    def test_fast_list_is_byte_identical(self):
+        "El modo rápido (values) produce exactamente la misma respuesta que PetReadSerializer"
+
+        for params in ({}, {'pagination': 'cursor'}, {'fields': 'id,photo,breed'}, {'omit': 'owner'}):
+            fast = self.client.get('/api/v1/pets/', params)
+            slow = self.client.get('/api/v1/pets/', {**params, 'fast': '0'})
+            self.assertEqual(fast.status_code, 200)
+            self.assertEqual(fast.content, slow.content)
+
+
+class CatalogTreeTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get('/api/v1/animal-types/catalog/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        [perro] = json.loads(response.content)
+        self.assertEqual([breed['name'] for breed in perro['breeds']], ['Chihuahua', 'Labrador Retriever', 'Pastor Alemán'])
+
+        # El árbol ya está en el cache: ni siquiera se consulta la base de datos
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/animal-types/catalog/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((response['ETag'], response.content), (etag, b''))
+
+    def test_etag_changes_after_a_catalog_edit(self):
+        etag = self.client.get('/api/v1/animal-types/catalog/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Breed.objects.create(animal_type=self.animal_type, name='Beagle')
+
+        response = self.client.get('/api/v1/animal-types/catalog/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(b'Beagle', response.content)
+
+    def test_uses_the_default_authentication(self):
+        self.owner.set_password('secreto')
+        self.owner.save()
+        client = APIClient()
+        self.assertTrue(client.login(username='owner', password='secreto'))
+        self.assertEqual(client.get('/api/v1/animal-types/catalog/').status_code, 200)
+        self.assertEqual(client.get('/api/v1/breeds/autocomplete/', {'q': 'lab'}).status_code, 200)
+
+        # Un token vigente de un usuario desactivado ya no sirve (403 porque la
+        # primera autenticación configurada es la de sesión, sin WWW-Authenticate)
+        token = AccessToken.for_user(self.owner)
+        User.objects.filter(id=self.owner.id).update(is_active=False)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(client.get('/api/v1/animal-types/catalog/').status_code, 403)
+        self.assertEqual(client.get('/api/v1/breeds/autocomplete/', {'q': 'lab'}).status_code, 403)
+
+
+class BreedAutocompleteTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        # Las señales suben la versión al confirmar; así el índice de otras
+        # pruebas no se reutiliza
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_catalog()
+            self.cat = AnimalType.objects.create(slug='gato', name='Gato')
+            self.siamese = Breed.objects.create(animal_type=self.cat, name='Siamés')
+
+    def autocomplete(self, q, **params):
+        response = self.client.get('/api/v1/breeds/autocomplete/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [breed['name'] for breed in response.data]
+
+    def test_matches_word_prefixes(self):
+        self.assertEqual(self.autocomplete('lab'), ['Labrador Retriever'])
+        self.assertEqual(self.autocomplete('retr'), ['Labrador Retriever'])
+        self.assertEqual(self.autocomplete('pastor alem'), ['Pastor Alemán'])
+        self.assertEqual(self.autocomplete('xyz'), [])
+        self.assertEqual(self.autocomplete(''), [])
+        self.assertEqual(self.autocomplete('s', animal_type=self.cat.id), ['Siamés'])
+        self.assertEqual(self.autocomplete('s', animal_type=self.animal_type.id), [])
+
+    def test_folds_accents_and_case(self):
+        self.assertEqual(self.autocomplete('ALEMAN'), ['Pastor Alemán'])
+        self.assertEqual(self.autocomplete('siamés'), ['Siamés'])
+        self.assertEqual(self.autocomplete('SIAMES'), ['Siamés'])
+
+    def test_rebuilds_after_a_version_bump(self):
+        self.autocomplete('lab')
+        with self.assertNumQueries(0):
+            breed_autocomplete.search('lab')
+
+        # Las señales suben la versión y el índice se reconstruye
+        with self.captureOnCommitCallbacks(execute=True):
+            Breed.objects.create(animal_type=self.animal_type, name='Labradoodle')
+        self.assertEqual(self.autocomplete('labr'), ['Labradoodle', 'Labrador Retriever'])
+
+        # update() no dispara señales: el índice no cambia hasta subir la versión
+        Breed.objects.filter(name='Labradoodle').update(is_active=False)
+        self.assertEqual(self.autocomplete('labr'), ['Labradoodle', 'Labrador Retriever'])
+        bump_catalog_version()
+        self.assertEqual(self.autocomplete('labr'), ['Labrador Retriever'])
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_rebuilds_after_a_bump_in_another_process(self):
+        self.assertEqual(self.autocomplete('siam'), ['Siamés'])
+        Breed.objects.filter(id=self.siamese.id).update(is_active=False)
+        caches['other'].incr(CATALOG_VERSION_KEY)
+        self.assertEqual(self.autocomplete('siam'), [])
+
+    def test_excludes_breeds_of_inactive_animal_types(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cat.is_active = False
+            self.cat.save()
+        self.assertEqual(self.autocomplete('siam'), [])
+        self.assertEqual(self.autocomplete('siam', animal_type=self.cat.id), [])
+
+
+class CatalogCacheTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        catalog_cache.clear()
+
+    def test_hits_do_not_query(self):
+        ids = [breed.id for breed in self.breeds]
+        hits, misses = catalog_cache.hits, catalog_cache.misses
+        with self.assertNumQueries(1):
+            catalog_cache.get_breeds(ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(catalog_cache.get_breeds(ids), {breed.id: breed for breed in self.breeds})
+        self.assertEqual((catalog_cache.hits - hits, catalog_cache.misses - misses), (3, 3))
+
+    def test_save_and_delete_invalidate(self):
+        breed, other = self.breeds[:2]
+        catalog_cache.get_breeds([breed.id, other.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            breed.is_active = False
+            breed.save()
+        self.assertIsNone(catalog_cache.get_breed(breed.id))
+
+        catalog_cache.get_breed(other.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertIsNone(catalog_cache.get_breed(other.id))
+
+        catalog_cache.get_animal_type('perro')
+        with self.captureOnCommitCallbacks(execute=True):
+            AnimalType.objects.filter(slug='perro').first().delete()
+        self.assertIsNone(catalog_cache.get_animal_type('perro'))
+
+    def test_importers_bump_the_version(self):
+        catalog_cache.get_animal_type('perro')
+        version = get_catalog_version()
+        self.owner.is_staff = True
+        self.owner.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/animal-types/bulk_create/', {'data': [{'slug': 'gato', 'name': 'Gato'}]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(get_catalog_version(), version + 1)
+        with self.assertNumQueries(1):
+            catalog_cache.get_animal_type('perro')
+
+    def test_rows_loaded_across_a_version_change_are_not_stored(self):
+        breed, other = self.breeds[:2]
+
+        def load(missing):
+            rows = Breed.objects.in_bulk(missing)
+            # Otro hilo ve el cambio del catálogo mientras esta consulta corre
+            bump_catalog_version()
+            catalog_cache.get_breed(other.id)
+            return rows
+
+        self.assertEqual(catalog_cache._get_many(catalog_cache._breeds, [breed.id], load), {breed.id: breed})
+        self.assertNotIn(breed.id, catalog_cache._breeds)
+        self.assertIn(other.id, catalog_cache._breeds)
+
+    def test_pet_create_resolves_the_breed_once(self):
+        breed = self.breeds[0]
+        with mock.patch('apps.pets.cache.get_catalog_version', wraps=get_catalog_version) as version:
+            response = self.client.post('/api/v1/pets/', {'name': 'Firulais', 'breed': breed.id}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(version.call_count, 1)
+        self.assertEqual(Pet.objects.get(name='Firulais').breed, breed)
+
+        response = self.client.post('/api/v1/pets/', {'name': 'Sin raza', 'breed': 9999}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['breed'], ["Raza '9999' no encontrada"])
+        response = self.client.post('/api/v1/pets/', {'name': 'Sin raza', 'breed': ''}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(Pet.objects.get(name='Sin raza').breed)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class CatalogSharedCacheTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        catalog_cache.clear()
+
+    def test_a_change_in_another_process_invalidates(self):
+        breed = self.breeds[0]
+        self.assertEqual(catalog_cache.get_breed(breed.id), breed)
+
+        # Otro worker desactiva la raza y sube la versión en el cache compartido
+        Breed.objects.filter(id=breed.id).update(is_active=False)
+        caches['other'].incr(CATALOG_VERSION_KEY)
+
+        self.assertIsNone(catalog_cache.get_breed(breed.id))
+        response = self.client.post('/api/v1/pets/', {'name': 'Firulais', 'breed': breed.id}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogBulkCreateTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        User.objects.filter(id=self.owner.id).update(is_staff=True)
+        self.owner.refresh_from_db()
+        catalog_cache.clear()
+
+    def bulk_create(self, resource, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/v1/{resource}/bulk_create/', {'data': data})
+        return response, [query['sql'].split()[0] for query in queries]
+
+    def assertSameQueries(self, one, many):
+        # SQLite parte el INSERT por su límite de parámetros; en PostgreSQL es uno solo
+        if connection.vendor != 'postgresql':
+            one = [sql for sql in one if sql != 'INSERT']
+            many = [sql for sql in many if sql != 'INSERT']
+        self.assertEqual(one, many)
+
+    def test_animal_types_use_the_same_queries_for_any_batch_size(self):
+        response, one = self.bulk_create('animal-types', [{'slug': 'gato', 'name': 'Gato'}])
+        self.assertEqual(response.status_code, 201)
+        response, many = self.bulk_create(
+            'animal-types', [{'slug': f'tipo-{i}', 'name': f'Tipo {i}'} for i in range(500)]
+        )
+        self.assertEqual(response.data['created'], 500)
+        self.assertSameQueries(one, many)
+
+    def test_breeds_use_the_same_queries_for_any_batch_size(self):
+        response, one = self.bulk_create('breeds', [{'animal_type_slug': 'perro', 'name': 'Beagle'}])
+        self.assertEqual(response.status_code, 201)
+        catalog_cache.clear()
+        response, many = self.bulk_create(
+            'breeds', [{'animal_type_slug': 'perro', 'name': f'Raza {i}'} for i in range(500)]
+        )
+        self.assertEqual(response.data['created'], 500)
+        self.assertSameQueries(one, many)
+
+    def test_errors_are_reported_per_index(self):
+        response, _ = self.bulk_create('animal-types', [
+            {'slug': 'perro', 'name': 'Perro'},
+            {'slug': 'ave', 'name': 'Ave'},
+            {'slug': 'ave', 'name': 'Otra ave'},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([(error['index'], error['error']) for error in response.data['errors_detail']], [
+            (0, "El slug 'perro' ya existe"),
+            (2, "El slug 'ave' está duplicado en el payload"),
+        ])
+
+        response, _ = self.bulk_create('breeds', [
+            {'animal_type_slug': 'perro', 'name': 'Chihuahua'},
+            {'animal_type_slug': 'ave', 'name': 'Canario'},
+            {'animal_type_slug': 'dinosaurio', 'name': 'T-Rex'},
+            {'animal_type_slug': 'ave', 'name': 'Canario'},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors_detail']], [0, 2, 3])
+        self.assertIn("'dinosaurio' no existe", response.data['errors_detail'][1]['error'])
+
+    def test_non_scalar_values_are_rejected(self):
+        response, _ = self.bulk_create('animal-types', [{'slug': ['perro'], 'name': 'Perro'}])
+        self.assertEqual(response.status_code, 400)
+        response, _ = self.bulk_create('breeds', [{'animal_type_slug': {'slug': 'perro'}, 'name': 'Beagle'}])
+        self.assertEqual(response.status_code, 400)
+        response, _ = self.bulk_create('breeds', [{'animal_type_slug': 'perro', 'name': 3}])
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Llaves foráneas diferidas de PostgreSQL')
+class BreedUniqueNameMigrationTest(PetTestMixin, TestCase):
+    """Migración 0002 con razas repetidas, antes de que exista la restricción"""
+    migration = ('pets', '0002_breed_unique_name_per_animal_type')
+
+    def test_merges_duplicates_and_adds_the_constraint(self):
+        constraint = next(
+            c for c in Breed._meta.constraints if c.name == 'uniq_breed_name_per_animal_type'
+        )
+        with connection.schema_editor() as editor:
+            editor.remove_constraint(Breed, constraint)
+
+        self.create_catalog()
+        duplicate = Breed.objects.create(animal_type=self.animal_type, name='Chihuahua')
+        pet = Pet.objects.create(owner=self.owner, name='Firulais', breed=duplicate)
+
+        module = importlib.import_module(f'apps.{self.migration[0]}.migrations.{self.migration[1]}')
+        apps = MigrationLoader(connection).project_state(self.migration).apps
+        with connection.schema_editor() as editor:
+            module.merge_duplicate_breeds(apps, editor)
+            editor.add_constraint(Breed, constraint)
+
+        pet.refresh_from_db()
+        self.assertEqual(pet.breed, self.breeds[2])
+        self.assertFalse(Breed.objects.filter(id=duplicate.id).exists())
+
+
+def has_trigram_search():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regprocedure('f_unaccent(text)') IS NOT NULL")
+        return cursor.fetchone()[0]
+
+
+class PetSearchTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        for name in ('Firulais', 'Firu', 'Pelusa', 'Ángel'):
+            Pet.objects.create(owner=self.owner, name=name)
+
+    def search(self, term, **params):
+        response = self.client.get('/api/v1/pets/', {'search': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [pet['name'] for pet in response.data['results']]
+
+    def test_normalize_search_text(self):
+        self.assertEqual(normalize_search_text('Pastor Alemán'), 'pastor aleman')
+        self.assertEqual(normalize_search_text('ÑANDÚ Pingüino'), 'nandu pinguino')
+        self.assertEqual(normalize_search_text(''), '')
+
+    @skipIf(connection.vendor == 'postgresql', 'Fuera de PostgreSQL')
+    def test_falls_back_to_search_filter(self):
+        request = Request(APIRequestFactory().get('/api/v1/pets/', {'search': 'firu'}))
+        view = PetViewSet(request=request, action='list', format_kwarg=None)
+        queryset = Pet.objects.order_by('pk')
+        trigram = TrigramSearchFilter().filter_queryset(request, queryset, view)
+        plain = filters.SearchFilter().filter_queryset(request, queryset, view)
+        self.assertEqual(str(trigram.query), str(plain.query))
+        self.assertEqual(sorted(self.search('firu')), ['Firu', 'Firulais'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Búsqueda por trigramas de PostgreSQL')
+    def test_orders_by_similarity(self):
+        request = Request(APIRequestFactory().get('/api/v1/pets/', {'search': 'Firu'}))
+        view = PetViewSet(request=request, action='list', format_kwarg=None)
+        queryset = TrigramSearchFilter().filter_queryset(request, Pet.objects.all(), view)
+        self.assertEqual(queryset.query.order_by, ('-search_rank', 'pk'))
+        sql = str(queryset.query)
+        self.assertIn('f_unaccent(LOWER("pets_pet"."name"))::text LIKE', sql)
+        self.assertIn('SIMILARITY(', sql)
+
+        if not has_trigram_search():
+            self.skipTest('pg_trgm/unaccent no instalados')
+        # La coincidencia exacta tiene mayor similitud; sin acentos ni mayúsculas
+        self.assertEqual(self.search('Firu'), ['Firu', 'Firulais'])
+        self.assertEqual(self.search('angel'), ['Ángel'])
+
+
+class PetBulkImportTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.owner.is_staff = True
+        self.owner.save()
+
+    def upload(self, name, content):
+        return self.client.post(
+            '/api/v1/pets/bulk_import/',
+            {'file': SimpleUploadedFile(name, content.encode())},
+            format='multipart'
+        )
+
+    def test_csv_import_reports_errors_per_row(self):
+        breed = self.breeds[0]
+        rows = [
+            'owner_email,name,breed,sex,birth_date,weight_kg,neutered',
+            f'owner@mail.com,Firulais,{breed.id},M,2020-05-17,12.5,si',
+            'owner@mail.com,Michi,,F,,,',
+            f'nadie@mail.com,Sin dueño,{breed.id},M,,,',
+            'owner@mail.com,Raza inválida,9999,M,,,',
+            'owner@mail.com,Sexo inválido,,X,,,',
+        ]
+        response = self.upload('mascotas.csv', '\n'.join(rows))
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['index'] for error in response.data['errors_detail']], [2, 3, 4])
+
+        firulais = Pet.objects.get(name='Firulais')
+        self.assertEqual(firulais.breed, breed)
+        self.assertEqual(firulais.weight_kg, Decimal('12.5'))
+        self.assertTrue(firulais.neutered)
+        self.assertIsNone(Pet.objects.get(name='Michi').birth_date)
+
+    def test_ndjson_import_uses_a_fixed_number_of_queries(self):
+        lines = [
+            '{"owner_email": "owner@mail.com", "name": "Mascota %d", "breed": %d}' % (i, self.breeds[i % 3].id)
+            for i in range(50)
+        ]
+        lines.insert(10, '{no es json')
+
+        # Sesión/usuario, dueños del lote, razas y el INSERT (más el savepoint),
+        # y lectura e inserción de los contadores por dueño (con su savepoint)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload('mascotas.ndjson', '\n'.join(lines))
+        self.assertLessEqual(len(queries), 10)
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], 50)
+        self.assertEqual(response.data['errors_detail'][0]['index'], 10)
+        self.assertEqual(Pet.objects.filter(owner=self.owner).count(), 50)
+
+    def test_unsupported_format(self):
+        response = self.upload('mascotas.xlsx', 'x')
+        self.assertEqual(response.status_code, 400)
+
+
+class PetExportTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.owner.is_staff = True
+        self.owner.save()
+        self.pets = self.create_pets(12)
+
+    def export(self, **params):
+        response = self.client.get('/api/v1/pets/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_export_can_be_imported_back(self):
+        Pet.objects.filter(id=self.pets[0].id).update(weight_kg=Decimal('12.30'), neutered=True)
+        content = self.export().decode()
+
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([int(row['id']) for row in rows], [pet.id for pet in self.pets])
+        self.assertEqual(rows[0]['owner_email'], 'owner@mail.com')
+        self.assertEqual(rows[0]['weight_kg'], '12.30')
+
+        Pet.objects.all().delete()
+        response = self.client.post(
+            '/api/v1/pets/bulk_import/',
+            {'file': SimpleUploadedFile('mascotas.csv', content.encode())},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 12)
+        self.assertTrue(Pet.objects.get(name='Mascota 0').neutered)
+
+    def test_gzip_ndjson_export_applies_filters(self):
+        breed = self.breeds[1]
+        Pet.objects.filter(id=self.pets[1].id).update(is_active=False)
+        content = gzip.decompress(self.export(file_type='ndjson', gzip='1', breed=breed.id))
+
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        expected = [pet.id for pet in self.pets if pet.breed_id == breed.id and pet.id != self.pets[1].id]
+        self.assertEqual([row['id'] for row in rows], expected)
+        self.assertEqual(rows[0]['breed'], breed.id)
+
+    def test_unsupported_format(self):
+        response = self.client.get('/api/v1/pets/export/', {'file_type': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_clinics_export_only_their_pets(self):
+        clinic = User.objects.create(username='clinica', email='clinica@mail.com', role='veterinario')
+        own = Pet.objects.create(owner=clinic, name='Paciente')
+        self.client.force_authenticate(clinic)
+        rows = list(csv.DictReader(io.StringIO(self.export().decode())))
+        self.assertEqual([int(row['id']) for row in rows], [own.id])
+        rows = list(csv.DictReader(io.StringIO(self.export(owner=self.owner.id).decode())))
+        self.assertEqual(rows, [])
+
+        client = User.objects.create(username='cliente', email='cliente@mail.com')
+        self.client.force_authenticate(client)
+        self.assertEqual(self.client.get('/api/v1/pets/export/').status_code, 403)
+
+
+class PetSoftDeleteTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.pets = self.create_pets(5)
+        self.other_owner = User.objects.create(username='other', email='other@mail.com')
+        PetTransfer.start(pet=self.pets[0], from_user=self.owner, to_user=self.other_owner)
+
+    def test_destroy_is_a_single_update(self):
+        pet = self.pets[0]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/api/v1/pets/{pet.id}/')
+        self.assertEqual(response.status_code, 204)
+        # Sin DELETE en cascada: un solo UPDATE sobre pets_pet (más los contadores)
+        statements = [query['sql'] for query in queries if 'pets_pet"' in query['sql'].split(' WHERE ')[0]]
+        self.assertEqual([sql.split(' ', 1)[0] for sql in statements], ['SELECT', 'UPDATE'])
+
+        self.assertFalse(Pet.objects.filter(id=pet.id).exists())
+        deleted = Pet.all_objects.get(id=pet.id)
+        self.assertFalse(deleted.is_active)
+        self.assertIsNotNone(deleted.deleted_at)
+        # Las transferencias se conservan y siguen resolviendo la mascota
+        self.assertEqual(PetTransfer.objects.get(pet_id=pet.id).pet, deleted)
+
+        self.assertEqual(self.client.get(f'/api/v1/pets/{pet.id}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/v1/pets/{pet.id}/').status_code, 404)
+        self.assertEqual(len(self.client.get('/api/v1/pets/').data['results']), 4)
+
+    def test_purge_deletes_old_tombstones_in_batches(self):
+        old = timezone.now() - timedelta(days=40)
+        Pet.objects.filter(id__in=[pet.id for pet in self.pets[:3]]).soft_delete()
+        Pet.all_objects.filter(id__in=[self.pets[0].id, self.pets[1].id]).update(deleted_at=old)
+
+        self.assertEqual(purge_deleted_pets(older_than_days=30, batch_size=1), 2)
+        self.assertEqual(
+            sorted(Pet.all_objects.values_list('id', flat=True)),
+            [pet.id for pet in self.pets[2:]]
+        )
+        self.assertFalse(PetTransfer.objects.exists())
+
+
+class PetOwnerCountTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.cat_type = AnimalType.objects.create(slug='gato', name='Gato')
+        self.cat_breed = Breed.objects.create(animal_type=self.cat_type, name='Siamés')
+        self.other_owner = User.objects.create(username='other', email='other@mail.com')
+
+    def counts(self, owner):
+        return dict(OwnerPetCount.objects.filter(owner=owner, count__gt=0).values_list('animal_type_id', 'count'))
+
+    def test_counters_follow_create_update_transfer_and_delete(self):
+        for breed in (self.breeds[0].id, self.breeds[1].id, self.cat_breed.id, ''):
+            response = self.client.post('/api/v1/pets/', {'name': 'Firulais', 'breed': breed}, format='multipart')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counts(self.owner), {self.animal_type.id: 2, self.cat_type.id: 1, None: 1})
+
+        pet_id = response.data['id']
+        self.client.patch(f'/api/v1/pets/{pet_id}/', {'breed': self.cat_breed.id})
+        self.assertEqual(self.counts(self.owner), {self.animal_type.id: 2, self.cat_type.id: 2})
+
+        transfer = PetTransfer.start(pet=Pet.objects.get(id=pet_id), from_user=self.owner, to_user=self.other_owner)
+        transfer.mark_accepted()
+        self.assertEqual(self.counts(self.owner), {self.animal_type.id: 2, self.cat_type.id: 1})
+        self.assertEqual(self.counts(self.other_owner), {self.cat_type.id: 1})
+
+        Pet.objects.filter(owner=self.owner).soft_delete()
+        self.assertEqual(self.counts(self.owner), {})
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/pets/counts/')
+        self.assertEqual(response.data['total'], 0)
+        self.other_owner.is_staff = True
+        self.client.force_authenticate(self.other_owner)
+        response = self.client.get('/api/v1/pets/counts/')
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(response.data['by_animal_type'][0]['slug'], 'gato')
+
+    def test_counters_follow_changes_outside_the_api(self):
+        # Alta y edición directas (admin, shell, otras apps) pasan por Pet.save
+        pet = Pet.objects.create(owner=self.owner, name='Firulais', breed=self.breeds[0])
+        Pet.objects.create(owner=self.owner, name='Michi', breed=self.cat_breed)
+        self.assertEqual(self.counts(self.owner), {self.animal_type.id: 1, self.cat_type.id: 1})
+
+        pet = Pet.objects.get(id=pet.id)
+        pet.owner = self.other_owner
+        pet.save()
+        pet.is_active = False
+        pet.save()
+        self.assertEqual(self.counts(self.other_owner), {})
+        pet.is_active = True
+        pet.save()
+        self.assertEqual(self.counts(self.other_owner), {self.animal_type.id: 1})
+
+        # Sin cambios de dueño, raza ni estado no se tocan los contadores
+        with self.assertNumQueries(1):
+            pet.name = 'Firu'
+            pet.save()
+
+        # Borrado definitivo, también desde un queryset (acción del admin)
+        pet.delete()
+        self.assertEqual(self.counts(self.other_owner), {})
+        Pet.objects.filter(owner=self.owner, breed=self.cat_breed).delete()
+        self.assertEqual(self.counts(self.owner), {})
+
+        # Al borrar la raza o el tipo de animal las mascotas quedan sin raza
+        Pet.objects.create(owner=self.owner, name='Michi', breed=self.cat_breed)
+        Pet.objects.create(owner=self.owner, name='Firulais', breed=self.breeds[1])
+        self.cat_breed.delete()
+        self.assertEqual(self.counts(self.owner), {self.animal_type.id: 1, None: 1})
+        self.animal_type.delete()
+        self.assertEqual(self.counts(self.owner), {None: 2})
+        self.assertEqual(reconcile_owner_pet_counts(dry_run=True), [])
+
+        # Borrar al dueño borra sus contadores sin volver a crearlos
+        self.owner.delete()
+        self.assertFalse(OwnerPetCount.objects.filter(owner_id=self.owner.id).exists())
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        # bulk_create no pasa por Pet.save: los contadores no ven estas mascotas
+        Pet.objects.bulk_create([
+            *(Pet(owner=self.owner, name=f'Mascota {i}', breed=self.breeds[i]) for i in range(3)),
+            Pet(owner=self.other_owner, name='Michi', breed=self.cat_breed),
+        ])
+        OwnerPetCount.objects.create(owner=self.other_owner, animal_type=self.animal_type, count=5)
+
+        drift = reconcile_owner_pet_counts(dry_run=True)
+        self.assertEqual(len(drift), 3)
+        self.assertEqual(OwnerPetCount.objects.count(), 1)
+
+        # La tarea periódica (Celery beat) corrige las diferencias
+        self.assertIn('apps.pets.tasks.reconcile_owner_pet_counts', [
+            entry['task'] for entry in celery_app.conf.CELERY_BEAT_SCHEDULE.values()
+        ])
+        self.assertEqual(reconcile_owner_pet_counts_task(), 3)
+        self.assertEqual(self.counts(self.owner), {self.animal_type.id: 3})
+        self.assertEqual(self.counts(self.other_owner), {self.cat_type.id: 1})
+        self.assertEqual(reconcile_owner_pet_counts(dry_run=True), [])
+
+
+class PetPopulationSnapshotTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.owner.is_staff = True
+        self.owner.save()
+        self.today = timezone.localdate()
+        Pet.objects.bulk_create([
+            Pet(owner=self.owner, name='Cachorro', breed=self.breeds[0], sex='M',
+                birth_date=self.today - timedelta(days=100), weight_kg=Decimal('4.00')),
+            Pet(owner=self.owner, name='Adulto', breed=self.breeds[0], sex='M', neutered=True,
+                birth_date=date(self.today.year - 5, 1, 1), weight_kg=Decimal('30.00')),
+            Pet(owner=self.owner, name='Adulta', breed=self.breeds[1], sex='F', neutered=True,
+                birth_date=date(self.today.year - 5, 1, 1), weight_kg=Decimal('20.00')),
+            Pet(owner=self.owner, name='Sin datos', breed=None),
+            Pet(owner=self.owner, name='Eliminada', breed=self.breeds[0], is_active=False),
+        ])
+
+    def test_snapshot_is_a_single_aggregate_query(self):
+        # Borrado de la foto anterior, el GROUP BY y el INSERT (más el savepoint)
+        with self.assertNumQueries(5):
+            self.assertEqual(build_population_snapshot(self.today), 4)
+        # Recalcular el mismo día reemplaza la foto
+        build_population_snapshot(self.today)
+        self.assertEqual(PetPopulationSnapshot.objects.filter(date=self.today).count(), 4)
+        self.assertEqual(
+            PetPopulationSnapshot.objects.get(breed=self.breeds[0], age_band='<1').weight_band, '0-5'
+        )
+
+    def test_report_groups_and_filters(self):
+        build_population_snapshot(self.today)
+        build_population_snapshot(self.today - timedelta(days=1))
+
+        response = self.client.get('/api/v1/analytics/population/', {'group_by': 'animal_type'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['date'], row['animal_type'], row['count']) for row in response.data],
+            [
+                (self.today - timedelta(days=1), None, 1), (self.today - timedelta(days=1), self.animal_type.id, 3),
+                (self.today, None, 1), (self.today, self.animal_type.id, 3),
+            ]
+        )
+        self.assertEqual(response.data[-1]['avg_weight_kg'], Decimal('18.00'))
+
+        response = self.client.get('/api/v1/analytics/population/', {
+            'group_by': 'age_band,sex', 'neutered': 'true', 'date_from': self.today.isoformat(),
+        })
+        self.assertEqual(
+            [(row['age_band'], row['sex'], row['count']) for row in response.data],
+            [('3-6', 'F', 1), ('3-6', 'M', 1)]
+        )
+
+    def test_report_is_admin_only_and_validates_parameters(self):
+        self.assertEqual(self.client.get('/api/v1/analytics/population/', {'group_by': 'color'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/analytics/population/', {'date_from': 'ayer'}).status_code, 400)
+        self.owner.is_staff = False
+        self.owner.save()
+        self.assertEqual(self.client.get('/api/v1/analytics/population/').status_code, 403)
+
+
+class PetTransferExpiryTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.pets = self.create_pets(5)
+        self.other_owner = User.objects.create(username='other', email='other@mail.com')
+        self.transfers = [
+            PetTransfer.start(pet=pet, from_user=self.owner, to_user=self.other_owner) for pet in self.pets
+        ]
+
+    def test_sweeper_cancels_expired_transfers_in_batches(self):
+        expired = [transfer.id for transfer in self.transfers[:3]]
+        PetTransfer.objects.filter(id__in=expired).update(expires_at=timezone.now() - timedelta(minutes=1))
+        PetTransfer.objects.filter(id=self.transfers[0].id).update(status='accepted')
+
+        # Dos lotes con UPDATE y uno vacío al final
+        with self.assertNumQueries(3):
+            metrics = expire_pending_transfers(batch_size=1)
+        self.assertEqual((metrics['expired'], metrics['batches']), (2, 2))
+
+        self.assertEqual(
+            sorted(PetTransfer.objects.filter(status='cancelled').values_list('id', flat=True)),
+            expired[1:]
+        )
+        self.assertEqual(PetTransfer.objects.filter(status='pending').count(), 2)
+        # La mascota queda libre para una transferencia nueva
+        PetTransfer.start(pet=self.pets[1], from_user=self.owner, to_user=self.other_owner)
+        self.assertEqual(expire_pending_transfers()['expired'], 0)
+
+
+class PetTransferAcceptTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.pet = Pet.objects.create(owner=self.owner, name='Firulais', breed=self.breeds[0])
+        self.receiver = User.objects.create(username='receiver', email='receiver@mail.com')
+        self.transfer = PetTransfer.start(pet=self.pet, from_user=self.owner, to_user=self.receiver)
+        self.client.force_authenticate(self.receiver)
+
+    def accept(self, code=None):
+        return self.client.post('/api/v1/pets/accept_transfer/', {'code': code or self.transfer.code})
+
+    def test_accept_is_two_conditional_updates(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.accept()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['pet'], self.pet.id)
+        # Sin lecturas ni bloqueos previos: un UPDATE de la transferencia, uno
+        # de la mascota y los contadores
+        statements = [query['sql'] for query in queries]
+        self.assertEqual(
+            [sql.split()[1].strip('"') for sql in statements if sql.startswith('UPDATE')],
+            ['pets_pettransfer', 'pets_pet', 'pets_ownerpetcount']
+        )
+        self.assertFalse([sql for sql in statements if sql.startswith('SELECT') and '"pets_pet' in sql])
+
+        self.pet.refresh_from_db()
+        self.transfer.refresh_from_db()
+        self.assertEqual((self.pet.owner, self.transfer.status), (self.receiver, 'accepted'))
+        self.assertEqual(self.pet.last_transferred_at, self.transfer.accepted_at)
+        self.assertEqual(OwnerPetCount.objects.get(owner=self.receiver).count, 1)
+        self.assertEqual(OwnerPetCount.objects.get(owner=self.owner).count, 0)
+
+        # Una segunda aceptación ya no encuentra la transferencia pendiente
+        self.assertEqual(self.accept().status_code, 404)
+
+    def test_expired_wrong_user_and_deleted_pet(self):
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.accept().status_code, 404)
+        self.client.force_authenticate(self.receiver)
+
+        Pet.objects.filter(id=self.pet.id).soft_delete()
+        self.assertEqual(self.accept().status_code, 409)
+        self.transfer.refresh_from_db()
+        self.assertEqual(self.transfer.status, 'pending')
+
+        PetTransfer.objects.filter(id=self.transfer.id).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.accept().status_code, 400)
+        self.transfer.refresh_from_db()
+        self.assertEqual(self.transfer.status, 'cancelled')
+
+
+class PetTransferStartTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.pet = Pet.objects.create(owner=self.owner, name='Firulais')
+        self.receiver = User.objects.create(username='receiver', email='receiver@mail.com')
+
+    def start(self, email='receiver@mail.com', pet=None):
+        return self.client.post(f'/api/v1/pets/{(pet or self.pet).id}/start_transfer/', {'to_user_email': email})
+
+    def test_start_uses_a_fixed_query_budget(self):
+        # Consulta de elegibilidad, INSERT y evento del outbox (más el savepoint)
+        with self.assertNumQueries(5):
+            response = self.start()
+        self.assertEqual(response.status_code, 201)
+        transfer = PetTransfer.objects.get(pet=self.pet, status='pending')
+        self.assertEqual((transfer.to_user, transfer.code), (self.receiver, response.data['transfer_code']))
+
+        # Con una transferencia pendiente basta la consulta de elegibilidad
+        with self.assertNumQueries(1):
+            self.assertEqual(self.start().status_code, 400)
+
+    def test_eligibility_errors(self):
+        self.assertEqual(self.start('nadie@mail.com').status_code, 400)
+        self.assertEqual(self.start('owner@mail.com').status_code, 400)
+
+        other_pet = Pet.objects.create(owner=self.receiver, name='Ajena')
+        self.assertEqual(self.start(pet=other_pet).status_code, 404)
+
+        Pet.objects.filter(id=self.pet.id).update(last_transferred_at=timezone.now() - timedelta(days=1))
+        response = self.start()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('6 día', response.data['detail'])
+        self.assertFalse(PetTransfer.objects.exists())
+
+    def test_pending_transfer_race_is_caught_by_the_constraint(self):
+        # Otra petición inserta la transferencia entre la consulta y el INSERT
+        with mock.patch('django.db.models.Exists.as_sql', return_value=('FALSE', [])):
+            PetTransfer.start(pet=self.pet, from_user=self.owner, to_user=self.receiver)
+            response = self.start()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(PetTransfer.objects.filter(pet=self.pet).count(), 1)
+
+    def test_legacy_route_still_starts_transfers(self):
+        url = '/api/v1/pets/start_transfer/'
+        response = self.client.post(url, {'pet': self.pet.id, 'to_user_id': self.owner.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('to_user_id', response.data)
+
+        response = self.client.post(url, {'pet': self.pet.id, 'to_user_id': self.receiver.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Deprecation'], 'true')
+        transfer = PetTransfer.objects.get(pet=self.pet, status='pending')
+        self.assertEqual((transfer.to_user, transfer.code), (self.receiver, response.data['transfer_code']))
+
+
+class PetTransferBatchTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        User.objects.filter(id=self.owner.id).update(role='sucursal')
+        self.owner.refresh_from_db()
+        self.client.force_authenticate(self.owner)
+        self.pets = self.create_pets(5)
+        self.receiver = User.objects.create(username='receiver', email='receiver@mail.com')
+
+    def start(self, pets=None, email='receiver@mail.com'):
+        pet_ids = [pet.id for pet in (self.pets if pets is None else pets)]
+        return self.client.post('/api/v1/pets/bulk_start_transfer/', {'pets': pet_ids, 'to_user_email': email})
+
+    def accept(self, batch_code):
+        return self.client.post('/api/v1/pets/bulk_accept_transfer/', {'batch_code': batch_code})
+
+    def test_start_and_accept_batch(self):
+        # Una consulta de validación, un solo INSERT y los eventos del outbox (más el savepoint)
+        with self.assertNumQueries(5):
+            response = self.start()
+        self.assertEqual(response.status_code, 201)
+        batch_code = response.data['batch_code']
+        self.assertEqual(PetTransfer.objects.filter(batch_code=batch_code, status='pending').count(), 5)
+
+        self.client.force_authenticate(self.receiver)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.accept(batch_code)
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(response.data['pets'], [pet.id for pet in self.pets])
+        self.assertEqual(
+            [query['sql'].split()[1].strip('"') for query in queries if query['sql'].startswith('UPDATE')],
+            ['pets_pettransfer', 'pets_pet', 'pets_ownerpetcount']
+        )
+        self.assertEqual(Pet.objects.filter(owner=self.receiver).count(), 5)
+        self.assertEqual(OwnerPetCount.objects.get(owner=self.receiver).count, 5)
+        self.assertEqual(OwnerPetCount.objects.get(owner=self.owner).count, 0)
+        self.assertEqual(self.accept(batch_code).status_code, 404)
+
+    def test_start_is_all_or_nothing(self):
+        PetTransfer.start(pet=self.pets[0], from_user=self.owner, to_user=self.receiver)
+        Pet.objects.filter(id=self.pets[1].id).update(last_transferred_at=timezone.now())
+        other_pet = Pet.objects.create(owner=self.receiver, name='Ajena')
+
+        response = self.start(self.pets + [other_pet])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['pets']), [other_pet.id])
+
+        response = self.start()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['pets']), {self.pets[0].id, self.pets[1].id})
+        self.assertEqual(self.start(self.pets[2:], email='nadie@mail.com').status_code, 400)
+        self.assertEqual(PetTransfer.objects.count(), 1)
+
+        # Solo sucursales y veterinarios
+        User.objects.filter(id=self.owner.id).update(role='cliente')
+        self.owner.refresh_from_db()
+        self.assertEqual(self.start(self.pets[2:]).status_code, 403)
+
+    def test_accept_rolls_back_if_a_pet_changed_owner(self):
+        batch_code = self.start().data['batch_code']
+        Pet.objects.filter(id=self.pets[0].id).soft_delete()
+
+        self.client.force_authenticate(self.receiver)
+        self.assertEqual(self.accept(batch_code).status_code, 409)
+        self.assertEqual(PetTransfer.objects.filter(batch_code=batch_code, status='pending').count(), 5)
+        self.assertFalse(Pet.objects.filter(owner=self.receiver).exists())
+
+        PetTransfer.objects.filter(batch_code=batch_code).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.accept(batch_code).status_code, 400)
+        self.assertFalse(PetTransfer.objects.filter(status='pending').exists())
+
+
+class PetTransferHistoryTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.other = User.objects.create(username='other', email='other@mail.com')
+        self.stranger = User.objects.create(username='stranger', email='stranger@mail.com')
+        own_pets = self.create_pets(3)
+        other_pets = [Pet.objects.create(owner=self.other, name=f'Ajena {i}') for i in range(4)]
+        # Enviadas y recibidas intercaladas en el tiempo, de la más reciente a la más antigua
+        now = timezone.now()
+        self.transfers = []
+        for minutes, (pet, from_user, to_user) in enumerate([
+            (own_pets[0], self.owner, self.other), (other_pets[0], self.other, self.owner),
+            (own_pets[1], self.owner, self.other), (other_pets[1], self.other, self.owner),
+            (own_pets[2], self.owner, self.other), (other_pets[2], self.other, self.owner),
+        ]):
+            transfer = PetTransfer.start(pet=pet, from_user=from_user, to_user=to_user)
+            PetTransfer.objects.filter(id=transfer.id).update(created_at=now - timedelta(minutes=minutes))
+            self.transfers.append(transfer)
+        self.transfers[0].mark_cancelled()
+        # Transferencia ajena al usuario
+        PetTransfer.start(pet=other_pets[3], from_user=self.other, to_user=self.stranger)
+        self.expected = [transfer.id for transfer in self.transfers]
+
+    def test_history_merges_sent_and_received_by_cursor(self):
+        ids, url = [], '/api/v1/transfers/?limit=2'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # Una consulta por dirección, cada una sobre su índice y sin OR
+            self.assertEqual(len(queries), 2)
+            self.assertFalse([query['sql'] for query in queries if ' OR "pets_pettransfer"."to_user_id"' in query['sql']])
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, self.expected)
+
+        results = self.client.get('/api/v1/transfers/').data['results']
+        self.assertEqual(results[0]['pet'], {'id': self.transfers[0].pet_id, 'name': 'Mascota 0', 'photo': None})
+        self.assertEqual(results[0]['direction'], 'out')
+        self.assertEqual(results[1]['direction'], 'in')
+        self.assertNotIn('code', results[0])
+
+        # La página anterior regresa las mismas filas
+        page = self.client.get('/api/v1/transfers/?limit=2').data
+        second = self.client.get(page['next']).data
+        self.assertEqual(self.client.get(second['previous']).data['results'], page['results'])
+
+    def test_status_and_direction_filters(self):
+        response = self.client.get('/api/v1/transfers/?status=pending&direction=out')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.transfers[2].id, self.transfers[4].id])
+        response = self.client.get('/api/v1/transfers/?direction=in')
+        self.assertEqual(len(response.data['results']), 3)
+
+        self.assertEqual(self.client.get(f'/api/v1/transfers/{self.transfers[1].id}/').status_code, 200)
+        self.client.force_authenticate(self.stranger)
+        self.assertEqual(self.client.get(f'/api/v1/transfers/{self.transfers[1].id}/').status_code, 404)
+        self.assertEqual(len(self.client.get('/api/v1/transfers/').data['results']), 1)
+
+
+class LocalSMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.reply('220 localhost')
+        recipients = []
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            if command.upper().startswith('RCPT'):
+                recipients.append(command.split(':', 1)[1].strip().strip('<>'))
+            if command.upper() == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                self.server.messages.append((recipients, email.message_from_bytes(data, policy=email.policy.default)))
+            if command.upper() == 'QUIT':
+                self.reply('221 Bye')
+                return
+            self.reply('250 OK')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Servidor SMTP mínimo en localhost que guarda los mensajes recibidos"""
+    daemon_threads = True
+
+    def __init__(self):
+        self.messages = []
+        super().__init__(('127.0.0.1', 0), LocalSMTPHandler)
+
+
+class OutboxTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        User.objects.filter(id=self.owner.id).update(role='sucursal')
+        self.owner.refresh_from_db()
+        self.client.force_authenticate(self.owner)
+        self.pets = self.create_pets(3)
+        self.receiver = User.objects.create(username='receiver', email='receiver@mail.com')
+        self.transport = InMemoryTransport()
+
+    def start_batch(self, pets=None):
+        response = self.client.post(
+            '/api/v1/pets/bulk_start_transfer/',
+            {'pets': [pet.id for pet in pets or self.pets], 'to_user_email': 'receiver@mail.com'}
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data['batch_code']
+
+    def test_events_are_written_in_the_transaction_of_the_change(self):
+        response = self.client.post(f'/api/v1/pets/{self.pets[0].id}/start_transfer/', {'to_user_email': 'receiver@mail.com'})
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.kind, event.recipient, event.status), ('transfer_started', self.receiver, 'pending'))
+        self.assertEqual(event.payload, {'pet': self.pets[0].id, 'from_user': self.owner.id, 'code': response.data['transfer_code']})
+
+        # La aceptación que se revierte no deja evento
+        Pet.objects.filter(id=self.pets[0].id).soft_delete()
+        self.client.force_authenticate(self.receiver)
+        self.assertEqual(self.client.post('/api/v1/pets/accept_transfer/', {'code': response.data['transfer_code']}).status_code, 409)
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+        self.client.force_authenticate(self.owner)
+        batch_code = self.start_batch(self.pets[1:])
+        self.client.force_authenticate(self.receiver)
+        self.assertEqual(self.client.post('/api/v1/pets/bulk_accept_transfer/', {'batch_code': batch_code}).status_code, 200)
+        accepted = OutboxEvent.objects.filter(kind='transfer_accepted')
+        self.assertEqual(sorted(event.payload['pet'] for event in accepted), [pet.id for pet in self.pets[1:]])
+        self.assertEqual({event.recipient_id for event in accepted}, {self.owner.id})
+
+    def test_dispatch_coalesces_events_per_recipient(self):
+        batch_code = self.start_batch()
+        PetTransfer.objects.filter(pet=self.pets[0]).delete()
+        PetTransfer.start(pet=self.pets[0], from_user=self.receiver, to_user=self.owner)
+
+        # Reclamar el lote, mascotas, usuarios y marcar como enviados (más el savepoint)
+        with self.assertNumQueries(6):
+            metrics = dispatch_outbox(transport=self.transport)
+        self.assertEqual(metrics, {'events': 4, 'notifications': 2, 'failed': 0})
+        by_email = {notification.recipient.email: notification for notification in self.transport.sent}
+        self.assertEqual(len(by_email['receiver@mail.com'].lines), 1)
+        self.assertIn(batch_code, by_email['receiver@mail.com'].body)
+        self.assertIn('3 mascota(s): Mascota 0, Mascota 1, Mascota 2', by_email['receiver@mail.com'].body)
+        self.assertIn('receiver@mail.com quiere transferirte a Mascota 0', by_email['owner@mail.com'].body)
+
+        self.assertFalse(OutboxEvent.objects.exclude(status='sent').exists())
+        self.assertEqual(dispatch_outbox(transport=self.transport)['events'], 0)
+
+    @override_settings(PET_OUTBOX_MAX_ATTEMPTS=2, PET_OUTBOX_RETRY_BASE_SECONDS=30)
+    def test_failed_delivery_is_retried_with_backoff(self):
+        self.start_batch()
+        self.transport.failing.add(self.receiver.id)
+
+        self.assertEqual(dispatch_outbox(transport=self.transport)['failed'], 1)
+        events = OutboxEvent.objects.all()
+        self.assertEqual({(event.status, event.attempts) for event in events}, {('pending', 1)})
+        self.assertTrue(all(event.available_at > timezone.now() + timedelta(seconds=25) for event in events))
+        self.assertIn('no disponible', events[0].last_error)
+        # Aún no toca reintentar
+        self.assertEqual(dispatch_outbox(transport=self.transport)['events'], 0)
+
+        OutboxEvent.objects.update(available_at=timezone.now())
+        dispatch_outbox(transport=self.transport)
+        self.assertEqual({(event.status, event.attempts) for event in OutboxEvent.objects.all()}, {('failed', 2)})
+        self.assertEqual(self.transport.sent, [])
+
+    def test_email_transport_with_local_smtp_server(self):
+        server = LocalSMTPServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.start_batch()
+
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.server_address[1], EMAIL_TIMEOUT=5
+        ):
+            metrics = dispatch_outbox(transport=EmailTransport())
+        self.assertEqual(metrics['notifications'], 1)
+        [(recipients, message)] = server.messages
+        self.assertEqual(recipients, ['receiver@mail.com'])
+        self.assertEqual(message['Subject'], 'Tienes 3 novedades de tus mascotas')
+        self.assertIn('Mascota 2', message.get_content())
+
+    @skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED de PostgreSQL')
+    def test_dispatch_claims_with_skip_locked(self):
+        self.start_batch()
+        with CaptureQueriesContext(connection) as queries:
+            dispatch_outbox(transport=self.transport)
+        [claim] = [query['sql'] for query in queries if query['sql'].startswith('SELECT "pets_outboxevent"')]
+        self.assertIn('FOR UPDATE OF "pets_outboxevent" SKIP LOCKED', claim)
+
+
+class PetPhotoVariantsTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.pet = self.create_pets(1)[0]
+        self.use_temporary_media()
+
+    def jpeg_with_exif(self):
+        image = Image.new('RGB', (2000, 1000), 'orange')
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientación: rotar 90°
+        exif[0x010F] = 'Camara'
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', exif=exif.tobytes())
+        return SimpleUploadedFile('firulais.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_upload_generates_webp_variants_in_background(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/v1/pets/{self.pet.id}/', {'photo': self.jpeg_with_exif()}, format='multipart'
+            )
+            # La respuesta sale antes de generar las variantes
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(response.data['photo_thumbnail'])
+
+        response = self.client.get(f'/api/v1/pets/{self.pet.id}/')
+        self.assertTrue(response.data['photo_thumbnail'].endswith('.webp'))
+        self.assertTrue(response.data['photo_medium'].endswith('.webp'))
+
+        self.pet.refresh_from_db()
+        for field, size in (('photo_thumbnail', 320), ('photo_medium', 1280)):
+            with getattr(self.pet, field).open('rb') as file, Image.open(file) as image:
+                self.assertEqual(image.format, 'WEBP')
+                # Orientación aplicada: la imagen queda vertical
+                self.assertEqual(image.size, (size // 2, size))
+                self.assertFalse(image.getexif())
+
+    def test_new_photo_clears_previous_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/v1/pets/{self.pet.id}/', {'photo': self.jpeg_with_exif()}, format='multipart')
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.patch(
+                f'/api/v1/pets/{self.pet.id}/', {'photo': self.jpeg_with_exif()}, format='multipart'
+            )
+        self.assertIsNone(response.data['photo_thumbnail'])
+        self.assertIsNone(response.data['photo_medium'])
+
+    def test_invalid_image_is_a_bad_request(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.patch(
+                f'/api/v1/pets/{self.pet.id}/',
+                {'photo': SimpleUploadedFile('notas.jpg', b'no es una imagen', content_type='image/jpeg')},
+                format='multipart'
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['photo'], ['El archivo no es una imagen válida'])
+        self.assertEqual(callbacks, [])
+        self.pet.refresh_from_db()
+        self.assertFalse(self.pet.photo)
+
+    def test_retries_storage_errors_but_not_invalid_images(self):
+        name = self.pet.photo.storage.save('pets/photos/notas.jpg', io.BytesIO(b'no es una imagen'))
+        Pet.objects.filter(id=self.pet.id).update(photo=name)
+
+        with mock.patch('apps.pets.tasks.render_variants', wraps=render_variants) as render:
+            with self.assertRaises(UnidentifiedImageError):
+                generate_pet_photo_variants.apply(args=(self.pet.id, name))
+        self.assertEqual(render.call_count, 1)
+
+        # Un error de E/S sí se reintenta
+        with mock.patch('apps.pets.tasks.render_variants', side_effect=ConnectionError):
+            with self.assertRaises(Retry):
+                generate_pet_photo_variants.apply(args=(self.pet.id, name))
+
+
+class PetPhotoStorageTest(PetTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_catalog()
+        self.pets = self.create_pets(2)
+        self.use_temporary_media()
+
+    def upload(self, pet, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/v1/pets/{pet.id}/',
+                {'photo': SimpleUploadedFile('foto.jpg', content, content_type='image/jpeg')},
+                format='multipart'
+            )
+        self.assertEqual(response.status_code, 200)
+        pet.refresh_from_db()
+        return pet.photo.name
+
+    def jpeg(self, color):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), color).save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+    def test_same_content_is_stored_once(self):
+        content = self.jpeg('red')
+        with mock.patch.object(FileSystemStorage, '_save', autospec=True, side_effect=FileSystemStorage._save) as put:
+            first = self.upload(self.pets[0], content)
+            second = self.upload(self.pets[1], content)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, f'pets/photos/{hashlib.sha256(content).hexdigest()[:2]}/{hashlib.sha256(content).hexdigest()}.jpg')
+        # La foto y su variante se suben una sola vez (en 64px las dos variantes son idénticas)
+        self.assertEqual(put.call_count, 2)
+        self.assertEqual(StoredFile.objects.get(name=first).refcount, 2)
+
+    def test_object_is_deleted_with_its_last_reference(self):
+        content = self.jpeg('blue')
+        name = self.upload(self.pets[0], content)
+        self.upload(self.pets[1], content)
+        storage = self.pets[0].photo.storage
+
+        # El borrado lógico conserva la foto; la purga suelta la referencia
+        self.client.delete(f'/api/v1/pets/{self.pets[0].id}/')
+        self.assertEqual(StoredFile.objects.get(name=name).refcount, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            purge_deleted_pets(older_than_days=0)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).refcount, 1)
+
+        # Cambiar la foto suelta la anterior
+        self.upload(self.pets[1], self.jpeg('green'))
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+
+class PetPhotoDirectUploadTest(PetTestMixin, TestCase):
+    """Subida directa contra el storage local (el PUT lo recibe PetPhotoUploadView)"""
+
+    def setUp(self):
+        self.create_catalog()
+        self.pet = self.create_pets(1)[0]
+        self.use_temporary_media()
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), 'purple').save(buffer, 'JPEG')
+        self.content = buffer.getvalue()
+
+    def request_upload(self, **data):
+        data = {'content_type': 'image/jpeg', 'size': len(self.content), **data}
+        return self.client.post(f'/api/v1/pets/{self.pet.id}/photo_upload/', data, format='json')
+
+    def put(self, upload, content, content_type='image/jpeg'):
+        # El PUT va directo al storage: sin credenciales de la API
+        return APIClient().generic('PUT', upload['url'], content, content_type=content_type)
+
+    def confirm(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f'/api/v1/pets/{self.pet.id}/photo_confirm/', {'token': token}, format='json')
+
+    def test_upload_and_confirm(self):
+        upload = self.request_upload().data
+        self.assertEqual(upload['method'], 'PUT')
+        self.assertTrue(upload['key'].startswith('pets/photos/uploads/'))
+
+        self.assertEqual(self.put(upload, self.content).status_code, 204)
+        response = self.confirm(upload['token'])
+        self.assertEqual(response.status_code, 200)
+
+        self.pet.refresh_from_db()
+        self.assertEqual(self.pet.photo.name, upload['key'])
+        self.assertEqual(self.pet.photo.read(), self.content)
+        self.assertEqual(StoredFile.objects.get(name=upload['key']).refcount, 1)
+        # Las variantes se generan igual que con la subida multipart
+        self.assertTrue(self.pet.photo_thumbnail.name.endswith('.webp'))
+
+    def test_limits(self):
+        self.assertEqual(self.request_upload(size=11 * 1024 * 1024).status_code, 400)
+        self.assertEqual(self.request_upload(content_type='application/pdf').status_code, 400)
+
+        upload = self.request_upload().data
+        self.assertEqual(self.put(upload, self.content, content_type='image/png').status_code, 400)
+        with override_settings(PET_PHOTO_UPLOAD_MAX_SIZE=10):
+            upload = self.request_upload(size=5).data
+            self.assertEqual(self.put(upload, self.content).status_code, 413)
+
+    def test_confirm_requires_uploaded_file_and_valid_token(self):
+        upload = self.request_upload().data
+        self.assertEqual(self.confirm(upload['token']).status_code, 400)
+        self.assertEqual(self.confirm(upload['token'] + 'x').status_code, 400)
+
+        other = self.create_pets(1)[0]
+        response = self.client.post(f'/api/v1/pets/{other.id}/photo_confirm/', {'token': upload['token']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.pet.refresh_from_db()
+        self.assertFalse(self.pet.photo)
+
+    def test_confirm_rejects_files_that_are_not_images(self):
+        upload = self.request_upload().data
+        self.assertEqual(self.put(upload, b'no es una imagen').status_code, 204)
+        response = self.confirm(upload['token'])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(get_pet_photo_storage().exists(upload['key']))
+        self.pet.refresh_from_db()
+        self.assertFalse(self.pet.photo)
+
+    def test_only_the_owner_or_staff_can_upload(self):
+        upload = self.request_upload().data
+        self.assertEqual(self.put(upload, self.content).status_code, 204)
+
+        stranger = User.objects.create(username='stranger', email='stranger@mail.com')
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.request_upload().status_code, 404)
+        self.assertEqual(self.confirm(upload['token']).status_code, 404)
+        self.pet.refresh_from_db()
+        self.assertFalse(self.pet.photo)
+
+        stranger.is_staff = True
+        stranger.save()
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.confirm(upload['token']).status_code, 200)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN solo se revisa en PostgreSQL')
+class PetQueryPlanTest(TestCase):
+    """
+    Corre EXPLAIN sobre las consultas principales de mascotas y transferencias
+    con una base sembrada (varios miles de mascotas, cientos de dueños y
+    decenas de razas) y falla si alguna recorre pets_pet o pets_pettransfer
+    completa (Seq Scan).
+    El listado sin filtros paginado con offset no se revisa: su COUNT(*) lee
+    todas las mascotas activas con o sin índice. Las páginas por cursor deben
+    buscar con (created_at, id) dentro del Index Cond, no como Filter.
+    """
+    tables = ('pets_pet', 'pets_pettransfer')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owners = User.objects.bulk_create([
+            User(username=f'owner{i}', email=f'owner{i}@mail.com') for i in range(200)
+        ])
+        cls.animal_types = AnimalType.objects.bulk_create([
+            AnimalType(slug=f'tipo-{i}', name=f'Tipo {i}') for i in range(12)
+        ])
+        cls.breeds = Breed.objects.bulk_create([
+            Breed(animal_type=cls.animal_types[i % 12], name=f'Raza {i}') for i in range(60)
+        ])
+        pets = Pet.objects.bulk_create([
+            Pet(
+                owner=cls.owners[i % 200], breed=cls.breeds[i % 60],
+                name=f'Mascota {i}', is_active=i % 10 != 0
+            )
+            for i in range(20000)
+        ])
+        PetTransfer.objects.bulk_create([
+            PetTransfer(
+                pet=pet, from_user=pet.owner, to_user=cls.owners[(i + 1) % 200],
+                code=PetTransfer.generate_code(), status='pending' if i % 4 == 0 else 'accepted',
+                expires_at=timezone.now() + timedelta(hours=i % 96 - 48)
+            )
+            for i, pet in enumerate(pets[:4000])
+        ])
+        with connection.cursor() as cursor:
+            for model in (User, AnimalType, Breed, Pet, PetTransfer):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def setUp(self):
+        self.owner = self.owners[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def assertNoSeqScan(self, plan, sql):
+        for table in self.tables:
+            self.assertNotIn(f'Seq Scan on {table} ', plan + ' ', f'{sql}\n{plan}')
+
+    def assertRequestUsesIndexes(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/pets/', params)
+        self.assertEqual(response.status_code, 200)
+        for query in queries:
+            self.assertNoSeqScan(self.explain(query['sql']), query['sql'])
+
+    def test_list_queries(self):
+        self.assertRequestUsesIndexes({'pagination': 'cursor'})
+        self.assertRequestUsesIndexes({'pagination': 'cursor', 'limit': 100})
+
+    def test_filter_queries(self):
+        for params in (
+            {'owner': self.owner.id},
+            {'breed': self.breeds[0].id},
+            {'breed__animal_type': self.animal_types[0].id},
+        ):
+            self.assertRequestUsesIndexes({**params, 'pagination': 'cursor'})
+            # El COUNT por tipo de animal abarca ~1/12 de las mascotas repartidas
+            # en todas las páginas de la tabla; leerla completa es lo más barato
+            if 'breed__animal_type' not in params:
+                self.assertRequestUsesIndexes(params)
+
+    def assertSeeksOnIndex(self, plan, index, *conditions):
+        """El plan recorre `index` con `conditions` en su Index Cond (no en un Filter)"""
+        lines = plan.splitlines()
+        scans = [i for i, line in enumerate(lines) if f'Index Scan Backward using {index} ' in line]
+        self.assertTrue(scans, plan)
+        index_cond = lines[scans[0] + 1]
+        self.assertIn('Index Cond:', index_cond, plan)
+        for condition in conditions:
+            self.assertIn(condition, index_cond, plan)
+
+    def test_cursor_pages_seek_on_the_index(self):
+        owner = self.owners[1]
+        for params, index, conditions in (
+            ({}, 'pets_pet_active_created_idx', []),
+            ({'owner': owner.id}, 'pets_pet_active_owner_idx', [f'owner_id = {owner.id}']),
+        ):
+            page = self.client.get('/api/v1/pets/', {**params, 'pagination': 'cursor'}).data
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(page['next'])
+            plan = self.explain(queries[-1]['sql'])
+            self.assertSeeksOnIndex(plan, index, 'ROW(created_at, id) < ROW(', *conditions)
+
+    def test_transfer_history_pages_seek_on_the_indexes(self):
+        user = self.owners[1]
+        self.client.force_authenticate(user)
+        page = self.client.get('/api/v1/transfers/', {'limit': 2}).data
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(page['next'])
+        self.assertEqual(len(queries), 2)
+        plans = [self.explain(query['sql']) for query in queries]
+        self.assertSeeksOnIndex(
+            plans[0], 'pets_transfer_from_created_idx', f'from_user_id = {user.id}', 'ROW(created_at, id) < ROW('
+        )
+        self.assertSeeksOnIndex(
+            plans[1], 'pets_transfer_to_created_idx', f'to_user_id = {user.id}', 'ROW(created_at, id) < ROW('
+        )
+
+    def assertQuerysetsUseIndexes(self, querysets):
+        for queryset in querysets:
+            self.assertNoSeqScan(queryset.explain(), str(queryset.query))
+
+    def test_transfer_queries(self):
+        transfer = PetTransfer.objects.filter(status='pending').first()
+        self.assertQuerysetsUseIndexes([
+            PetTransfer.objects.filter(pet_id=transfer.pet_id, status='pending'),
+            PetTransfer.objects.filter(code=transfer.code, status='pending'),
+            # Lote del barrido de transferencias vencidas
+            PetTransfer.objects.filter(status='pending', expires_at__lt=timezone.now()).order_by('expires_at')[:1000],
+        ])
+
+    def test_owner_and_updated_at_queries(self):
+        since = Pet.objects.order_by('-updated_at').values_list('updated_at', flat=True)[100]
+        self.assertQuerysetsUseIndexes([
+            Pet.objects.filter(is_active=True, owner=self.owner).order_by('-created_at', '-id'),
+            Pet.objects.filter(updated_at__gte=since).order_by('updated_at'),
+        ])
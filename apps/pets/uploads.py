@@ -0,0 +1,113 @@
+import os
+import uuid
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from PIL import Image, UnidentifiedImageError
+from storages.backends.s3boto3 import S3Boto3Storage
+from .storage import get_pet_photo_storage
+
+
+# Subidas directas de fotos: el cliente sube el archivo al storage con una
+# URL prefirmada y después confirma la llave en la API.
+PHOTO_UPLOAD_CONTENT_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+}
+PHOTO_UPLOAD_PREFIX = 'pets/photos/uploads/'
+PHOTO_UPLOAD_SALT = 'pets.photo-upload'
+
+
+def _max_size():
+    return int(getattr(settings, 'PET_PHOTO_UPLOAD_MAX_SIZE', 10 * 1024 * 1024))
+
+
+def _expires():
+    return int(getattr(settings, 'PET_PHOTO_UPLOAD_EXPIRES', 900))
+
+
+def create_photo_upload(pet, content_type, request):
+    """
+    Asigna una llave nueva bajo pets/photos/uploads/ y regresa cómo subirla:
+    en S3/MinIO un POST prefirmado cuya política limita el tamaño y el
+    Content-Type; con el storage local, un PUT a PetPhotoUploadView.
+    `token` firma la llave, la mascota y los límites para el paso de confirmación.
+    """
+    storage = get_pet_photo_storage()
+    key = f'{PHOTO_UPLOAD_PREFIX}{uuid.uuid4().hex}{PHOTO_UPLOAD_CONTENT_TYPES[content_type]}'
+    max_size = _max_size()
+    token = signing.dumps(
+        {'pet': pet.id, 'key': key, 'type': content_type, 'max_size': max_size},
+        salt=PHOTO_UPLOAD_SALT
+    )
+
+    if isinstance(storage, S3Boto3Storage):
+        presigned = storage.connection.meta.client.generate_presigned_post(
+            Bucket=storage.bucket_name,
+            Key=storage._normalize_name(key),
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, max_size],
+            ],
+            ExpiresIn=_expires(),
+        )
+        upload = {'method': 'POST', 'url': presigned['url'], 'fields': presigned['fields']}
+    else:
+        url = request.build_absolute_uri(reverse('pet-photo-direct-upload', args=[token]))
+        upload = {'method': 'PUT', 'url': url, 'headers': {'Content-Type': content_type}}
+
+    return {**upload, 'key': key, 'token': token, 'max_size': max_size, 'expires_in': _expires()}
+
+
+def verify_photo(file) -> bool:
+    """
+    True si `file` es una imagen que PIL puede abrir. verify() revisa la
+    estructura del archivo sin decodificar los píxeles; el archivo queda al
+    inicio para guardarlo después.
+    """
+    try:
+        with Image.open(file) as image:
+            image.verify()
+        return True
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return False
+    finally:
+        file.seek(0)
+
+
+def read_photo_upload_token(token):
+    """Regresa los datos firmados del token o lanza signing.BadSignature (incluye expirado)"""
+    return signing.loads(token, salt=PHOTO_UPLOAD_SALT, max_age=_expires())
+
+
+def head_photo_upload(key):
+    """
+    Regresa (size, content_type) del objeto subido o None si no existe.
+    En S3 es un solo HEAD, sin descargar el archivo.
+    """
+    storage = get_pet_photo_storage()
+    if isinstance(storage, S3Boto3Storage):
+        try:
+            head = storage.connection.meta.client.head_object(
+                Bucket=storage.bucket_name, Key=storage._normalize_name(key)
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return head['ContentLength'], head.get('ContentType')
+
+    if not storage.exists(key):
+        return None
+    # El storage local no guarda el Content-Type; la llave lleva la extensión asignada
+    extension = os.path.splitext(key)[1]
+    content_types = {ext: content_type for content_type, ext in PHOTO_UPLOAD_CONTENT_TYPES.items()}
+    return storage.size(key), content_types.get(extension)
+
+
+def discard_photo_upload(key):
+    """Borra un objeto subido que no pasó la validación (aún no tiene referencias)"""
+    get_pet_photo_storage().delete(key)
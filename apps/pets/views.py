@@ -1,13 +1,37 @@
-from django.db import transaction
+import csv
+import operator
+import os
+from functools import reduce
+from django.db import transaction, IntegrityError
+from django.db.models import Exists, OuterRef, Q, Subquery
 from django.utils import timezone
-from django.conf import settings
 from datetime import timedelta, datetime
 from rest_framework import viewsets, permissions, response, status, filters
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.utils.dateparse import parse_date
+from django.core import signing
+from django.core.files.base import File
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import *
 from .serializers import *
+from .importers import import_animal_types, import_breeds, import_pets, read_pet_rows
+from .exporters import export_pets, PET_EXPORT_FORMATS
+from .analytics import population_report, POPULATION_DIMENSIONS
+from .catalog import get_catalog_tree, breed_autocomplete
+from .cache import catalog_cache
+from .filters import TrigramSearchFilter
+from .pagination import CursorPaginationMixin, MergedKeysetPagination
+from .permissions import IsBranchUser
+from .fast_serializers import ValuesSerializer
+from .tasks import schedule_photo_variants
+from .storage import release_pet_files, get_pet_photo_storage
+from .uploads import create_photo_upload, read_photo_upload_token, head_photo_upload, discard_photo_upload, verify_photo
+from config.core.fieldsets import SparseFieldsetsViewMixin
 
 
 class AnimalTypeViewSet(viewsets.ModelViewSet):
@@ -23,6 +47,35 @@ class AnimalTypeViewSet(viewsets.ModelViewSet):
         return AnimalTypeSerializer
 
 
+    @action(detail=False, methods=['GET'], permission_classes=[permissions.IsAuthenticated])
+    def catalog(self, request):
+        """
+        Árbol completo de AnimalType activos con sus Breed activos.
+        Se sirve desde el cache pre-serializado con un ETag fuerte; si el
+        cliente envía If-None-Match con el ETag vigente responde 304. Fuera
+        de la autenticación, una respuesta cacheada no toca la base de datos.
+        """
+        etag, body = get_catalog_tree()
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+    @action(detail=False, methods=['GET'], permission_classes=[permissions.IsAuthenticated, permissions.IsAdminUser])
+    def catalog_stats(self, request):
+        """
+        Contadores del cache del catálogo en memoria del proceso que atiende
+        la petición (hits, misses, tamaño y versión)
+        """
+        return Response(catalog_cache.stats())
+
+
     @action(detail=False, methods=['POST'], permission_classes=[permissions.IsAuthenticated, permissions.IsAdminUser])
     def bulk_create(self, request):
         """
@@ -39,25 +92,15 @@ class AnimalTypeViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             data = serializer.validated_data['data']
-            created_objects = []
-            errors = []
-            
-            for index, item_data in enumerate(data):
-                try:
-                    # Crear cada AnimalType individualmente
-                    animal_type = AnimalType.objects.create(**item_data)
-                    created_objects.append({
-                        "index": index,
-                        "id": animal_type.id,
-                        "slug": animal_type.slug,
-                        "name": animal_type.name
-                    })
-                except Exception as e:
-                    errors.append({
-                        "index": index,
-                        "data": item_data,
-                        "error": str(e)
-                    })
+
+            try:
+                created_objects, errors = import_animal_types(data)
+            except IntegrityError as e:
+                # Otro proceso insertó alguno de los slugs entre la validación y el INSERT
+                return Response(
+                    {"detail": f"Conflicto al crear los registros: {e}"},
+                    status=status.HTTP_409_CONFLICT
+                )
             
             response_data = {
                 "message": f"Procesados {len(data)} registros",
@@ -79,7 +122,7 @@ class BreedViewSet(viewsets.ModelViewSet):
     queryset = Breed.objects.filter(is_active=True)
     serializer_class = BreedReadSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter]
     filterset_fields = ['animal_type', ]
     search_fields = ['name', ]
 
@@ -90,6 +133,30 @@ class BreedViewSet(viewsets.ModelViewSet):
         return BreedSerializer
 
 
+    @action(detail=False, methods=['GET'], permission_classes=[permissions.IsAuthenticated])
+    def autocomplete(self, request):
+        """
+        Autocompletado de razas por prefijo desde el índice en memoria
+        Parámetros: q (prefijo), animal_type (id, opcional), limit (opcional,
+        acotado por PET_BREED_AUTOCOMPLETE_LIMIT)
+        """
+        try:
+            animal_type = request.query_params.get('animal_type')
+            animal_type = int(animal_type) if animal_type else None
+            limit = request.query_params.get('limit')
+            limit = int(limit) if limit else None
+        except ValueError:
+            return Response(
+                {"detail": "animal_type y limit deben ser números enteros"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = breed_autocomplete.search(
+            request.query_params.get('q', ''), animal_type_id=animal_type, limit=limit
+        )
+        return Response(results)
+
+
     @action(detail=False, methods=['POST'], permission_classes=[permissions.IsAuthenticated, permissions.IsAdminUser])
     def bulk_create(self, request):
         """
@@ -121,50 +188,15 @@ class BreedViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             data = serializer.validated_data['data']
-            created_objects = []
-            errors = []
-            
-            for index, item_data in enumerate(data):
-                try:
-                    # Obtener el AnimalType por slug
-                    animal_type_slug = item_data.pop('animal_type_slug')
-                    
-                    try:
-                        animal_type = AnimalType.objects.get(slug=animal_type_slug, is_active=True)
-                    except AnimalType.DoesNotExist:
-                        errors.append({
-                            "index": index,
-                            "data": item_data,
-                            "error": f"AnimalType con slug '{animal_type_slug}' no existe o está inactivo"
-                        })
-                        continue
-                    
-                    # Verificar si la raza ya existe para este animal_type
-                    if Breed.objects.filter(animal_type=animal_type, name=item_data['name']).exists():
-                        errors.append({
-                            "index": index,
-                            "data": item_data,
-                            "error": f"La raza '{item_data['name']}' ya existe para {animal_type.name}"
-                        })
-                        continue
-                    
-                    # Crear el Breed con la relación
-                    breed = Breed.objects.create(animal_type=animal_type, **item_data)
-                    created_objects.append({
-                        "index": index,
-                        "id": breed.id,
-                        "animal_type": animal_type.name,
-                        "animal_type_slug": animal_type.slug,
-                        "name": breed.name,
-                        "is_active": breed.is_active
-                    })
-                    
-                except Exception as e:
-                    errors.append({
-                        "index": index,
-                        "data": item_data,
-                        "error": str(e)
-                    })
+
+            try:
+                created_objects, errors = import_breeds(data)
+            except IntegrityError as e:
+                # Otro proceso insertó alguna de las razas entre la validación y el INSERT
+                return Response(
+                    {"detail": f"Conflicto al crear los registros: {e}"},
+                    status=status.HTTP_409_CONFLICT
+                )
             
             response_data = {
                 "message": f"Procesados {len(data)} registros",
@@ -182,47 +214,62 @@ class BreedViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class PetViewSet(viewsets.ModelViewSet):
-    queryset = Pet.objects.filter(is_active=True)
+class PetViewSet(SparseFieldsetsViewMixin, CursorPaginationMixin, viewsets.ModelViewSet):
+    queryset = Pet.objects.all()
     serializer_class = PetSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter]
     filterset_fields = ['owner', 'breed', 'breed__animal_type' ]
     search_fields = ['name', ]
 
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list' or self.action == 'retrieve':
+            # PetReadSerializer embebe raza, tipo de animal y dueño en la misma consulta
+            queryset = queryset.select_related('breed__animal_type', 'owner')
+        return queryset
+
+
+    def get_serializer_class(self):
+        if self.action == 'list' or self.action == 'retrieve':
+            return PetReadSerializer
+        return super().get_serializer_class()
+
+
     def list(self, request, *args, **kwargs):
         """
-        Lista todos los AnimalType activos
+        Lista las mascotas activas
+        Por defecto usa el modo rápido: las filas salen de queryset.values() y
+        se convierten con el plan compilado del serializer (misma salida que
+        PetReadSerializer). Con ?fast=0, o si el serializer tiene campos que
+        el modo rápido no soporta, se usa el serializer normal.
+        Con ?pagination=cursor el orden es siempre (created_at, id): ?search
+        filtra, pero los resultados no se ordenan por similitud.
         """
-        return super().list(request, *args, **kwargs)
+        fast_serializer = None
+        if request.query_params.get('fast') != '0':
+            fast_serializer = ValuesSerializer.compile(self.get_serializer())
+        if fast_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        rows = fast_serializer.values(queryset, extra=ordering)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast_serializer.to_representation(page))
+        return Response(fast_serializer.to_representation(rows))
 
 
     def create(self, request, *args, **kwargs):
         # Copiar los datos para poder modificarlos
         data = request.data.copy()
         
-        # Extraer los campos auxiliares
-        breed = data.pop('breed', None)[0]
+        # Extraer los campos auxiliares (la raza la resuelve CachedBreedField)
         owner_email = data.pop('owner_email', None)
 
-        # Extraer e instanciar la raza del animal
-        # breed_instance = Breed.objects.filter(id=data.pop('breed')[0]).first() if 'breed' in data else None
-
-        # Obtener Breed si se proporciona
-        if breed:
-            try:
-                breed = Breed.objects.get(
-                    id=breed, 
-                    is_active=True
-                )
-                data['breed'] = breed.id  # Asignar el ID al campo del modelo
-            except Breed.DoesNotExist:
-                return Response(
-                    {'breed': f"Raza '{breed}' no encontrada"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
         # Obtener Owner por email si se proporciona
         if owner_email:
             try:
@@ -244,61 +291,435 @@ class PetViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
-    @action(detail=False, methods=["POST"], serializer_class=PetTransferStartSerializer)
+    @transaction.atomic
+    def perform_create(self, serializer):
+        pet = serializer.save()
+        OutboxEvent.publish([("pet_created", pet.owner_id, {"pet": pet.id})])
+        if pet.photo:
+            schedule_photo_variants(pet)
+
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        if 'photo' not in serializer.validated_data:
+            pet = serializer.save()
+        else:
+            # Foto nueva: las variantes anteriores ya no corresponden; las nuevas
+            # se generan en segundo plano y la respuesta no espera el redimensionado
+            previous = [instance.photo.name, instance.photo_thumbnail.name, instance.photo_medium.name]
+            pet = serializer.save(photo_thumbnail=None, photo_medium=None)
+            transaction.on_commit(lambda: release_pet_files(previous))
+            if pet.photo:
+                schedule_photo_variants(pet)
+
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Borrado lógico: marca la mascota como inactiva en un solo UPDATE, sin
+        cargarla ni borrar en cascada sus transferencias. La purga periódica
+        (purge_deleted_pets) la borra definitivamente después.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.filter(**{self.lookup_field: kwargs[lookup_url_kwarg]}).soft_delete():
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+    @action(detail=False, methods=['GET'])
+    def counts(self, request):
+        """
+        Número de mascotas activas del usuario por tipo de animal, leído de
+        OwnerPetCount (sin recorrer Pet). Los administradores pueden
+        consultar a otro dueño con ?owner=<id>.
+        """
+        owner_id = request.user.id
+        if request.query_params.get('owner') and request.user.is_staff:
+            try:
+                owner_id = int(request.query_params['owner'])
+            except ValueError:
+                return Response({"owner": "Debe ser un número entero"}, status=status.HTTP_400_BAD_REQUEST)
+
+        counts = list(
+            OwnerPetCount.objects.filter(owner_id=owner_id, count__gt=0)
+            .order_by('animal_type_id')
+            .values('animal_type_id', 'animal_type__slug', 'animal_type__name', 'count')
+        )
+        return Response({
+            "owner": owner_id,
+            "total": sum(row['count'] for row in counts),
+            "by_animal_type": [
+                {
+                    "animal_type": row['animal_type_id'],
+                    "slug": row['animal_type__slug'],
+                    "name": row['animal_type__name'],
+                    "count": row['count'],
+                }
+                for row in counts
+            ],
+        })
+
+
+    def get_own_object(self):
+        """
+        get_object() limitado a las mascotas del usuario (el staff puede usar
+        cualquiera); para los demás la mascota no existe (404)
+        """
+        pet = self.get_object()
+        if pet.owner_id != self.request.user.id and not self.request.user.is_staff:
+            raise Http404
+        return pet
+
+
+    @action(detail=True, methods=['POST'], serializer_class=PetPhotoUploadSerializer)
+    def photo_upload(self, request, pk=None):
+        """
+        Paso 1 de la subida directa de la foto: regresa una URL prefirmada
+        para subir el archivo al storage sin pasar por la API.
+        Payload: {"content_type": "image/jpeg", "size": 2483120}
+        Respuesta con S3/MinIO: {"method": "POST", "url", "fields", "token", ...};
+        el archivo se envía como multipart junto con `fields`.
+        Con el storage local: {"method": "PUT", "url", "headers", "token", ...}.
+        Solo para el dueño de la mascota o staff.
+        """
+        pet = self.get_own_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = create_photo_upload(pet, serializer.validated_data['content_type'], request)
+        return Response(upload, status=status.HTTP_201_CREATED)
+
+
+    @action(detail=True, methods=['POST'], serializer_class=PetPhotoConfirmSerializer)
+    def photo_confirm(self, request, pk=None):
+        """
+        Paso 2: verifica con un HEAD que el archivo del token se subió
+        (tamaño y Content-Type), que es una imagen y lo asigna a Pet.photo.
+        Payload: {"token": "..."}
+        """
+        pet = self.get_own_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            upload = read_photo_upload_token(serializer.validated_data['token'])
+        except signing.BadSignature:
+            return Response({'token': 'Token inválido o expirado'}, status=status.HTTP_400_BAD_REQUEST)
+        if upload['pet'] != pet.id:
+            return Response({'token': 'El token no corresponde a esta mascota'}, status=status.HTTP_400_BAD_REQUEST)
+
+        key = upload['key']
+        head = head_photo_upload(key)
+        if head is None:
+            return Response({'detail': 'El archivo no se ha subido'}, status=status.HTTP_400_BAD_REQUEST)
+        size, content_type = head
+        if size > upload['max_size'] or content_type != upload['type']:
+            discard_photo_upload(key)
+            return Response(
+                {'detail': 'El archivo subido no cumple con el tamaño o tipo permitido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        with get_pet_photo_storage().open(key, 'rb') as file:
+            is_image = verify_photo(file)
+        if not is_image:
+            discard_photo_upload(key)
+            return Response({'detail': 'El archivo no es una imagen válida'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            previous = [pet.photo.name, pet.photo_thumbnail.name, pet.photo_medium.name]
+            if key in previous:
+                return Response({'detail': 'El archivo ya está asignado'}, status=status.HTTP_409_CONFLICT)
+            pet.photo = key
+            pet.photo_thumbnail = None
+            pet.photo_medium = None
+            pet.save(update_fields=['photo', 'photo_thumbnail', 'photo_medium', 'updated_at'])
+            pet.photo.storage.add_reference(key, size=size)
+            transaction.on_commit(lambda: release_pet_files(previous))
+            schedule_photo_variants(pet)
+
+        return Response(PetSerializer(pet, context=self.get_serializer_context()).data)
+
+
+    @action(
+        detail=False, methods=['POST'], parser_classes=[MultiPartParser],
+        permission_classes=[permissions.IsAuthenticated, permissions.IsAdminUser]
+    )
+    def bulk_import(self, request):
+        """
+        Importa mascotas desde un archivo CSV o NDJSON (campo multipart `file`)
+        El formato se toma de la extensión (.csv, .ndjson, .jsonl) o del campo
+        `file_type`. Cada fila lleva `owner_email`, `breed` (id, opcional) y
+        los campos de Pet. El archivo se procesa por lotes sin cargarlo
+        completo en memoria.
+        Ejemplo CSV:
+            owner_email,name,breed,sex,birth_date,weight_kg
+            ana@mail.com,Firulais,3,M,2020-05-17,12.5
+        """
+        file = request.FILES.get('file')
+        if file is None:
+            return Response({'file': 'Se requiere un archivo'}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_type = request.data.get('file_type') or os.path.splitext(file.name)[1].lstrip('.').lower()
+        if file_type == 'jsonl':
+            file_type = 'ndjson'
+
+        try:
+            created, errors = import_pets(read_pet_rows(file, file_type))
+        except (ValueError, csv.Error) as e:
+            # Formato no soportado o archivo ilegible (codificación, CSV mal formado)
+            return Response({'file': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError as e:
+            return Response(
+                {"detail": f"Conflicto al crear los registros: {e}"},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        response_data = {
+            "message": f"Procesados {created + len(errors)} registros",
+            "created": created,
+            "errors": len(errors),
+        }
+        if errors:
+            response_data["errors_detail"] = errors
+            return Response(response_data, status=status.HTTP_207_MULTI_STATUS)
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
+
+    @action(detail=False, methods=['GET'], permission_classes=[permissions.IsAuthenticated, IsBranchUser])
+    def export(self, request):
+        """
+        Exporta las mascotas activas en CSV o NDJSON (?file_type=csv|ndjson)
+        Sucursales y veterinarios exportan sus propias mascotas; el staff, todas.
+        Acepta los mismos filtros que el listado (owner, breed, search...) y
+        con ?gzip=1 comprime la salida. Las filas se leen con un cursor del
+        servidor y se envían conforme se generan, con memoria constante sin
+        importar el tamaño del resultado. Las columnas son compatibles con
+        bulk_import.
+        """
+        file_type = request.query_params.get('file_type', 'csv').lower()
+        if file_type == 'jsonl':
+            file_type = 'ndjson'
+        if file_type not in PET_EXPORT_FORMATS:
+            return Response(
+                {'file_type': f"Formato no soportado, usa: {', '.join(PET_EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        use_gzip = request.query_params.get('gzip') in ('1', 'true')
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if not request.user.is_staff:
+            queryset = queryset.filter(owner=request.user)
+        # Con gzip se descarga un .gz (sin Content-Encoding, el cliente no lo descomprime)
+        response = StreamingHttpResponse(
+            export_pets(queryset, file_type, gzip=use_gzip),
+            content_type='application/gzip' if use_gzip else PET_EXPORT_FORMATS[file_type]
+        )
+        filename = f"pets-{timezone.now():%Y%m%d-%H%M%S}.{file_type}" + ('.gz' if use_gzip else '')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # Evita que nginx acumule la respuesta completa antes de enviarla
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+    @action(detail=True, methods=["POST"], serializer_class=PetTransferStartSerializer)
     def start_transfer(self, request, pk=None):
-        pet = self.get_object()  # IsOwner
-        data = self.get_serializer(data=request.data, context={"request": request})
+        """
+        Inicia la transferencia de una mascota propia a otro usuario (por email)
+        Todas las condiciones (la mascota es del usuario, el receptor existe y
+        no es el mismo, ya pasó PET_TRANSFER_COOLDOWN_DAYS desde la última
+        transferencia y no hay otra pendiente) salen de una sola consulta; la
+        unicidad de la transferencia pendiente la garantiza
+        uniq_pending_transfer_per_pet al insertar.
+        """
+        data = self.get_serializer(data=request.data)
         data.is_valid(raise_exception=True)
-        to_user = User.objects.get(email=data.validated_data["to_user_email"])
+        return self._start_transfer(
+            request, pk, User.objects.filter(email=data.validated_data["to_user_email"]), "to_user_email"
+        )
 
-        # cooldown
-        cooldown_days = int(getattr(settings, "PET_TRANSFER_COOLDOWN_DAYS", 7))
-        if pet.last_transferred_at:
-            next_allowed = pet.last_transferred_at + timedelta(days=cooldown_days)
-            if timezone.now() < next_allowed:
-                remaining = next_allowed - timezone.now()
-                remaining_days = (remaining.days + (1 if remaining.seconds else 0))
-                return response.Response(
-                    {"detail": f"No puedes transferir esta mascota aún. Inténtalo en ~{remaining_days} día(s)."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+    @action(
+        detail=False, methods=["POST"], url_path="start_transfer",
+        serializer_class=PetTransferLegacyStartSerializer
+    )
+    def start_transfer_legacy(self, request):
+        """
+        Ruta anterior: POST /pets/start_transfer/ con `pet` y `to_user_id`.
+        Obsoleta, se mantiene por una versión; los clientes deben usar
+        POST /pets/{id}/start_transfer/ con `to_user_email`.
+        """
+        data = self.get_serializer(data=request.data)
+        data.is_valid(raise_exception=True)
+        result = self._start_transfer(
+            request, data.validated_data["pet"], User.objects.filter(id=data.validated_data["to_user_id"]), "to_user_id"
+        )
+        result["Deprecation"] = "true"
+        return result
 
-        # única pending
-        if PetTransfer.objects.filter(pet=pet, status="pending").exists():
+    def _start_transfer(self, request, pet_id, recipients, recipient_field):
+        pet = (
+            Pet.objects.filter(pk=pet_id, owner=request.user)
+            .annotate(
+                to_user_id=Subquery(recipients.values("id")[:1]),
+                has_pending=Exists(PetTransfer.objects.filter(pet=OuterRef("pk"), status="pending")),
+            )
+            .values("id", "last_transferred_at", "to_user_id", "has_pending")
+            .first()
+        )
+        if pet is None:
+            return response.Response({"detail": "Mascota no encontrada."}, status=status.HTTP_404_NOT_FOUND)
+        if pet["to_user_id"] is None:
+            return response.Response({recipient_field: "Usuario destino no existe."}, status=status.HTTP_400_BAD_REQUEST)
+        if pet["to_user_id"] == request.user.id:
             return response.Response(
-                {"detail": "Ya existe una transferencia pendiente para esta mascota."},
+                {recipient_field: "El receptor no puede ser el mismo que el emisor."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        tr = PetTransfer.start(pet=pet, from_user=request.user, to_user=to_user, ttl_hours=48)
+        # cooldown
+        remaining_days = PetTransfer.cooldown_days(pet["last_transferred_at"])
+        if remaining_days:
+            return response.Response(
+                {"detail": f"No puedes transferir esta mascota aún. Inténtalo en ~{remaining_days} día(s)."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        pending_response = response.Response(
+            {"detail": "Ya existe una transferencia pendiente para esta mascota."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+        if pet["has_pending"]:
+            return pending_response
+        try:
+            tr = PetTransfer.start(
+                pet=Pet(id=pet["id"]), from_user=request.user, to_user=User(id=pet["to_user_id"]), ttl_hours=48
+            )
+        except IntegrityError:
+            # Otra petición creó la transferencia pendiente después de la consulta
+            return pending_response
 
         return response.Response(
             {"transfer_code": tr.code, "status": tr.status, "expires_at": tr.expires_at},
             status=status.HTTP_201_CREATED
         )
 
+    @action(
+        detail=False, methods=["POST"], serializer_class=PetTransferBatchStartSerializer,
+        permission_classes=[permissions.IsAuthenticated, IsBranchUser]
+    )
+    def bulk_start_transfer(self, request):
+        """
+        Inicia la transferencia de varias mascotas propias a un mismo usuario
+        (sucursales y veterinarios). Se validan todas en una sola consulta
+        (mismas condiciones que start_transfer) y, si ninguna falla, se crean
+        con un solo INSERT bajo un `batch_code` que el receptor acepta con
+        bulk_accept_transfer. Si alguna mascota no cumple no se crea ninguna.
+        """
+        data = self.get_serializer(data=request.data)
+        data.is_valid(raise_exception=True)
+        pet_ids = data.validated_data["pets"]
+
+        pets = list(
+            Pet.objects.filter(pk__in=pet_ids, owner=request.user)
+            .annotate(
+                to_user_id=Subquery(User.objects.filter(email=data.validated_data["to_user_email"]).values("id")[:1]),
+                has_pending=Exists(PetTransfer.objects.filter(pet=OuterRef("pk"), status="pending")),
+            )
+            .values("id", "last_transferred_at", "to_user_id", "has_pending")
+        )
+        found = {pet["id"] for pet in pets}
+        errors = {pet_id: "Mascota no encontrada." for pet_id in pet_ids if pet_id not in found}
+        if errors:
+            return response.Response({"pets": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        to_user_id = pets[0]["to_user_id"]
+        if to_user_id is None:
+            return response.Response({"to_user_email": "Usuario destino no existe."}, status=status.HTTP_400_BAD_REQUEST)
+        if to_user_id == request.user.id:
+            return response.Response(
+                {"to_user_email": "El receptor no puede ser el mismo que el emisor."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        for pet in pets:
+            remaining_days = PetTransfer.cooldown_days(pet["last_transferred_at"])
+            if remaining_days:
+                errors[pet["id"]] = f"No puedes transferir esta mascota aún. Inténtalo en ~{remaining_days} día(s)."
+            elif pet["has_pending"]:
+                errors[pet["id"]] = "Ya existe una transferencia pendiente para esta mascota."
+        if errors:
+            return response.Response({"pets": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            transfers = PetTransfer.start_batch(
+                pet_ids=pet_ids, from_user=request.user, to_user=User(id=to_user_id), ttl_hours=48
+            )
+        except IntegrityError:
+            # Otra petición creó una transferencia pendiente después de la consulta
+            return response.Response(
+                {"detail": "Alguna mascota ya tiene una transferencia pendiente."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return response.Response(
+            {
+                "batch_code": transfers[0].batch_code,
+                "status": "pending",
+                "expires_at": transfers[0].expires_at,
+                "transfers": [{"pet": tr.pet_id, "transfer_code": tr.code} for tr in transfers],
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(
+        detail=False, methods=["POST"], serializer_class=PetTransferBatchAcceptSerializer,
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def bulk_accept_transfer(self, request):
+        """Acepta en una transacción todas las transferencias de un lote (ver PetTransfer.accept_batch)"""
+        ser = self.get_serializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        batch_code = ser.validated_data["batch_code"]
+
+        try:
+            pet_ids = PetTransfer.accept_batch(batch_code=batch_code, to_user=request.user)
+        except ValueError as e:
+            return response.Response({"detail": str(e)}, status=status.HTTP_409_CONFLICT)
+
+        if not pet_ids:
+            now = timezone.now()
+            expired = PetTransfer.objects.filter(
+                batch_code=batch_code, status="pending", to_user=request.user, expires_at__lte=now
+            ).update(status="cancelled", cancelled_at=now)
+            if expired:
+                return response.Response({"detail": "Transferencia expirada."}, status=400)
+            return response.Response({"detail": "Transferencia no encontrada o no autorizada."}, status=404)
+        return response.Response({"detail": "Transferencias aceptadas", "pets": pet_ids})
+
     @action(detail=False, methods=["POST"], serializer_class=PetTransferAcceptSerializer, permission_classes=[permissions.IsAuthenticated])
     def accept_transfer(self, request, pk=None):
-        with transaction.atomic():
-            pet = Pet.objects.select_for_update().get(code=code)
-            ser = self.get_serializer(data=request.data); ser.is_valid(raise_exception=True)
-            code = ser.validated_data["code"]
+        """
+        Acepta una transferencia por su código (ver PetTransfer.accept)
+        Las transferencias vencidas se cancelan aquí si el barrido periódico
+        aún no lo hizo.
+        """
+        ser = self.get_serializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        code = ser.validated_data["code"]
 
-            try:
-                tr = PetTransfer.objects.select_for_update().get(
-                    pet=pet, to_user=request.user, status="pending", code=code
-                )
-            except PetTransfer.DoesNotExist:
-                return response.Response({"detail": "Transferencia no encontrada o no autorizada."}, status=404)
+        try:
+            pet_id = PetTransfer.accept(code=code, to_user=request.user)
+        except ValueError as e:
+            return response.Response({"detail": str(e)}, status=status.HTTP_409_CONFLICT)
 
-            if tr.is_expired():
-                tr.mark_cancelled()
+        if pet_id is None:
+            now = timezone.now()
+            expired = PetTransfer.objects.filter(
+                code=code, status="pending", to_user=request.user, expires_at__lte=now
+            ).update(status="cancelled", cancelled_at=now)
+            if expired:
                 return response.Response({"detail": "Transferencia expirada."}, status=400)
-
-            pet.owner = request.user
-            pet.save(update_fields=["owner"])
-            tr.mark_accepted()
-            return response.Response({"detail": "Transferencia aceptada"})
+            return response.Response({"detail": "Transferencia no encontrada o no autorizada."}, status=404)
+        return response.Response({"detail": "Transferencia aceptada", "pet": pet_id})
 
     @action(detail=True, methods=["POST"], permission_classes=[permissions.IsAuthenticated])
     def cancel_transfer(self, request, pk=None):
@@ -309,3 +730,132 @@ class PetViewSet(viewsets.ModelViewSet):
         if updated == 0:
             return response.Response({"detail": "No hay transferencias pendientes"}, status=404)
         return response.Response({"detail": "Transferencia cancelada"})
+
+
+class PetPopulationViewSet(viewsets.GenericViewSet):
+    """Estadísticas del padrón de mascotas a partir de las fotos diarias (solo administradores)"""
+    queryset = PetPopulationSnapshot.objects.all()
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    max_days = 366
+
+    def list(self, request):
+        """
+        Padrón por fecha agrupado por las dimensiones de ?group_by= (por
+        defecto animal_type): animal_type, breed, sex, neutered, microchip,
+        age_band, weight_band.
+        Parámetros: date_from y date_to (YYYY-MM-DD, por defecto los últimos
+        30 días) y filtros por cualquiera de las dimensiones, p. ej.
+        ?animal_type=1&neutered=true
+        """
+        params = request.query_params
+        try:
+            date_to = parse_date(params['date_to']) if params.get('date_to') else timezone.localdate()
+            date_from = parse_date(params['date_from']) if params.get('date_from') else date_to - timedelta(days=30)
+        except ValueError:
+            date_to = date_from = None
+        if date_from is None or date_to is None:
+            return Response({"detail": "date_from y date_to deben tener formato YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        if date_from > date_to or (date_to - date_from).days > self.max_days:
+            return Response(
+                {"detail": f"El rango de fechas debe ser válido y de máximo {self.max_days} días"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        group_by = [name.strip() for name in params.get('group_by', 'animal_type').split(',') if name.strip()]
+        unknown = set(group_by) - set(POPULATION_DIMENSIONS)
+        if unknown:
+            return Response(
+                {"group_by": f"Dimensiones no soportadas: {', '.join(sorted(unknown))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        filters = {}
+        for name in POPULATION_DIMENSIONS:
+            value = params.get(name)
+            if value is None:
+                continue
+            if name in ('neutered', 'microchip'):
+                value = value.lower() in ('1', 'true')
+            elif name in ('animal_type', 'breed'):
+                if not value.isdigit():
+                    return Response({name: "Debe ser un número entero"}, status=status.HTTP_400_BAD_REQUEST)
+                name = f'{name}_id'
+            filters[name] = value
+
+        return Response(population_report(date_from, date_to, list(dict.fromkeys(group_by)), filters))
+
+
+class PetTransferViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Historial de transferencias enviadas y recibidas por el usuario, de la
+    más reciente a la más antigua (paginación por cursor).
+    Filtros: ?status=pending|accepted|cancelled y ?direction=in|out
+    """
+    serializer_class = PetTransferHistorySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MergedKeysetPagination
+    directions = {"out": "from_user", "in": "to_user"}
+
+    def get_user_fields(self):
+        direction = self.request.query_params.get("direction")
+        if direction in self.directions:
+            return [self.directions[direction]]
+        return list(self.directions.values())
+
+    def get_base_queryset(self):
+        queryset = PetTransfer.objects.select_related("pet", "from_user", "to_user")
+        if self.request.query_params.get("status") in dict(STATUS_CHOICES):
+            queryset = queryset.filter(status=self.request.query_params["status"])
+        return queryset
+
+    def get_queryset(self):
+        user = self.request.user
+        return self.get_base_queryset().filter(
+            reduce(operator.or_, [Q(**{field: user}) for field in self.get_user_fields()])
+        )
+
+    def list(self, request, *args, **kwargs):
+        # Una consulta por índice (from_user|to_user, created_at, id) en lugar
+        # de un solo OR; MergedKeysetPagination mezcla las páginas
+        queryset = self.get_base_queryset()
+        branches = [queryset.filter(**{field: request.user}) for field in self.get_user_fields()]
+        page = self.paginate_queryset(branches)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+
+class PetPhotoUploadView(APIView):
+    """
+    Destino del PUT de las subidas directas cuando el storage es local (sin
+    S3/MinIO). Cumple el papel de la URL prefirmada: el token firmado
+    autoriza la subida de una sola llave con su tamaño y Content-Type.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def put(self, request, token):
+        try:
+            upload = read_photo_upload_token(token)
+        except signing.BadSignature:
+            return Response({'detail': 'Token inválido o expirado'}, status=status.HTTP_403_FORBIDDEN)
+
+        if request.content_type != upload['type']:
+            return Response(
+                {'detail': f"Content-Type debe ser {upload['type']}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length < 1 or length > upload['max_size']:
+            return Response(
+                {'detail': f"El tamaño debe estar entre 1 y {upload['max_size']} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        storage = get_pet_photo_storage()
+        if storage.exists(upload['key']):
+            return Response({'detail': 'El archivo ya se subió'}, status=status.HTTP_409_CONFLICT)
+        # El cuerpo se copia al storage por chunks, sin cargarlo en memoria
+        storage.save_as(upload['key'], File(request._request, name=upload['key']))
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,29 @@
+import os
+import sys
+from django.core.exceptions import ImproperlyConfigured
+
+# Configuración del cache
+# La versión del catálogo de mascotas vive en este cache, por lo que debe ser
+# compartido entre los workers de gunicorn y de Celery: CACHE_URL apunta a
+# Redis (servicio pekpet-cache del compose), p. ej. "redis://host:6379/0".
+# Es obligatorio salvo con DEBUG=1 o en las pruebas (manage.py test); ahí se
+# usa memoria local, que no se comparte entre procesos: un cambio del
+# catálogo en un worker no invalidaría los demás.
+
+CACHE_URL = os.environ.get('CACHE_URL')
+if not CACHE_URL and not (bool(int(os.environ.get('DEBUG', 0))) or sys.argv[1:2] == ['test']):
+    raise ImproperlyConfigured('CACHE_URL es obligatorio fuera de DEBUG y de las pruebas')
+
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
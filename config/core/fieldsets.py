@@ -0,0 +1,121 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _query_param_list(request, name):
+    value = request.query_params.get(name, '')
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class SparseFieldsetsMixin:
+    """
+    Mixin para ModelSerializer: en peticiones de lectura ?fields=a,b deja
+    solo esos campos y ?omit=c los quita. Solo aplica al serializer raíz
+    (o al hijo de un ListSerializer raíz), no a los anidados.
+    """
+
+    def get_requested_fields(self):
+        """Regresa (fields, omit) de la petición o (None, None) si no aplica"""
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return None, None
+
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return None, None
+
+        fields = _query_param_list(request, 'fields')
+        omit = _query_param_list(request, 'omit')
+        if not fields and not omit:
+            return None, None
+        return fields, omit
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, omit = self.get_requested_fields()
+        if requested is None:
+            return fields
+
+        for name in list(fields):
+            if (requested and name not in requested) or name in omit:
+                fields.pop(name)
+        return fields
+
+    def restrict_queryset(self, queryset, keep=()):
+        """
+        Reduce el queryset a las columnas que el serializer va a leer:
+        difiere los campos no pedidos y quita los select_related y
+        prefetch_related de relaciones que no se van a serializar.
+        `keep` son campos del modelo que deben cargarse de todos modos
+        (por ejemplo los de ordenamiento de la paginación).
+        """
+        if self.get_requested_fields()[0] is None:
+            return queryset
+
+        sources = set()
+        for field in self.fields.values():
+            if field.source == '*':
+                # El campo lee el objeto completo; no se puede saber qué columnas usa
+                return queryset
+            sources.add(field.source.split('.')[0])
+        sources.update(keep)
+
+        opts = queryset.model._meta
+        deferred = {
+            field.name for field in opts.concrete_fields
+            if not field.primary_key and field.name not in sources
+        }
+
+        select_related = queryset.query.select_related
+        if isinstance(select_related, dict):
+            kept = [path for path in _flatten_select_related(select_related) if path.split('__')[0] in sources]
+            queryset = queryset.select_related(None)
+            if kept:
+                queryset = queryset.select_related(*kept)
+        elif select_related:
+            # select_related() sin argumentos: no sigue relaciones diferidas
+            queryset = queryset.select_related(None)
+
+        lookups = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if getattr(lookup, 'prefetch_through', lookup).split('__')[0] in sources
+        ]
+        queryset = queryset.prefetch_related(None)
+        if lookups:
+            queryset = queryset.prefetch_related(*lookups)
+
+        return queryset.defer(*deferred) if deferred else queryset
+
+
+def _flatten_select_related(tree, prefix=''):
+    paths = []
+    for name, children in tree.items():
+        path = f'{prefix}{name}'
+        nested = _flatten_select_related(children, f'{path}__') if children else []
+        paths.extend(nested or [path])
+    return paths
+
+
+class SparseFieldsetsViewMixin:
+    """
+    Mixin para ViewSets cuyo serializer usa SparseFieldsetsMixin: aplica
+    ?fields= / ?omit= también al queryset (only/defer y prefetch)
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsetsMixin):
+            return queryset
+
+        # La paginación por cursor lee sus campos de ordenamiento de cada fila
+        keep = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(keep, str):
+            keep = (keep,)
+        keep = [name.lstrip('-') for name in keep]
+        return serializer.restrict_queryset(queryset, keep=keep)
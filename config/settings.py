@@ -21,6 +21,8 @@ from pathlib import Path
 from .core.db_connection import *
 from .core.apps import *
 from .core.rest_framework import *
+from .core.cache import *
+from .core.celery import *
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,6 +46,38 @@ CSRF_TRUSTED_ORIGINS = os.environ.get('CSRF_ORIGINS', '*').split(' ')
 AUTH_USER_MODEL = 'accounts.User'
 # Dias de ban por transferencia
 PET_TRANSFER_COOLDOWN_DAYS = int(os.getenv("PET_TRANSFER_COOLDOWN_DAYS", "7"))
+# Máximo de AnimalType/Breed por tipo en el cache del catálogo de cada proceso
+PET_CATALOG_CACHE_SIZE = int(os.getenv("PET_CATALOG_CACHE_SIZE", "5000"))
+# Máximo de resultados del autocompletado de razas
+PET_BREED_AUTOCOMPLETE_LIMIT = int(os.getenv("PET_BREED_AUTOCOMPLETE_LIMIT", "10"))
+# Tamaño máximo (bytes) y vigencia (segundos) de las subidas directas de fotos
+PET_PHOTO_UPLOAD_MAX_SIZE = int(os.getenv("PET_PHOTO_UPLOAD_MAX_SIZE", str(10 * 1024 * 1024)))
+PET_PHOTO_UPLOAD_EXPIRES = int(os.getenv("PET_PHOTO_UPLOAD_EXPIRES", "900"))
+# Días que una mascota eliminada (borrado lógico) se conserva antes de la purga
+# y mascotas borradas por transacción durante la purga
+PET_PURGE_AFTER_DAYS = int(os.getenv("PET_PURGE_AFTER_DAYS", "30"))
+PET_PURGE_BATCH_SIZE = int(os.getenv("PET_PURGE_BATCH_SIZE", "500"))
+# Transferencias vencidas que se cancelan por UPDATE en cada lote del barrido
+PET_TRANSFER_EXPIRY_BATCH_SIZE = int(os.getenv("PET_TRANSFER_EXPIRY_BATCH_SIZE", "1000"))
+# Máximo de mascotas por transferencia masiva
+PET_TRANSFER_BATCH_MAX_SIZE = int(os.getenv("PET_TRANSFER_BATCH_MAX_SIZE", "200"))
+# Outbox de notificaciones (apps.pets.outbox): transporte, eventos por lote del
+# despachador, intentos antes de marcarlos como fallidos y espera exponencial
+PET_OUTBOX_TRANSPORT = os.getenv("PET_OUTBOX_TRANSPORT", "apps.pets.outbox.EmailTransport")
+PET_OUTBOX_BATCH_SIZE = int(os.getenv("PET_OUTBOX_BATCH_SIZE", "100"))
+PET_OUTBOX_MAX_ATTEMPTS = int(os.getenv("PET_OUTBOX_MAX_ATTEMPTS", "8"))
+PET_OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("PET_OUTBOX_RETRY_BASE_SECONDS", "30"))
+PET_OUTBOX_RETRY_MAX_SECONDS = int(os.getenv("PET_OUTBOX_RETRY_MAX_SECONDS", "3600"))
+
+# Correo saliente. En desarrollo puede apuntar a un SMTP local, p. ej. Mailpit
+# (EMAIL_HOST=localhost EMAIL_PORT=1025)
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = bool(int(os.getenv("EMAIL_USE_TLS", "0")))
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "10"))
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "PekPet <no-reply@pekpet.local>")
 
 # Configuración del Token
 SIMPLE_JWT = {
@@ -141,6 +175,8 @@ AWS_QUERYSTRING_AUTH = bool(int(os.environ.get('AWS_QUERYSTRING_AUTH', '0')))
 if all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_STORAGE_BUCKET_NAME]):
     # Usar S3/MinIO para archivos media
     DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+    # Fotos de mascotas: deduplicadas por hash de contenido
+    PET_PHOTO_STORAGE = 'apps.pets.storage.ContentAddressedS3Storage'
     
     # Configurar URL para archivos media
     if AWS_S3_CUSTOM_DOMAIN:
@@ -155,6 +191,7 @@ else:
     # Fallback al sistema de archivos local
     MEDIA_URL = "/media/"
     MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+    PET_PHOTO_STORAGE = 'apps.pets.storage.ContentAddressedFileSystemStorage'
 
 # Configuración opcional para static files en S3 (solo producción)
 if not DEBUG and all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_STORAGE_BUCKET_NAME]):
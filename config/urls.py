@@ -75,10 +75,13 @@ router.register(r'users', UserViewSet)
 router.register(r'animal-types', AnimalTypeViewSet)
 router.register(r'breeds', BreedViewSet)
 router.register(r'pets', PetViewSet)
+router.register(r'transfers', PetTransferViewSet, basename='pet-transfer')
+router.register(r'analytics/population', PetPopulationViewSet, basename='pet-population')
 
 # Rutas exclusivas de la API
 
 api_urlpatterns = [
+    path('pets/photo-uploads/<str:token>/', PetPhotoUploadView.as_view(), name='pet-photo-direct-upload'),
     path('', include(router.urls)),
     path('auth/', include(auth_urlpatterns)),
 ]
@@ -0,0 +1,70 @@
+"""
+Benchmark del importador de razas (BreedViewSet.bulk_create).
+
+Mide el número de consultas y el tiempo total de `import_breeds` para
+distintos tamaños de payload. Todo se ejecuta dentro de una transacción que
+se revierte al final, por lo que la base de datos queda intacta.
+
+Uso (desde la raíz del proyecto, con las variables de entorno cargadas):
+
+    python scripts/bench_breed_import.py 1000 10000 50000
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from apps.pets.models import AnimalType
+from apps.pets.importers import import_breeds
+
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+ANIMAL_TYPES = 10
+
+
+class Rollback(Exception):
+    pass
+
+
+def build_payload(size, slugs):
+    return [
+        {"animal_type_slug": slugs[i % len(slugs)], "name": f"Raza {i}", "is_active": True}
+        for i in range(size)
+    ]
+
+
+def run(size):
+    try:
+        with transaction.atomic():
+            slugs = [f"bench-{i}" for i in range(ANIMAL_TYPES)]
+            AnimalType.objects.bulk_create(
+                [AnimalType(slug=slug, name=slug) for slug in slugs]
+            )
+            payload = build_payload(size, slugs)
+
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                created, errors = import_breeds(payload)
+                elapsed = time.perf_counter() - start
+
+            assert len(created) == size and not errors
+            raise Rollback((len(queries), elapsed))
+    except Rollback as result:
+        return result.args[0]
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    print(f"Base de datos: {connection.vendor}")
+    print(f"{'items':>8} {'consultas':>10} {'tiempo (s)':>11} {'items/s':>10}")
+    for size in sizes:
+        total_queries, elapsed = run(size)
+        print(f"{size:>8} {total_queries:>10} {elapsed:>11.3f} {size / elapsed:>10.0f}")
@@ -0,0 +1,93 @@
+"""
+Benchmark del importador de mascotas (PetViewSet.bulk_import / manage.py import_pets).
+
+Genera un archivo CSV o NDJSON en memoria con N filas (100 dueños y 20 razas)
+y mide el número de consultas, el tiempo total y las filas por segundo de
+`import_pets(read_pet_rows(...))`. Todo se ejecuta dentro de una transacción
+que se revierte al final, por lo que la base de datos queda intacta.
+
+Uso (desde la raíz del proyecto, con las variables de entorno cargadas):
+
+    python scripts/bench_pet_import.py csv 1000 10000 50000
+"""
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from apps.accounts.models import User
+from apps.pets.models import AnimalType, Breed
+from apps.pets.importers import import_pets, read_pet_rows
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+OWNERS = 100
+BREEDS = 20
+
+
+class Rollback(Exception):
+    pass
+
+
+def build_file(file_format, size, emails, breed_ids):
+    rows = [
+        {
+            "owner_email": emails[i % len(emails)], "name": f"Mascota {i}",
+            "breed": breed_ids[i % len(breed_ids)], "sex": "MF"[i % 2],
+            "birth_date": "2020-05-17", "weight_kg": "12.50", "neutered": "true",
+        }
+        for i in range(size)
+    ]
+    if file_format == 'ndjson':
+        content = "".join(json.dumps(row) + "\n" for row in rows)
+    else:
+        header = list(rows[0])
+        content = ",".join(header) + "\n" + "".join(
+            ",".join(str(row[key]) for key in header) + "\n" for row in rows
+        )
+    return io.BytesIO(content.encode())
+
+
+def run(file_format, size):
+    try:
+        with transaction.atomic():
+            owners = User.objects.bulk_create([
+                User(username=f"bench-import-{i}", email=f"bench-import-{i}@pekpet.local")
+                for i in range(OWNERS)
+            ])
+            animal_type = AnimalType.objects.create(slug="bench-import", name="Bench")
+            breeds = Breed.objects.bulk_create([
+                Breed(animal_type=animal_type, name=f"Raza {i}") for i in range(BREEDS)
+            ])
+            file = build_file(file_format, size, [owner.email for owner in owners], [breed.id for breed in breeds])
+
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                created, errors = import_pets(read_pet_rows(file, file_format))
+                elapsed = time.perf_counter() - start
+
+            assert created == size and not errors, errors[:3]
+            raise Rollback((len(queries), elapsed))
+    except Rollback as result:
+        return result.args[0]
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    file_format = args.pop(0) if args and args[0] in ('csv', 'ndjson') else 'csv'
+    sizes = [int(arg) for arg in args] or DEFAULT_SIZES
+
+    print(f"Base de datos: {connection.vendor}  formato: {file_format}")
+    print(f"{'filas':>8} {'consultas':>10} {'tiempo (s)':>11} {'filas/s':>10}")
+    for size in sizes:
+        total_queries, elapsed = run(file_format, size)
+        print(f"{size:>8} {total_queries:>10} {elapsed:>11.3f} {size / elapsed:>10.0f}")
@@ -0,0 +1,105 @@
+"""
+Benchmark de búsqueda de mascotas: SearchFilter (ILIKE '%term%') contra
+TrigramSearchFilter (índices GIN de pg_trgm).
+
+Solo PostgreSQL. Inserta N mascotas sintéticas con generate_series dentro de
+una transacción que se revierte al final, y mide el p50/p95 de la página que
+sirve PetViewSet (COUNT + primeras 10 filas) para varios términos.
+
+Uso (desde la raíz del proyecto, con las variables de entorno cargadas):
+
+    python scripts/bench_pet_search.py --pets 1000000 --runs 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection, transaction
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from apps.accounts.models import User
+from apps.pets.filters import TrigramSearchFilter
+from apps.pets.models import AnimalType, Breed, Pet
+from apps.pets.views import PetViewSet
+
+TERMS = ["luna", "chispa", "pelusa 3f", "a1b2", "alemán"]
+PAGE_SIZE = 10
+
+SEED_SQL = """
+INSERT INTO pets_pet (
+    owner_id, name, breed_id, sex, emergency_phone, address, tattoos, microchip,
+    neutered, notes, curp, is_active, created_at, updated_at
+)
+SELECT
+    %(owner_id)s,
+    (ARRAY['Luna', 'Chispa', 'Pelusa', 'Toby', 'Canela', 'Alemán', 'Simba', 'Nala'])[1 + i %% 8]
+        || ' ' || substr(md5(i::text), 1, 6),
+    %(breed_id)s, 'M', '', '', false, false, false, '', '', true, now(), now()
+FROM generate_series(1, %(total)s) AS i
+"""
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def measure(backend, term, runs):
+    view = PetViewSet()
+    request = Request(APIRequestFactory().get('/api/v1/pets/', {'search': term}))
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        queryset = backend.filter_queryset(request, Pet.objects.filter(is_active=True), view)
+        queryset.count()
+        list(queryset[:PAGE_SIZE])
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), percentile(timings, 95)
+
+
+def run(total, runs):
+    try:
+        with transaction.atomic():
+            owner = User.objects.create(username='bench-search', email='bench-search@pekpet.local')
+            animal_type = AnimalType.objects.create(slug='bench-search', name='Bench')
+            breed = Breed.objects.create(animal_type=animal_type, name='Pastor Alemán')
+
+            print(f"Insertando {total} mascotas...")
+            with connection.cursor() as cursor:
+                cursor.execute(SEED_SQL, {'owner_id': owner.id, 'breed_id': breed.id, 'total': total})
+                cursor.execute("ANALYZE pets_pet")
+
+            print(f"{'término':<12} {'ILIKE p50':>10} {'ILIKE p95':>10} {'trgm p50':>10} {'trgm p95':>10}  (ms)")
+            for term in TERMS:
+                ilike = measure(filters.SearchFilter(), term, runs)
+                trigram = measure(TrigramSearchFilter(), term, runs)
+                print(f"{term:<12} {ilike[0]:>10.1f} {ilike[1]:>10.1f} {trigram[0]:>10.1f} {trigram[1]:>10.1f}")
+            raise Rollback()
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pets', type=int, default=1000000)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    if connection.vendor != 'postgresql':
+        print("Este benchmark requiere PostgreSQL con las extensiones pg_trgm y unaccent.")
+        sys.exit(1)
+    run(args.pets, args.runs)
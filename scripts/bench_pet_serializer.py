@@ -0,0 +1,96 @@
+"""
+Microbenchmark del listado de mascotas: PetReadSerializer (ModelSerializer)
+contra el modo rápido de PetViewSet (ValuesSerializer sobre values()).
+
+Mide solo la serialización (las filas se cargan antes de medir) y reporta el
+tiempo por cada 1,000 mascotas. Los datos se crean dentro de una transacción
+que se revierte al final.
+
+Uso (desde la raíz del proyecto, con las variables de entorno cargadas):
+
+    python scripts/bench_pet_serializer.py --pets 1000 --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+
+django.setup()
+
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from apps.accounts.models import User
+from apps.pets.fast_serializers import ValuesSerializer
+from apps.pets.models import AnimalType, Breed, Pet
+from apps.pets.serializers import PetReadSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+def timed(function, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run(total, runs):
+    try:
+        with transaction.atomic():
+            owner = User.objects.create(username='bench-serializer', email='bench-serializer@pekpet.local')
+            animal_type = AnimalType.objects.create(slug='bench-serializer', name='Bench')
+            breed = Breed.objects.create(animal_type=animal_type, name='Labrador Retriever')
+            Pet.objects.bulk_create([
+                Pet(
+                    owner=owner, breed=breed, name=f'Mascota {i}', sex='F',
+                    birth_date=date(2020, 1, 1), weight_kg=Decimal('12.30'), height_cm=Decimal('45.00'),
+                    photo=f'pets/photos/{i}.jpg'
+                )
+                for i in range(total)
+            ])
+
+            request = Request(APIRequestFactory().get('/api/v1/pets/'))
+            context = {'request': request}
+            queryset = Pet.objects.filter(owner=owner).select_related('breed__animal_type', 'owner').order_by('id')
+
+            fast_serializer = ValuesSerializer.compile(PetReadSerializer(context=context))
+            instances = list(queryset)
+            rows = list(fast_serializer.values(queryset))
+
+            slow_data = PetReadSerializer(instances, many=True, context=context).data
+            fast_data = fast_serializer.to_representation(rows)
+            identical = JSONRenderer().render(slow_data) == JSONRenderer().render(fast_data)
+
+            slow = timed(lambda: PetReadSerializer(instances, many=True, context=context).data, runs)
+            fast = timed(lambda: fast_serializer.to_representation(rows), runs)
+
+            per_thousand = 1000 / total * 1000
+            print(f"Mascotas: {total}  salida idéntica: {identical}")
+            print(f"PetReadSerializer: {slow * per_thousand:8.2f} ms / 1000 mascotas")
+            print(f"ValuesSerializer:  {fast * per_thousand:8.2f} ms / 1000 mascotas")
+            print(f"Aceleración:       {slow / fast:8.1f}x")
+            raise Rollback()
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pets', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    run(args.pets, args.runs)
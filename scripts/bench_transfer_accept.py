@@ -0,0 +1,156 @@
+"""
+Benchmark de contención de la aceptación de transferencias.
+
+En cada ronda crea una transferencia pendiente y lanza en paralelo --threads
+peticiones contra ella (la mitad a accept_transfer y la otra mitad a
+cancel_transfer), liberadas al mismo tiempo con una barrera. Reporta:
+
+- throughput y latencia de las peticiones,
+- espera por bloqueos: duración de los UPDATE sobre pets_pettransfer y
+  pets_pet (un UPDATE bloqueado por otra transacción espera aquí),
+- corrección: en cada ronda exactamente una petición debe ganar y el dueño
+  de la mascota debe corresponder al estado final de la transferencia.
+
+Necesita PostgreSQL: cada hilo usa su propia conexión, por lo que los datos
+se confirman y se borran al terminar.
+
+Uso (desde la raíz del proyecto, con las variables de entorno cargadas):
+
+    python scripts/bench_transfer_accept.py --rounds 50 --threads 8
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.pets.models import Pet, PetTransfer
+
+settings.ALLOWED_HOSTS = ['*']
+
+
+class Worker:
+    """Hilo con su cliente autenticado y los tiempos de sus UPDATE"""
+
+    def __init__(self, user):
+        self.user = user
+        self.update_timings = []
+        self.client = None
+
+    def record_updates(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith('UPDATE') or 'pets_pet' not in sql:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.update_timings.append(time.perf_counter() - start)
+
+    def call(self, barrier, method, path, data):
+        if self.client is None:
+            self.client = APIClient()
+            self.client.force_authenticate(self.user)
+        barrier.wait()
+        start = time.perf_counter()
+        with connection.execute_wrapper(self.record_updates):
+            response = getattr(self.client, method)(path, data, format='json')
+        return response.status_code, time.perf_counter() - start
+
+    def close(self):
+        connection.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(rounds, threads):
+    if connection.vendor != 'postgresql':
+        sys.exit("Este benchmark requiere PostgreSQL")
+
+    suffix = int(time.time())
+    sender = User.objects.create(username=f'bench-sender-{suffix}', email=f'bench-sender-{suffix}@pekpet.local')
+    receiver = User.objects.create(username=f'bench-receiver-{suffix}', email=f'bench-receiver-{suffix}@pekpet.local')
+    pet = Pet.objects.create(owner=sender, name='Bench')
+
+    accept_workers = [Worker(receiver) for _ in range(threads - threads // 2)]
+    cancel_workers = [Worker(sender) for _ in range(threads // 2)]
+    workers = accept_workers + cancel_workers
+    latencies = []
+    winners = {'accept': 0, 'cancel': 0}
+    errors = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            start = time.perf_counter()
+            for round_number in range(rounds):
+                Pet.all_objects.filter(id=pet.id).update(owner=sender)
+                transfer = PetTransfer.start(pet=pet, from_user=sender, to_user=receiver)
+                barrier = threading.Barrier(threads)
+                accepts = [
+                    executor.submit(worker.call, barrier, 'post', '/api/v1/pets/accept_transfer/', {'code': transfer.code})
+                    for worker in accept_workers
+                ]
+                cancels = [
+                    executor.submit(worker.call, barrier, 'post', f'/api/v1/pets/{pet.id}/cancel_transfer/', {})
+                    for worker in cancel_workers
+                ]
+                accepted = [future.result() for future in accepts]
+                cancelled = [future.result() for future in cancels]
+                latencies.extend(latency for _, latency in accepted + cancelled)
+
+                accept_ok = sum(1 for status, _ in accepted if status == 200)
+                cancel_ok = sum(1 for status, _ in cancelled if status == 200)
+                transfer.refresh_from_db()
+                owner_id = Pet.all_objects.values_list('owner_id', flat=True).get(id=pet.id)
+                expected_owner = receiver.id if transfer.status == 'accepted' else sender.id
+                if accept_ok + cancel_ok != 1 or owner_id != expected_owner or transfer.status == 'pending':
+                    errors.append(
+                        f"ronda {round_number}: aceptadas={accept_ok} canceladas={cancel_ok} "
+                        f"estado={transfer.status} dueño={owner_id}"
+                    )
+                winners['accept'] += accept_ok
+                winners['cancel'] += cancel_ok
+            elapsed = time.perf_counter() - start
+            for future in [executor.submit(worker.close) for worker in workers]:
+                future.result()
+    finally:
+        PetTransfer.objects.filter(pet=pet).delete()
+        Pet.all_objects.filter(id=pet.id).delete()
+        User.objects.filter(id__in=[sender.id, receiver.id]).delete()
+
+    waits = [timing for worker in workers for timing in worker.update_timings]
+    print(f"Rondas: {rounds}  hilos: {threads}  peticiones: {len(latencies)}")
+    print(f"Throughput:        {len(latencies) / elapsed:8.1f} peticiones/s")
+    print(f"Latencia p50/p95:  {percentile(latencies, .5) * 1000:8.2f} / {percentile(latencies, .95) * 1000:.2f} ms")
+    print(
+        f"UPDATE p50/p95/máx:{percentile(waits, .5) * 1000:8.2f} / {percentile(waits, .95) * 1000:.2f}"
+        f" / {max(waits, default=0) * 1000:.2f} ms (espera por bloqueos incluida)"
+    )
+    print(f"Ganadoras:         aceptación {winners['accept']}, cancelación {winners['cancel']}")
+    print(f"Errores de corrección: {len(errors)}")
+    for error in errors:
+        print(f"  {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+    run(args.rounds, max(2, args.threads))